@@ -0,0 +1,36 @@
+"""Add month_state table (RF-06 materialization watermark).
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "009"
+down_revision = "008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "month_state",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column(
+            "user_id",
+            sa.String(36),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("mes_referencia", sa.Date, nullable=False),
+        sa.Column("source_version", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("materialized_version", sa.Integer, nullable=True),
+        sa.Column("updated_at", sa.DateTime, server_default=sa.func.now()),
+        sa.UniqueConstraint("user_id", "mes_referencia", name="uq_month_state_user_month"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("month_state")
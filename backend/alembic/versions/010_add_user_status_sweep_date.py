@@ -0,0 +1,22 @@
+"""Add users.status_sweep_date (RF-05 once-per-day overdue sweep).
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "010"
+down_revision = "009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("status_sweep_date", sa.Date, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("users", "status_sweep_date")
@@ -0,0 +1,71 @@
+"""Add monthly_rollup read model and backfill it from the raw tables.
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-18
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "012"
+down_revision = "011"
+branch_labels = None
+depends_on = None
+
+_BACKFILL_SQL = """
+SELECT user_id, mes_referencia, 'despesa' AS tipo, COALESCE(status, '') AS status,
+       COALESCE(categoria, '') AS categoria, SUM(valor) AS total, COUNT(*) AS quantidade
+FROM expenses GROUP BY user_id, mes_referencia, COALESCE(status, ''), COALESCE(categoria, '')
+UNION ALL
+SELECT user_id, mes_referencia, 'receita', '', '', SUM(valor), COUNT(*)
+FROM incomes GROUP BY user_id, mes_referencia
+UNION ALL
+SELECT user_id, mes_referencia, 'gasto_diario', '', COALESCE(categoria, ''), SUM(valor), COUNT(*)
+FROM daily_expenses GROUP BY user_id, mes_referencia, COALESCE(categoria, '')
+"""
+
+
+def upgrade() -> None:
+    rollup = op.create_table(
+        "monthly_rollup",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column(
+            "user_id",
+            sa.String(36),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("mes_referencia", sa.Date, nullable=False),
+        sa.Column("tipo", sa.String(20), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False, server_default=""),
+        sa.Column("categoria", sa.String(50), nullable=False, server_default=""),
+        sa.Column("total", sa.Numeric(12, 2), nullable=False),
+        sa.Column("quantidade", sa.Integer, nullable=False),
+        sa.UniqueConstraint(
+            "user_id", "mes_referencia", "tipo", "status", "categoria",
+            name="uq_monthly_rollup_key",
+        ),
+    )
+
+    backfill = sa.text(_BACKFILL_SQL).columns(
+        sa.column("user_id", sa.String),
+        sa.column("mes_referencia", sa.Date),
+        sa.column("tipo", sa.String),
+        sa.column("status", sa.String),
+        sa.column("categoria", sa.String),
+        sa.column("total", sa.Numeric(12, 2)),
+        sa.column("quantidade", sa.Integer),
+    )
+    rows = [
+        {"id": str(uuid.uuid4()), **row}
+        for row in op.get_bind().execute(backfill).mappings()
+    ]
+    if rows:
+        op.bulk_insert(rollup, rows)
+
+
+def downgrade() -> None:
+    op.drop_table("monthly_rollup")
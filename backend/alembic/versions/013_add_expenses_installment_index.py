@@ -0,0 +1,25 @@
+"""Add covering index for the remaining installment total.
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "013"
+down_revision = "012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_expenses_user_parcela",
+        "expenses",
+        ["user_id", "parcela_total", "status", "valor"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_expenses_user_parcela", table_name="expenses")
@@ -0,0 +1,104 @@
+"""Add installment_plans and expenses.plan_id, backfilling existing installments.
+
+Existing installments are grouped by (user, normalized name, parcela_total,
+month of installment 1), so two purchases with the same name started in
+different months become separate plans.
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-18
+"""
+import calendar
+import uuid
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "014"
+down_revision = "013"
+branch_labels = None
+depends_on = None
+
+
+def _add_months(source: date, months: int) -> date:
+    month = source.month - 1 + months
+    year = source.year + month // 12
+    month = month % 12 + 1
+    return date(year, month, min(source.day, calendar.monthrange(year, month)[1]))
+
+
+def upgrade() -> None:
+    plans = op.create_table(
+        "installment_plans",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column(
+            "user_id",
+            sa.String(36),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("nome", sa.String(255), nullable=False),
+        sa.Column("valor", sa.Numeric(10, 2), nullable=False),
+        sa.Column("parcela_total", sa.Integer, nullable=False),
+        sa.Column("primeiro_vencimento", sa.Date, nullable=False),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    )
+    op.create_index("ix_installment_plans_user_id", "installment_plans", ["user_id"])
+
+    with op.batch_alter_table("expenses") as batch_op:
+        batch_op.add_column(sa.Column("plan_id", sa.String(36), nullable=True))
+        batch_op.create_foreign_key(
+            "fk_expenses_plan_id", "installment_plans", ["plan_id"], ["id"], ondelete="SET NULL"
+        )
+        batch_op.create_index("ix_expenses_plan_id", ["plan_id"])
+
+    # Backfill: parcela de menor numero de cada grupo define o plano
+    installments = sa.text(
+        "SELECT id, user_id, nome, valor, vencimento, mes_referencia, parcela_atual, parcela_total "
+        "FROM expenses WHERE parcela_total > 1 ORDER BY user_id, parcela_atual, vencimento"
+    ).columns(
+        sa.column("id", sa.String),
+        sa.column("user_id", sa.String),
+        sa.column("nome", sa.String),
+        sa.column("valor", sa.Numeric(10, 2)),
+        sa.column("vencimento", sa.Date),
+        sa.column("mes_referencia", sa.Date),
+        sa.column("parcela_atual", sa.Integer),
+        sa.column("parcela_total", sa.Integer),
+    )
+    bind = op.get_bind()
+    plan_rows: dict[tuple, dict] = {}
+    assignments = []
+    for row in bind.execute(installments).mappings():
+        offset = (row["parcela_atual"] or 1) - 1
+        inicio = _add_months(row["mes_referencia"], -offset)
+        key = (row["user_id"], row["nome"].strip().lower(), row["parcela_total"], inicio)
+        plan = plan_rows.get(key)
+        if plan is None:
+            plan = plan_rows[key] = {
+                "id": str(uuid.uuid4()),
+                "user_id": row["user_id"],
+                "nome": row["nome"],
+                "valor": row["valor"],
+                "parcela_total": row["parcela_total"],
+                "primeiro_vencimento": _add_months(row["vencimento"], -offset),
+            }
+        assignments.append({"plan_id": plan["id"], "expense_id": row["id"]})
+
+    if plan_rows:
+        op.bulk_insert(plans, list(plan_rows.values()))
+        bind.execute(
+            sa.text("UPDATE expenses SET plan_id = :plan_id WHERE id = :expense_id"),
+            assignments,
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("expenses") as batch_op:
+        batch_op.drop_index("ix_expenses_plan_id")
+        batch_op.drop_constraint("fk_expenses_plan_id", type_="foreignkey")
+        batch_op.drop_column("plan_id")
+    op.drop_index("ix_installment_plans_user_id", table_name="installment_plans")
+    op.drop_table("installment_plans")
@@ -0,0 +1,66 @@
+"""Add per-plan installment counters to installment_plans and backfill them.
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "015"
+down_revision = "014"
+branch_labels = None
+depends_on = None
+
+_COUNTERS = (
+    ("quantidade", sa.Integer),
+    ("parcelas_pagas", sa.Integer),
+    ("ultima_parcela_paga", sa.Integer),
+    ("valor_total", sa.Numeric(12, 2)),
+    ("valor_pago", sa.Numeric(12, 2)),
+    ("valor_pendente", sa.Numeric(12, 2)),
+    ("valor_atrasado", sa.Numeric(12, 2)),
+)
+
+_BACKFILL_SQL = """
+SELECT plan_id,
+       COUNT(*) AS quantidade,
+       SUM(CASE WHEN status = 'Pago' THEN 1 ELSE 0 END) AS parcelas_pagas,
+       MAX(CASE WHEN status = 'Pago' THEN COALESCE(parcela_atual, 0) ELSE 0 END) AS ultima_parcela_paga,
+       SUM(valor) AS valor_total,
+       SUM(CASE WHEN status = 'Pago' THEN valor ELSE 0 END) AS valor_pago,
+       SUM(CASE WHEN status = 'Pendente' THEN valor ELSE 0 END) AS valor_pendente,
+       SUM(CASE WHEN status = 'Atrasado' THEN valor ELSE 0 END) AS valor_atrasado
+FROM expenses
+WHERE plan_id IS NOT NULL AND parcela_total > 1
+GROUP BY plan_id
+"""
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("installment_plans") as batch_op:
+        for name, type_ in _COUNTERS:
+            batch_op.add_column(sa.Column(name, type_, nullable=False, server_default="0"))
+
+    bind = op.get_bind()
+    backfill = sa.text(_BACKFILL_SQL).columns(
+        sa.column("plan_id", sa.String),
+        *(sa.column(name, type_) for name, type_ in _COUNTERS),
+    )
+    rows = [dict(row) for row in bind.execute(backfill).mappings()]
+    if rows:
+        bind.execute(
+            sa.text(
+                "UPDATE installment_plans SET "
+                + ", ".join(f"{name} = :{name}" for name, _ in _COUNTERS)
+                + " WHERE id = :plan_id"
+            ).bindparams(*(sa.bindparam(name, type_=type_) for name, type_ in _COUNTERS)),
+            rows,
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("installment_plans") as batch_op:
+        for name, _ in reversed(_COUNTERS):
+            batch_op.drop_column(name)
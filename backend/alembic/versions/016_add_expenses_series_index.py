@@ -0,0 +1,25 @@
+"""Add index for set-based series deletion (user_id, nome, parcela_total).
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "016"
+down_revision = "015"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_expenses_user_nome_parcela",
+        "expenses",
+        ["user_id", "nome", "parcela_total"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_expenses_user_nome_parcela", table_name="expenses")
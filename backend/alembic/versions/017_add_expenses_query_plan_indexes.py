@@ -0,0 +1,45 @@
+"""Add composite and partial expense indexes for the hot crud queries.
+
+- ix_expenses_user_month_parcela: expense_installment_exists (user, month, installment)
+- ix_expenses_status_vencimento: overdue sweep across all users (RF-05)
+- ix_expenses_installments_user_venc: installments of a user ordered by
+  vencimento, partial on parcela_total > 1
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "017"
+down_revision = "016"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_expenses_user_month_parcela",
+        "expenses",
+        ["user_id", "mes_referencia", "nome", "parcela_atual", "parcela_total"],
+    )
+    op.create_index(
+        "ix_expenses_status_vencimento",
+        "expenses",
+        ["status", "vencimento"],
+    )
+    op.create_index(
+        "ix_expenses_installments_user_venc",
+        "expenses",
+        ["user_id", "vencimento"],
+        sqlite_where=sa.text("parcela_total > 1"),
+        postgresql_where=sa.text("parcela_total > 1"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_expenses_installments_user_venc", table_name="expenses")
+    op.drop_index("ix_expenses_status_vencimento", table_name="expenses")
+    op.drop_index("ix_expenses_user_month_parcela", table_name="expenses")
@@ -0,0 +1,30 @@
+"""Add expenses.recorrencia_encerrada to keep ended recurring occurrences in their series.
+
+Deleting a recurring expense "from this month on" clears recorrente on the
+last remaining occurrence so RF-06 stops replicating it; the flag keeps that
+occurrence matched by the series filter of a later "delete all".
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "018"
+down_revision = "017"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("expenses") as batch_op:
+        batch_op.add_column(
+            sa.Column("recorrencia_encerrada", sa.Boolean(), nullable=False, server_default="0")
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("expenses") as batch_op:
+        batch_op.drop_column("recorrencia_encerrada")
@@ -0,0 +1,36 @@
+"""Add score_cache with the last GET /api/score response and its fingerprint.
+
+GET /api/score returns the stored response while (data_version, calculado_em)
+matches the user's users.data_version and the current day.
+
+Revision ID: 019
+Revises: 018
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "019"
+down_revision = "018"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "score_cache",
+        sa.Column(
+            "user_id",
+            sa.String(36),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("data_version", sa.Integer, nullable=False),
+        sa.Column("calculado_em", sa.Date, nullable=False),
+        sa.Column("resposta", sa.Text, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("score_cache")
@@ -0,0 +1,41 @@
+"""Index installments without a plan instead of every installment of a user.
+
+GET /api/expenses/installments reads the installments of each plan by
+plan_id; only rows without a plan (legacy) are still read per user, so
+ix_expenses_installments_user_venc is replaced by a partial index on
+parcela_total > 1 AND plan_id IS NULL.
+
+Revision ID: 020
+Revises: 019
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "020"
+down_revision = "019"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_expenses_installments_without_plan",
+        "expenses",
+        ["user_id", "vencimento"],
+        sqlite_where=sa.text("parcela_total > 1 AND plan_id IS NULL"),
+        postgresql_where=sa.text("parcela_total > 1 AND plan_id IS NULL"),
+    )
+    op.drop_index("ix_expenses_installments_user_venc", table_name="expenses")
+
+
+def downgrade() -> None:
+    op.create_index(
+        "ix_expenses_installments_user_venc",
+        "expenses",
+        ["user_id", "vencimento"],
+        sqlite_where=sa.text("parcela_total > 1"),
+        postgresql_where=sa.text("parcela_total > 1"),
+    )
+    op.drop_index("ix_expenses_installments_without_plan", table_name="expenses")
@@ -14,7 +14,7 @@ from sqlalchemy.orm import Session
 
 from app import crud
 from app.models import ExpenseStatus
-from app.services import apply_status_auto_detection, get_previous_month
+from app.services import sweep_overdue_expenses, get_previous_month
 
 logger = logging.getLogger(__name__)
 
@@ -247,6 +247,11 @@ class ComprometimentoAltoChecker(BaseAlertChecker):
         return []
 
 
+def _installment_key(exp) -> str | tuple:
+    """Chave da compra parcelada: plan_id ou, sem plano, (nome normalizado, parcela_total)."""
+    return exp.plan_id or (exp.nome.strip().lower(), exp.parcela_total)
+
+
 class ParcelaAtivadaChecker(BaseAlertChecker):
     """A6: Parcela mudou de 0/Y para 1/Y (inicio de pagamento)."""
 
@@ -261,11 +266,12 @@ class ParcelaAtivadaChecker(BaseAlertChecker):
         total_fixos = dados.get("total_expenses", 0)
         alertas = []
 
-        # Mapear parcelamentos do mes anterior: {(nome_lower, parcela_total): max_parcela_atual}
-        prev_map: dict[tuple, int] = {}
+        # Mapear parcelamentos do mes anterior: {plan_id: max_parcela_atual}
+        # (parcelas sem plano, legado: chave (nome_lower, parcela_total))
+        prev_map: dict = {}
         for exp in prev_expenses:
             if exp.parcela_total and exp.parcela_total > 1:
-                key = (exp.nome.strip().lower(), exp.parcela_total)
+                key = _installment_key(exp)
                 prev_map[key] = max(prev_map.get(key, 0), exp.parcela_atual or 0)
 
         # Verificar parcelamentos do mes atual com parcela_atual == 1 que nao existiam antes
@@ -275,7 +281,7 @@ class ParcelaAtivadaChecker(BaseAlertChecker):
                 continue
             if exp.parcela_atual != 1:
                 continue
-            key = (exp.nome.strip().lower(), exp.parcela_total)
+            key = _installment_key(exp)
             if key in seen:
                 continue
             seen.add(key)
@@ -392,9 +398,9 @@ class AlertEngine:
         today = date.today()
         prev_mes = get_previous_month(mes_referencia)
 
-        # Expenses do mes atual (com status auto-detection)
+        # Expenses do mes atual (com status auto-detection, RF-05)
+        sweep_overdue_expenses(db, user_id, today)
         expenses = crud.get_expenses_by_month(db, mes_referencia, user_id)
-        apply_status_auto_detection(expenses, today)
 
         # Expenses do mes anterior (para A6)
         prev_expenses = crud.get_expenses_by_month(db, prev_mes, user_id)
@@ -9,6 +9,7 @@ from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from app.database import get_db
+from app.models import User
 from app import crud
 
 # Configuração
@@ -94,3 +95,14 @@ def get_current_user(
         raise credentials_exception
 
     return user
+
+
+def get_current_user_for_write(current_user: User = Depends(get_current_user)) -> User:
+    """
+    Como get_current_user, para endpoints que alteram despesas, receitas ou
+    gastos diários: incrementa users.data_version (base dos ETags). O UPDATE
+    vai no mesmo commit da escrita; se o endpoint falhar antes do commit, a
+    sessão descarta o incremento.
+    """
+    current_user.data_version = User.data_version + 1
+    return current_user
@@ -1,8 +1,13 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
-from datetime import date
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy import select, func, insert, update, delete, literal, literal_column, and_, or_, not_, union_all, case, bindparam, tuple_, type_coerce, Table, MetaData, Column, Date, Float, Integer, String
+from datetime import date, datetime
+from decimal import Decimal
+import uuid
 
-from app.models import Expense, Income, User, RefreshToken, DailyExpense, ScoreHistorico, AnaliseFinanceira, AlertaEstado, ConfiguracaoAlertas  # CR-002: User, RefreshToken; CR-005: DailyExpense; CR-026: ScoreHistorico; CR-032: AnaliseFinanceira; CR-033: AlertaEstado, ConfiguracaoAlertas
+from app.models import Expense, Income, User, RefreshToken, DailyExpense, ScoreHistorico, ScoreCache, AnaliseFinanceira, AlertaEstado, ConfiguracaoAlertas, MonthState, ExpenseStatus, MonthlyRollup, RollupTipo, InstallmentPlan  # CR-002: User, RefreshToken; CR-005: DailyExpense; CR-026: ScoreHistorico, ScoreCache; CR-032: AnaliseFinanceira; CR-033: AlertaEstado, ConfiguracaoAlertas; RF-06: MonthState; RF-05: ExpenseStatus; MonthlyRollup, RollupTipo: read model de totais; InstallmentPlan: compra parcelada
+from app.utils import add_months
 
 
 # ========== Expenses ==========
@@ -17,6 +22,22 @@ def get_expenses_by_month(db: Session, mes_referencia: date, user_id: str) -> li
     return list(db.scalars(stmt).all())
 
 
+def get_expenses_by_month_range(
+    db: Session, from_mes: date, to_mes: date, user_id: str
+) -> list[Expense]:
+    """Despesas de um usuario de from_mes ate to_mes (inclusive), em uma query."""
+    stmt = (
+        select(Expense)
+        .where(
+            Expense.user_id == user_id,
+            Expense.mes_referencia >= from_mes,
+            Expense.mes_referencia <= to_mes,
+        )
+        .order_by(Expense.mes_referencia, Expense.vencimento)
+    )
+    return list(db.scalars(stmt).all())
+
+
 def get_expense_by_id(db: Session, expense_id: str, user_id: str) -> Expense | None:
     """Retorna uma despesa por ID se pertence ao usuario, ou None. (CR-002: ownership check)"""
     stmt = (
@@ -26,6 +47,13 @@ def get_expense_by_id(db: Session, expense_id: str, user_id: str) -> Expense | N
     return db.scalars(stmt).first()
 
 
+def get_expenses_by_ids(db: Session, expense_ids: list[str], user_id: str) -> list[Expense]:
+    """Retorna as despesas do usuario com os IDs pedidos, na ordem de expense_ids (uma query)."""
+    stmt = select(Expense).where(Expense.id.in_(expense_ids), Expense.user_id == user_id)
+    by_id = {expense.id: expense for expense in db.scalars(stmt).all()}
+    return [by_id[expense_id] for expense_id in expense_ids if expense_id in by_id]
+
+
 def create_expense(db: Session, expense: Expense) -> Expense:
     """Persiste uma nova despesa. user_id ja deve estar setado na instancia."""
     db.add(expense)
@@ -47,25 +75,94 @@ def delete_expense(db: Session, expense: Expense) -> None:
     db.commit()
 
 
-def delete_expense_related(db: Session, target_expense: Expense) -> None:
-    """Remove uma despesa e TODAS as relacionadas (parcelas ou recorrentes com mesmo nome) (CR-009)."""
+def _expense_series_conditions(target_expense: Expense, from_mes: date | None = None) -> list:
+    """
+    CR-009: Filtro da serie de uma despesa: parcelas (mesmo nome e parcela_total)
+    ou recorrentes (mesmo nome, incluindo a ocorrencia encerrada por
+    end_expense_recurrence); despesa avulsa e so ela. Com from_mes, apenas
+    as linhas a partir desse mes. Coberto por ix_expenses_user_nome_parcela.
+    """
     conditions = [
         Expense.user_id == target_expense.user_id,
         Expense.nome == target_expense.nome,
     ]
-    
     if target_expense.parcela_total is not None and target_expense.parcela_total > 1:
         conditions.append(Expense.parcela_total == target_expense.parcela_total)
-    elif target_expense.recorrente:
-        conditions.append(Expense.recorrente == True)
+    elif target_expense.recorrente or target_expense.recorrencia_encerrada:
+        conditions.append(or_(Expense.recorrente == True, Expense.recorrencia_encerrada == True))
     else:
         conditions.append(Expense.id == target_expense.id)
+    if from_mes is not None:
+        conditions.append(Expense.mes_referencia >= from_mes)
+    return conditions
 
-    stmt = select(Expense).where(*conditions)
-    expenses = db.scalars(stmt).all()
-    for e in expenses:
-        db.delete(e)
-    db.commit()
+
+def get_expense_series_footprint(
+    db: Session, target_expense: Expense, from_mes: date | None = None
+) -> tuple[set[date], set[date], set[str]]:
+    """
+    Meses, meses com linhas replicaveis (RF-06) e planos da serie, em uma
+    query DISTINCT, para manter rollup, watermarks e contadores apos o DELETE
+    em lote (que nao passa pelo flush).
+    """
+    replicavel = case(
+        (
+            and_(Expense.parcela_atual.is_not(None), Expense.parcela_total.is_not(None)),
+            Expense.parcela_atual < Expense.parcela_total,
+        ),
+        else_=Expense.recorrente,
+    )
+    stmt = (
+        select(Expense.mes_referencia, Expense.plan_id, replicavel)
+        .where(*_expense_series_conditions(target_expense, from_mes))
+        .distinct()
+    )
+    meses: set[date] = set()
+    meses_replicaveis: set[date] = set()
+    plan_ids: set[str] = set()
+    for mes, plan_id, is_replicavel in db.execute(stmt):
+        meses.add(mes)
+        if is_replicavel:
+            meses_replicaveis.add(mes)
+        if plan_id is not None:
+            plan_ids.add(plan_id)
+    return meses, meses_replicaveis, plan_ids
+
+
+def delete_expense_related(db: Session, target_expense: Expense, from_mes: date | None = None) -> int:
+    """
+    Remove uma despesa e TODAS as relacionadas (parcelas ou recorrentes com mesmo
+    nome) (CR-009) em um unico DELETE, sem carregar as linhas. Com from_mes,
+    apenas as do mes informado em diante. Nao faz commit. Retorna o numero de
+    linhas removidas.
+    """
+    stmt = (
+        delete(Expense)
+        .where(*_expense_series_conditions(target_expense, from_mes))
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).rowcount
+
+
+def end_expense_recurrence(db: Session, target_expense: Expense, before_mes: date) -> date | None:
+    """
+    Desmarca recorrente na ultima ocorrencia da serie recorrente anterior a
+    before_mes, para que o RF-06 nao recrie os meses excluidos a partir dela,
+    e a marca como recorrencia_encerrada para que continue na serie (exclusao
+    de todas as ocorrencias). Nao faz commit. Retorna o mes alterado (ou None
+    se nao ha ocorrencia).
+    """
+    conditions = [*_expense_series_conditions(target_expense), Expense.mes_referencia < before_mes]
+    ultimo_mes = db.scalar(select(func.max(Expense.mes_referencia)).where(*conditions))
+    if ultimo_mes is None:
+        return None
+    db.execute(
+        update(Expense)
+        .where(*conditions, Expense.mes_referencia == ultimo_mes)
+        .values(recorrente=False, recorrencia_encerrada=True)
+        .execution_options(synchronize_session=False)
+    )
+    return ultimo_mes
 
 
 def count_expenses_by_month(db: Session, mes_referencia: date, user_id: str) -> int:
@@ -109,6 +206,139 @@ def expense_installment_exists(
     return db.scalars(stmt).first() is not None
 
 
+def get_expense_replication_sources(db: Session, mes_referencia: date, user_id: str) -> list[dict]:
+    """
+    RF-06: Retorna (como dicts) apenas as despesas do mes que podem gerar replica
+    no mes seguinte: parcelas nao finalizadas e recorrentes sem parcela.
+    """
+    stmt = (
+        select(
+            Expense.id,
+            Expense.nome,
+            Expense.categoria,
+            Expense.subcategoria,
+            Expense.valor,
+            Expense.vencimento,
+            Expense.parcela_atual,
+            Expense.parcela_total,
+            Expense.recorrente,
+            Expense.plan_id,
+        )
+        .where(
+            Expense.user_id == user_id,
+            Expense.mes_referencia == mes_referencia,
+            or_(
+                and_(
+                    Expense.parcela_atual.is_not(None),
+                    Expense.parcela_total.is_not(None),
+                    Expense.parcela_atual < Expense.parcela_total,
+                ),
+                and_(
+                    or_(Expense.parcela_atual.is_(None), Expense.parcela_total.is_(None)),
+                    Expense.recorrente == True,
+                ),
+            ),
+        )
+        .order_by(Expense.vencimento)
+    )
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+def get_last_populated_month(db: Session, user_id: str, before: date) -> date | None:
+    """RF-06: Ultimo mes anterior a 'before' com alguma despesa ou receita do usuario."""
+    meses = union_all(
+        select(func.max(Expense.mes_referencia).label("mes"))
+        .where(Expense.user_id == user_id, Expense.mes_referencia < before),
+        select(func.max(Income.mes_referencia).label("mes"))
+        .where(Income.user_id == user_id, Income.mes_referencia < before),
+    ).subquery()
+    return db.scalar(select(func.max(meses.c.mes)))
+
+
+def get_expense_replica_keys(
+    db: Session, target_mes: date, user_id: str
+) -> tuple[set[str], set[tuple[str, int, int]]]:
+    """
+    Carrega, em uma unica query, as chaves de deduplicacao das despesas do mes-alvo:
+    - origem_ids ja replicados
+    - (nome, parcela_atual, parcela_total) de parcelas ja existentes (CR-007 upfront)
+    """
+    stmt = (
+        select(Expense.origem_id, Expense.nome, Expense.parcela_atual, Expense.parcela_total)
+        .where(Expense.user_id == user_id, Expense.mes_referencia == target_mes)
+    )
+    origem_ids: set[str] = set()
+    parcelas: set[tuple[str, int, int]] = set()
+    for origem_id, nome, parcela_atual, parcela_total in db.execute(stmt):
+        if origem_id is not None:
+            origem_ids.add(origem_id)
+        if parcela_atual is not None and parcela_total is not None:
+            parcelas.add((nome, parcela_atual, parcela_total))
+    return origem_ids, parcelas
+
+
+def bulk_insert_expenses(db: Session, rows: list[dict]) -> None:
+    """Insere varias despesas com um unico INSERT Core (executemany). Nao faz commit."""
+    if rows:
+        db.execute(insert(Expense.__table__), rows)
+
+
+def get_overdue_pending_months(db: Session, user_id: str | None, today: date) -> dict[str, list[date]]:
+    """
+    RF-05: Meses (por usuario) com despesas Pendentes vencidas antes de today,
+    isto e, os meses afetados por mark_overdue_expenses. user_id=None: todos.
+    """
+    stmt = (
+        select(Expense.user_id, Expense.mes_referencia)
+        .where(
+            Expense.status == ExpenseStatus.PENDENTE.value,
+            Expense.vencimento < today,
+        )
+        .distinct()
+    )
+    if user_id is not None:
+        stmt = stmt.where(Expense.user_id == user_id)
+    meses: dict[str, list[date]] = {}
+    for row_user_id, mes in db.execute(stmt):
+        meses.setdefault(row_user_id, []).append(mes)
+    return meses
+
+
+def get_overdue_pending_plan_ids(db: Session, user_id: str | None, today: date) -> set[str]:
+    """Planos de parcelamento com parcelas afetadas por mark_overdue_expenses."""
+    stmt = (
+        select(Expense.plan_id)
+        .where(
+            Expense.status == ExpenseStatus.PENDENTE.value,
+            Expense.vencimento < today,
+            Expense.plan_id.is_not(None),
+        )
+        .distinct()
+    )
+    if user_id is not None:
+        stmt = stmt.where(Expense.user_id == user_id)
+    return set(db.scalars(stmt).all())
+
+
+def mark_overdue_expenses(db: Session, user_id: str | None, today: date) -> int:
+    """
+    RF-05: Marca como Atrasado, em um unico UPDATE, as despesas Pendentes com
+    vencimento < today. user_id=None varre todos os usuarios. Nao faz commit.
+    Retorna o numero de linhas alteradas.
+    """
+    stmt = (
+        update(Expense)
+        .where(
+            Expense.status == ExpenseStatus.PENDENTE.value,
+            Expense.vencimento < today,
+        )
+        .values(status=ExpenseStatus.ATRASADO.value)
+    )
+    if user_id is not None:
+        stmt = stmt.where(Expense.user_id == user_id)
+    return db.execute(stmt).rowcount
+
+
 # ========== Incomes ==========
 
 def get_incomes_by_month(db: Session, mes_referencia: date, user_id: str) -> list[Income]:
@@ -121,6 +351,22 @@ def get_incomes_by_month(db: Session, mes_referencia: date, user_id: str) -> lis
     return list(db.scalars(stmt).all())
 
 
+def get_incomes_by_month_range(
+    db: Session, from_mes: date, to_mes: date, user_id: str
+) -> list[Income]:
+    """Receitas de um usuario de from_mes ate to_mes (inclusive), em uma query."""
+    stmt = (
+        select(Income)
+        .where(
+            Income.user_id == user_id,
+            Income.mes_referencia >= from_mes,
+            Income.mes_referencia <= to_mes,
+        )
+        .order_by(Income.mes_referencia, Income.data)
+    )
+    return list(db.scalars(stmt).all())
+
+
 def get_income_by_id(db: Session, income_id: str, user_id: str) -> Income | None:
     """Retorna uma receita por ID se pertence ao usuario, ou None. (CR-002: ownership check)"""
     stmt = (
@@ -166,6 +412,89 @@ def income_replica_exists(
     return db.scalars(stmt).first() is not None
 
 
+def get_income_replication_sources(db: Session, mes_referencia: date, user_id: str) -> list[dict]:
+    """RF-06: Retorna (como dicts) as receitas recorrentes do mes, candidatas a replica."""
+    stmt = (
+        select(Income.id, Income.nome, Income.valor, Income.data, Income.recorrente)
+        .where(
+            Income.user_id == user_id,
+            Income.mes_referencia == mes_referencia,
+            Income.recorrente == True,
+        )
+        .order_by(Income.data)
+    )
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+def get_income_replica_origins(db: Session, target_mes: date, user_id: str) -> set[str]:
+    """Carrega, em uma unica query, os origem_ids de receitas ja replicadas no mes-alvo."""
+    stmt = (
+        select(Income.origem_id)
+        .where(
+            Income.user_id == user_id,
+            Income.mes_referencia == target_mes,
+            Income.origem_id.is_not(None),
+        )
+    )
+    return set(db.scalars(stmt).all())
+
+
+def bulk_insert_incomes(db: Session, rows: list[dict]) -> None:
+    """Insere varias receitas com um unico INSERT Core (executemany). Nao faz commit."""
+    if rows:
+        db.execute(insert(Income.__table__), rows)
+
+
+# ========== Month State (RF-06 watermark) ==========
+
+def get_month_states(
+    db: Session, user_id: str, meses: list[date], refresh: bool = False
+) -> dict[date, MonthState]:
+    """
+    Retorna os watermarks dos meses pedidos, indexados por mes_referencia (uma
+    query). refresh: sobrescreve os objetos ja carregados na sessao.
+    """
+    stmt = (
+        select(MonthState)
+        .where(MonthState.user_id == user_id, MonthState.mes_referencia.in_(meses))
+    )
+    if refresh:
+        stmt = stmt.execution_options(populate_existing=True)
+    return {state.mes_referencia: state for state in db.scalars(stmt).all()}
+
+
+def ensure_month_states(
+    db: Session, user_id: str, meses: list[date], states: dict[date, MonthState]
+) -> dict[date, MonthState]:
+    """
+    Completa states (ja carregados) com os watermarks que faltam entre meses,
+    criados com INSERT ... ON CONFLICT DO NOTHING: uma requisicao concorrente
+    que criou o mesmo mes nao causa IntegrityError em uq_month_state_user_month.
+    Novos watermarks comecam com source_version=0, como um mes sem watermark.
+    Nao faz commit.
+    """
+    missing = [mes for mes in meses if mes not in states]
+    if not missing:
+        return states
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    db.execute(
+        dialect_insert(MonthState.__table__).on_conflict_do_nothing(
+            index_elements=["user_id", "mes_referencia"]
+        ),
+        [{"user_id": user_id, "mes_referencia": mes, "source_version": 0} for mes in missing],
+    )
+    return {**states, **get_month_states(db, user_id, missing)}
+
+
+def lock_user_materialization(db: Session, user_id: str) -> None:
+    """
+    RF-06: SELECT ... FOR UPDATE na linha do usuario ate o commit, para que
+    materializacoes concorrentes do mesmo usuario rodem uma de cada vez (no
+    SQLite, sem FOR UPDATE, as escritas ja sao serializadas).
+    """
+    db.execute(select(User.id).where(User.id == user_id).with_for_update())
+
+
 # ========== Daily Expenses (CR-005) ==========
 
 def get_daily_expenses_by_month(db: Session, mes_referencia: date, user_id: str) -> list[DailyExpense]:
@@ -178,6 +507,22 @@ def get_daily_expenses_by_month(db: Session, mes_referencia: date, user_id: str)
     return list(db.scalars(stmt).all())
 
 
+def get_daily_expenses_by_month_range(
+    db: Session, from_mes: date, to_mes: date, user_id: str
+) -> list[DailyExpense]:
+    """Gastos diarios de um intervalo de meses, na ordem de get_daily_expenses_by_month em cada mes."""
+    stmt = (
+        select(DailyExpense)
+        .where(
+            DailyExpense.user_id == user_id,
+            DailyExpense.mes_referencia >= from_mes,
+            DailyExpense.mes_referencia <= to_mes,
+        )
+        .order_by(DailyExpense.mes_referencia, DailyExpense.data.desc(), DailyExpense.created_at.desc())
+    )
+    return list(db.scalars(stmt).all())
+
+
 def get_daily_expense_by_id(db: Session, daily_expense_id: str, user_id: str) -> DailyExpense | None:
     """Retorna um gasto diario por ID se pertence ao usuario."""
     stmt = (
@@ -221,6 +566,41 @@ def get_user_by_id(db: Session, user_id: str) -> User | None:
     return db.get(User, user_id)
 
 
+def get_user_ids_chunk(db: Session, after_id: str | None, limit: int) -> list[str]:
+    """Retorna ate 'limit' IDs de usuario em ordem, apos 'after_id' (paginacao keyset)."""
+    stmt = select(User.id).order_by(User.id).limit(limit)
+    if after_id is not None:
+        stmt = stmt.where(User.id > after_id)
+    return list(db.scalars(stmt).all())
+
+
+def set_status_sweep_date_all_users(db: Session, today: date) -> int:
+    """RF-05: Registra a varredura de atraso do dia para todos os usuarios. Nao faz commit."""
+    stmt = (
+        update(User)
+        .where(or_(User.status_sweep_date.is_(None), User.status_sweep_date != today))
+        .values(status_sweep_date=today)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).rowcount
+
+
+def increment_data_versions(db: Session, user_ids: set[str]) -> None:
+    """
+    Incrementa users.data_version dos usuarios informados em um unico UPDATE
+    (ETags e score, ver app.etag), para gravacoes em lote fora do contexto de
+    um usuario. Nao faz commit.
+    """
+    if not user_ids:
+        return
+    db.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(data_version=User.data_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
 def get_user_by_google_id(db: Session, google_id: str) -> User | None:
     """Retorna usuario por Google ID ou None."""
     stmt = select(User).where(User.google_id == google_id)
@@ -274,144 +654,578 @@ def delete_user_refresh_tokens(db: Session, user_id: str) -> None:
 
 
 # ========== Dashboard Aggregates (CR-019) ==========
+# Leituras no read model monthly_rollup (mantido pelas escritas; ver Monthly Rollup).
+
+def _rollup_sum(db: Session, user_id: str, mes_referencia: date, tipo: RollupTipo) -> Decimal:
+    stmt = (
+        select(func.coalesce(func.sum(MonthlyRollup.total), 0))
+        .where(
+            MonthlyRollup.user_id == user_id,
+            MonthlyRollup.mes_referencia == mes_referencia,
+            MonthlyRollup.tipo == tipo.value,
+        )
+    )
+    return Decimal(str(db.scalar(stmt) or 0))
+
 
 def get_expense_total_by_month(db: Session, mes_referencia: date, user_id: str) -> float:
-    """Retorna soma total de despesas planejadas de um usuario em um mes (query agregada)."""
+    """Retorna soma total de despesas planejadas de um usuario em um mes (rollup)."""
+    return round(float(_rollup_sum(db, user_id, mes_referencia, RollupTipo.DESPESA)), 2)
+
+
+def get_expense_totals_by_status(db: Session, mes_referencia: date, user_id: str) -> dict[str, Decimal]:
+    """
+    RF-04/CR-004: Soma exata (Decimal) das despesas do mes por status,
+    em uma unica query SUM ... GROUP BY status sobre o rollup.
+    """
     stmt = (
-        select(func.coalesce(func.sum(Expense.valor), 0))
-        .where(Expense.user_id == user_id, Expense.mes_referencia == mes_referencia)
+        select(MonthlyRollup.status, func.sum(MonthlyRollup.total))
+        .where(
+            MonthlyRollup.user_id == user_id,
+            MonthlyRollup.mes_referencia == mes_referencia,
+            MonthlyRollup.tipo == RollupTipo.DESPESA.value,
+        )
+        .group_by(MonthlyRollup.status)
     )
-    return round(float(db.scalar(stmt) or 0), 2)
+    return {status: Decimal(str(total)) for status, total in db.execute(stmt)}
+
+
+def get_income_sum_by_month(db: Session, mes_referencia: date, user_id: str) -> Decimal:
+    """Soma exata (Decimal) das receitas de um usuario em um mes (rollup)."""
+    return _rollup_sum(db, user_id, mes_referencia, RollupTipo.RECEITA)
 
 
 def get_income_total_by_month(db: Session, mes_referencia: date, user_id: str) -> float:
-    """Retorna soma total de receitas de um usuario em um mes (query agregada)."""
+    """Retorna soma total de receitas de um usuario em um mes (rollup)."""
+    return round(float(_rollup_sum(db, user_id, mes_referencia, RollupTipo.RECEITA)), 2)
+
+
+_SERIES_KEYS = {
+    RollupTipo.DESPESA.value: "total_despesas",
+    RollupTipo.RECEITA.value: "total_receitas",
+    RollupTipo.GASTO_DIARIO.value: "total_gastos_diarios",
+}
+
+
+def get_monthly_totals_series(
+    db: Session, user_id: str, from_mes: date, to_mes: date
+) -> dict[date, dict[str, float]]:
+    """
+    CR-019: Totais por mes (despesas planejadas, receitas, gastos diarios) de
+    from_mes ate to_mes, em uma unica query SUM ... GROUP BY mes, tipo sobre o
+    rollup. Meses sem dados ficam ausentes.
+    """
     stmt = (
-        select(func.coalesce(func.sum(Income.valor), 0))
-        .where(Income.user_id == user_id, Income.mes_referencia == mes_referencia)
+        select(MonthlyRollup.tipo, MonthlyRollup.mes_referencia, func.sum(MonthlyRollup.total))
+        .where(
+            MonthlyRollup.user_id == user_id,
+            MonthlyRollup.mes_referencia >= from_mes,
+            MonthlyRollup.mes_referencia <= to_mes,
+        )
+        .group_by(MonthlyRollup.tipo, MonthlyRollup.mes_referencia)
     )
-    return round(float(db.scalar(stmt) or 0), 2)
+    series: dict[date, dict[str, float]] = {}
+    for tipo, mes, total in db.execute(stmt):
+        series.setdefault(mes, {})[_SERIES_KEYS[tipo]] = round(float(total or 0), 2)
+    return series
 
 
 def get_daily_expense_total_by_month(db: Session, mes_referencia: date, user_id: str) -> float:
-    """Retorna soma total de gastos diarios de um usuario em um mes (query agregada)."""
+    """Retorna soma total de gastos diarios de um usuario em um mes (rollup)."""
+    return round(float(_rollup_sum(db, user_id, mes_referencia, RollupTipo.GASTO_DIARIO)), 2)
+
+
+# ========== Category Breakdown (CR-019) ==========
+
+_BREAKDOWN_MODELS = {"planejadas": Expense, "diarios": DailyExpense}
+CATEGORIA_SEM_NOME = "Outros"
+
+
+def get_category_totals(
+    db: Session,
+    tipo: str,
+    mes_referencia: date,
+    user_id: str,
+    categoria: str | None = None,
+) -> list[tuple[str, Decimal, int]]:
+    """
+    CR-019: (grupo, total, count) das despesas planejadas (tipo="planejadas") ou
+    gastos diarios (tipo="diarios") do mes, via SUM/COUNT ... GROUP BY, sem
+    carregar linhas. Sem 'categoria': agrupa por categoria. Com 'categoria':
+    restringe a ela e agrupa por subcategoria (drill-down). Nulos e vazios viram
+    "Outros".
+    """
+    model = _BREAKDOWN_MODELS[tipo]
+    categoria_expr = func.coalesce(func.nullif(model.categoria, ""), CATEGORIA_SEM_NOME)
+    conditions = [model.user_id == user_id, model.mes_referencia == mes_referencia]
+    if categoria is None:
+        group_expr = categoria_expr
+    else:
+        conditions.append(categoria_expr == categoria)
+        group_expr = func.coalesce(func.nullif(model.subcategoria, ""), CATEGORIA_SEM_NOME)
     stmt = (
-        select(func.coalesce(func.sum(DailyExpense.valor), 0))
-        .where(DailyExpense.user_id == user_id, DailyExpense.mes_referencia == mes_referencia)
+        select(group_expr, func.sum(model.valor), func.count())
+        .where(*conditions)
+        .group_by(group_expr)
+    )
+    return [(grupo, Decimal(str(total)), count) for grupo, total, count in db.execute(stmt)]
+
+
+# ========== Monthly Rollup (read model) ==========
+
+def aggregate_monthly_rollup(
+    db: Session | Connection,
+    user_id: str | None = None,
+    meses: list[date] | None = None,
+) -> list[dict]:
+    """
+    Calcula a partir das tabelas brutas as linhas do rollup (sem id), em uma
+    unica query UNION ALL. user_id/meses None = todos.
+    """
+    def grouped(model, tipo: RollupTipo, status_col, categoria_col):
+        conditions = []
+        if user_id is not None:
+            conditions.append(model.user_id == user_id)
+        if meses is not None:
+            conditions.append(model.mes_referencia.in_(meses))
+        status_expr = func.coalesce(status_col, "") if status_col is not None else literal("")
+        categoria_expr = func.coalesce(categoria_col, "") if categoria_col is not None else literal("")
+        group_by = [model.user_id, model.mes_referencia]
+        # Agrupa pelas expressoes gravadas: NULL e "" caem na mesma linha
+        group_by += [expr for col, expr in ((status_col, status_expr), (categoria_col, categoria_expr))
+                     if col is not None]
+        return (
+            select(
+                model.user_id.label("user_id"),
+                model.mes_referencia.label("mes_referencia"),
+                literal(tipo.value).label("tipo"),
+                status_expr.label("status"),
+                categoria_expr.label("categoria"),
+                func.sum(model.valor).label("total"),
+                func.count().label("quantidade"),
+            )
+            .where(*conditions)
+            .group_by(*group_by)
+        )
+
+    stmt = union_all(
+        grouped(Expense, RollupTipo.DESPESA, Expense.status, Expense.categoria),
+        grouped(Income, RollupTipo.RECEITA, None, None),
+        grouped(DailyExpense, RollupTipo.GASTO_DIARIO, None, DailyExpense.categoria),
     )
-    return round(float(db.scalar(stmt) or 0), 2)
+    return [
+        {**row, "total": Decimal(str(row["total"] or 0))}
+        for row in db.execute(stmt).mappings()
+    ]
+
+
+def refresh_monthly_rollup(db: Session, user_id: str, meses: list[date]) -> None:
+    """
+    Recalcula as linhas do rollup dos meses informados (delete + agregacao +
+    INSERT em lote), na transacao corrente. Nao faz commit; seguro dentro de
+    eventos de flush (usa a conexao da sessao diretamente).
+    """
+    if not meses:
+        return
+    conn = db.connection()
+    conn.execute(
+        delete(MonthlyRollup.__table__).where(
+            MonthlyRollup.user_id == user_id,
+            MonthlyRollup.mes_referencia.in_(meses),
+        )
+    )
+    rows = aggregate_monthly_rollup(conn, user_id, meses)
+    if rows:
+        conn.execute(
+            insert(MonthlyRollup.__table__),
+            [{**row, "id": str(uuid.uuid4())} for row in rows],
+        )
+
+
+def get_monthly_rollup_rows(db: Session, user_id: str | None = None) -> list[dict]:
+    """Linhas gravadas do rollup (sem id), para verificacao contra as tabelas brutas."""
+    stmt = select(
+        MonthlyRollup.user_id,
+        MonthlyRollup.mes_referencia,
+        MonthlyRollup.tipo,
+        MonthlyRollup.status,
+        MonthlyRollup.categoria,
+        MonthlyRollup.total,
+        MonthlyRollup.quantidade,
+    )
+    if user_id is not None:
+        stmt = stmt.where(MonthlyRollup.user_id == user_id)
+    return [
+        {**row, "total": Decimal(str(row["total"]))}
+        for row in db.execute(stmt).mappings()
+    ]
 
 
 # ========== Installments (CR-007) ==========
 
+def installment_plan_row(
+    user_id: str,
+    nome: str,
+    valor,
+    parcela_total: int,
+    parcela_atual: int | None,
+    vencimento: date,
+) -> dict:
+    """
+    Colunas de uma compra parcelada a partir de uma de suas parcelas
+    (parcela_atual com vencimento). O id e gerado aqui para que as parcelas
+    possam referencia-lo antes de qualquer INSERT.
+    """
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "nome": nome,
+        "valor": valor,
+        "parcela_total": parcela_total,
+        "primeiro_vencimento": add_months(vencimento, -((parcela_atual or 1) - 1)),
+    }
+
+
+def add_installment_plan(
+    db: Session,
+    user_id: str,
+    nome: str,
+    valor,
+    parcela_total: int,
+    parcela_atual: int | None,
+    vencimento: date,
+) -> InstallmentPlan:
+    """Registra uma compra parcelada (ver installment_plan_row). Nao faz commit."""
+    plan = InstallmentPlan(
+        **installment_plan_row(user_id, nome, valor, parcela_total, parcela_atual, vencimento)
+    )
+    db.add(plan)
+    return plan
+
+
+def bulk_insert_installment_plans(db: Session, rows: list[dict]) -> None:
+    """Insere varias compras parceladas com um unico INSERT Core (executemany). Nao faz commit."""
+    if rows:
+        db.execute(insert(InstallmentPlan.__table__), rows)
+
+
+_PLAN_REFRESH_CHUNK = 500
+
+
+def refresh_installment_plans(db: Session, plan_ids) -> None:
+    """
+    Recalcula os contadores dos planos informados a partir das parcelas
+    (parcela_total > 1) em um GROUP BY e grava com um UPDATE em lote.
+    Planos sem parcelas ficam zerados. Nao faz commit; seguro dentro de
+    eventos de flush (usa a conexao da sessao diretamente).
+    """
+    plan_ids = sorted(plan_ids)
+    if not plan_ids:
+        return
+    conn = db.connection()
+    pago = Expense.status == ExpenseStatus.PAGO.value
+    for start in range(0, len(plan_ids), _PLAN_REFRESH_CHUNK):
+        chunk = plan_ids[start:start + _PLAN_REFRESH_CHUNK]
+        stmt = (
+            select(
+                Expense.plan_id,
+                func.count().label("quantidade"),
+                func.coalesce(func.sum(case((pago, 1), else_=0)), 0).label("parcelas_pagas"),
+                func.coalesce(
+                    func.max(case((pago, func.coalesce(Expense.parcela_atual, 0)), else_=0)), 0
+                ).label("ultima_parcela_paga"),
+                func.coalesce(func.sum(Expense.valor), 0).label("valor_total"),
+                func.coalesce(func.sum(case((pago, Expense.valor), else_=0)), 0).label("valor_pago"),
+                func.coalesce(func.sum(case(
+                    (Expense.status == ExpenseStatus.PENDENTE.value, Expense.valor), else_=0
+                )), 0).label("valor_pendente"),
+                func.coalesce(func.sum(case(
+                    (Expense.status == ExpenseStatus.ATRASADO.value, Expense.valor), else_=0
+                )), 0).label("valor_atrasado"),
+            )
+            .where(Expense.plan_id.in_(chunk), Expense.parcela_total > 1)
+            .group_by(Expense.plan_id)
+        )
+        counters = {row["plan_id"]: row for row in conn.execute(stmt).mappings()}
+        params = []
+        for plan_id in chunk:
+            row = counters.get(plan_id)
+            params.append({
+                "b_id": plan_id,
+                "quantidade": row["quantidade"] if row else 0,
+                "parcelas_pagas": row["parcelas_pagas"] if row else 0,
+                "ultima_parcela_paga": row["ultima_parcela_paga"] if row else 0,
+                "valor_total": row["valor_total"] if row else 0,
+                "valor_pago": row["valor_pago"] if row else 0,
+                "valor_pendente": row["valor_pendente"] if row else 0,
+                "valor_atrasado": row["valor_atrasado"] if row else 0,
+            })
+        plans = InstallmentPlan.__table__
+        conn.execute(update(plans).where(plans.c.id == bindparam("b_id")), params)
+
+
+def _plan_group(plan: InstallmentPlan) -> dict:
+    """Grupo (ainda nao formatado) a partir dos contadores do plano."""
+    return {
+        "plan_id": plan.id,
+        "nome": plan.nome,
+        "parcela_total": plan.parcela_total,
+        "primeiro_vencimento": plan.primeiro_vencimento,
+        "installments": [],
+        "quantidade": plan.quantidade,
+        "parcelas_pagas": plan.parcelas_pagas,
+        "ultima_parcela_paga": plan.ultima_parcela_paga,
+        "valor_total_compra": Decimal(plan.valor_total),
+        "valor_pago": Decimal(plan.valor_pago),
+        "valor_pendente": Decimal(plan.valor_pendente),
+        "valor_atrasado": Decimal(plan.valor_atrasado),
+    }
+
+
+def _format_installment_group(g: dict) -> dict:
+    """Formata um grupo para o schema InstallmentGroup (status geral e valores arredondados)."""
+    valor_restante = g["valor_total_compra"] - g["valor_pago"]
+    tem_pendencia = g["quantidade"] > g["parcelas_pagas"]
+
+    # Determinar status geral do grupo
+    if valor_restante == 0 and not tem_pendencia:
+        status_geral = "Concluído"
+    else:
+        status_geral = "Em andamento"
+
+    return {
+        "plan_id": g["plan_id"],
+        "nome": g["nome"],
+        "parcela_total": g["parcela_total"],
+        "status_geral": status_geral,
+        "primeiro_vencimento": g["primeiro_vencimento"],
+        "valor_total_compra": round(float(g["valor_total_compra"]), 2),
+        "valor_pago": round(float(g["valor_pago"]), 2),
+        "valor_restante": round(float(valor_restante), 2),
+        "quantidade": g["quantidade"],
+        "parcelas_pagas": g["parcelas_pagas"],
+        "ultima_parcela_paga": g["ultima_parcela_paga"],
+        "installments": g["installments"]
+    }
+
+
+# Literais (nao parametros) para o planner casar o filtro com o indice parcial
+# ix_expenses_installments_without_plan, que tambem entrega a ordem por vencimento
+_IS_INSTALLMENT = Expense.parcela_total > literal_column("1")
+_WITHOUT_PLAN = Expense.plan_id.is_(None)
+
+
 def get_installment_expenses_grouped(db: Session, user_id: str) -> dict:
     """
-    Busca todas as despesas parceladas do usuario e agrupa por nome/total de parcelas.
+    Busca as despesas parceladas do usuario agrupadas por compra.
+    Valores de cada grupo e totais globais vem dos contadores de
+    installment_plans (uma linha por compra); as parcelas dos planos vem de
+    uma query por plan_id, sem percorrer o historico do usuario. Parcelas sem
+    plano (legado) sao agrupadas por nome/total de parcelas e somadas em memoria.
     Retorna dicionario com estrutura pronta para o schema InstallmentsResponse.
     """
-    # 1. Buscar todas as despesas parceladas (parcela_total > 1)
+    # 1. Resumo por compra (contadores mantidos pelas escritas)
+    plans = db.scalars(
+        select(InstallmentPlan).where(
+            InstallmentPlan.user_id == user_id,
+            InstallmentPlan.quantidade > 0,
+        ).execution_options(populate_existing=True)  # contadores sao gravados via Core
+    ).all()
+    groups_map = {plan.id: _plan_group(plan) for plan in plans}
+
+    # 2. Parcelas (parcela_total > 1) dos planos, em ordem de vencimento
+    if groups_map:
+        installments = db.scalars(
+            select(Expense)
+            .where(Expense.plan_id.in_(list(groups_map)), Expense.parcela_total > 1)
+            .order_by(Expense.vencimento)
+        )
+        for exp in installments:
+            groups_map[exp.plan_id]["installments"].append(exp)
+
+    # 3. Parcelas sem plano (legado): agrupadas pelo nome normalizado
     stmt = (
         select(Expense)
-        .where(
-            Expense.user_id == user_id,
-            Expense.parcela_total > 1
-        )
+        .where(Expense.user_id == user_id, _IS_INSTALLMENT, _WITHOUT_PLAN)
         .order_by(Expense.vencimento)
     )
-    expenses = list(db.scalars(stmt).all())
-
-    # 2. Agrupar em memoria
-    # Chave do grupo: (nome_normalizado, parcela_total) para diferenciar
-    # "Compra X (10x)" de "Compra X (5x)" se tiverem mesmo nome
-    groups_map = {}
-    
-    # Totais globais
-    global_gasto = 0.0
-    global_pago = 0.0
-    global_pendente = 0.0
-    global_atrasado = 0.0
-
-    from app.models import ExpenseStatus
-
-    for exp in expenses:
-        # Normalizar chave
+    for exp in db.scalars(stmt):
         key = (exp.nome.strip().lower(), exp.parcela_total)
-        
-        if key not in groups_map:
-            groups_map[key] = {
+        group = groups_map.get(key)
+        if group is None:
+            group = groups_map[key] = {
+                "plan_id": None,
                 "nome": exp.nome,  # Mantem casing original do primeiro
                 "parcela_total": exp.parcela_total,
+                "primeiro_vencimento": exp.vencimento,
                 "installments": [],
-                "valor_total_compra": 0.0,
-                "valor_pago": 0.0,
-                "valor_restante": 0.0,
-                "tem_pendencia": False
+                "quantidade": 0,
+                "parcelas_pagas": 0,
+                "ultima_parcela_paga": 0,
+                "valor_total_compra": Decimal(0),
+                "valor_pago": Decimal(0),
+                "valor_pendente": Decimal(0),
+                "valor_atrasado": Decimal(0),
             }
-        
-        group = groups_map[key]
         group["installments"].append(exp)
-        
-        # Somar valores
-        val = float(exp.valor)
-        group["valor_total_compra"] += val
-        
-        if exp.status == ExpenseStatus.PAGO.value:
-            group["valor_pago"] += val
-        else:
-            group["valor_restante"] += val
-            group["tem_pendencia"] = True
-            
-        # Totais globais
-        global_gasto += val
+
+        # Sem contadores: somar as parcelas
+        valor = Decimal(exp.valor)
+        group["quantidade"] += 1
+        group["valor_total_compra"] += valor
         if exp.status == ExpenseStatus.PAGO.value:
-            global_pago += val
+            group["parcelas_pagas"] += 1
+            group["ultima_parcela_paga"] = max(group["ultima_parcela_paga"], exp.parcela_atual or 0)
+            group["valor_pago"] += valor
         elif exp.status == ExpenseStatus.PENDENTE.value:
-            global_pendente += val
+            group["valor_pendente"] += valor
         elif exp.status == ExpenseStatus.ATRASADO.value:
-            global_atrasado += val
             # Atrasado tambem conta como pendente no 'restante' do grupo, mas separadamente no global
+            group["valor_atrasado"] += valor
 
-    # 3. Formatar lista de grupos
+    # 4. Formatar lista de grupos
     final_groups = []
-    
-    # Ordenar grupos pelo input mais recente (vencimento da ultima parcela ou similar)
-    # Por simplicidade, vamos ordenar por nome
-    sorted_keys = sorted(groups_map.keys(), key=lambda k: k[0])
-    
-    for key in sorted_keys:
-        g = groups_map[key]
-        
-        # Determinar status geral do grupo
-        if g["valor_restante"] == 0 and not g["tem_pendencia"]:
-            status_geral = "Concluído"
-        else:
-            status_geral = "Em andamento"
-            
-        final_groups.append({
-            "nome": g["nome"],
-            "parcela_total": g["parcela_total"],
-            "status_geral": status_geral,
-            "valor_total_compra": round(g["valor_total_compra"], 2),
-            "valor_pago": round(g["valor_pago"], 2),
-            "valor_restante": round(g["valor_restante"], 2),
-            "installments": g["installments"]
-        })
+    global_gasto = global_pago = global_pendente = global_atrasado = Decimal(0)
+
+    # Ordenar por nome; compras homonimas ficam na ordem do primeiro vencimento
+    sorted_groups = sorted(
+        groups_map.values(), key=lambda g: (g["nome"].strip().lower(), g["primeiro_vencimento"])
+    )
+
+    for g in sorted_groups:
+        global_gasto += g["valor_total_compra"]
+        global_pago += g["valor_pago"]
+        global_pendente += g["valor_pendente"]
+        global_atrasado += g["valor_atrasado"]
+        final_groups.append(_format_installment_group(g))
 
     return {
         "groups": final_groups,
-        "total_gasto": round(global_gasto, 2),
-        "total_pago": round(global_pago, 2),
-        "total_pendente": round(global_pendente, 2),
-        "total_atrasado": round(global_atrasado, 2)
+        "total_gasto": round(float(global_gasto), 2),
+        "total_pago": round(float(global_pago), 2),
+        "total_pendente": round(float(global_pendente), 2),
+        "total_atrasado": round(float(global_atrasado), 2)
+    }
+
+
+# Ordem das listagens paginadas: nome normalizado, primeiro vencimento, id
+_PLAN_SORT_NOME = func.lower(func.trim(InstallmentPlan.nome))
+
+
+def _plan_status_clause(status: str):
+    """Filtro SQL equivalente ao status_geral calculado em _format_installment_group."""
+    em_andamento = or_(
+        InstallmentPlan.quantidade > InstallmentPlan.parcelas_pagas,
+        InstallmentPlan.valor_total != InstallmentPlan.valor_pago,
+    )
+    return em_andamento if status == "Em andamento" else not_(em_andamento)
+
+
+def get_installment_groups_page(
+    db: Session,
+    user_id: str,
+    status: str | None = None,
+    after: tuple[str, date, str] | None = None,
+    limit: int | None = None,
+    include_installments: bool = True,
+) -> list[tuple[dict, tuple[str, date, str]]]:
+    """
+    Pagina de grupos de parcelas lida de installment_plans: filtro por
+    status_geral, ordenacao e keyset (after = chave de ordenacao do ultimo
+    grupo da pagina anterior) no SQL. As parcelas sao carregadas so para os
+    planos da pagina, e apenas se include_installments.
+    Retorna (grupo formatado, chave de ordenacao) para montar o cursor.
+    """
+    sort_key = (_PLAN_SORT_NOME, InstallmentPlan.primeiro_vencimento, InstallmentPlan.id)
+    stmt = (
+        select(InstallmentPlan, _PLAN_SORT_NOME.label("nome_ordem"))
+        .where(InstallmentPlan.user_id == user_id, InstallmentPlan.quantidade > 0)
+        .order_by(*sort_key)
+        .execution_options(populate_existing=True)  # contadores sao gravados via Core
+    )
+    if status is not None:
+        stmt = stmt.where(_plan_status_clause(status))
+    if after is not None:
+        stmt = stmt.where(tuple_(*sort_key) > tuple_(*after))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    rows = db.execute(stmt).all()
+
+    groups = {plan.id: _plan_group(plan) for plan, _ in rows}
+    if include_installments and groups:
+        installments = db.scalars(
+            select(Expense)
+            .where(Expense.plan_id.in_(list(groups)), Expense.parcela_total > 1)
+            .order_by(Expense.vencimento)
+        )
+        for exp in installments:
+            groups[exp.plan_id]["installments"].append(exp)
+
+    return [
+        (_format_installment_group(groups[plan.id]), (nome_ordem, plan.primeiro_vencimento, plan.id))
+        for plan, nome_ordem in rows
+    ]
+
+
+def get_installment_plan_totals(db: Session, user_id: str, status: str | None = None) -> dict:
+    """Totais globais (gasto, pago, pendente, atrasado) somando os contadores dos planos."""
+    stmt = select(
+        func.coalesce(func.sum(InstallmentPlan.valor_total), 0),
+        func.coalesce(func.sum(InstallmentPlan.valor_pago), 0),
+        func.coalesce(func.sum(InstallmentPlan.valor_pendente), 0),
+        func.coalesce(func.sum(InstallmentPlan.valor_atrasado), 0),
+    ).where(InstallmentPlan.user_id == user_id, InstallmentPlan.quantidade > 0)
+    if status is not None:
+        stmt = stmt.where(_plan_status_clause(status))
+    gasto, pago, pendente, atrasado = db.execute(stmt).one()
+    return {
+        "total_gasto": round(float(gasto), 2),
+        "total_pago": round(float(pago), 2),
+        "total_pendente": round(float(pendente), 2),
+        "total_atrasado": round(float(atrasado), 2),
     }
 
 
+def get_installment_remaining_total(db: Session, user_id: str) -> Decimal:
+    """
+    Valor restante de todas as parcelas em aberto (parcela_total > 1, status != Pago).
+    Equivale a somar valor_restante dos grupos "Em andamento" de
+    get_installment_expenses_grouped, mas em um unico SUM coberto por
+    ix_expenses_user_parcela.
+    """
+    stmt = select(func.coalesce(func.sum(Expense.valor), 0)).where(
+        Expense.user_id == user_id,
+        Expense.parcela_total > 1,
+        Expense.status != ExpenseStatus.PAGO.value,
+    )
+    return Decimal(str(db.scalar(stmt) or 0))
+
+
 # ========== Score Historico (CR-026) ==========
 
+_SCORE_HISTORICO_FIELDS = (
+    "score_total", "d1_comprometimento", "d2_parcelas", "d3_poupanca",
+    "d4_comportamento", "classificacao", "score_conservador",
+)
+
+
+def _score_historico_matches(record: ScoreHistorico, score_data: dict) -> bool:
+    """True se o registro ja guarda exatamente os valores de score_data."""
+    import json
+
+    if any(getattr(record, field) != score_data.get(field) for field in _SCORE_HISTORICO_FIELDS):
+        return False
+    snapshot = json.loads(record.dados_snapshot) if record.dados_snapshot else {}
+    return snapshot == json.loads(json.dumps(score_data.get("dados_snapshot", {})))
+
+
 def upsert_score_historico(
     db: Session, user_id: str, mes_referencia: date, score_data: dict
 ) -> ScoreHistorico:
-    """Insere ou atualiza o score do mes para o usuario."""
+    """
+    Insere ou atualiza o score do mes para o usuario. Se o registro existente
+    ja tem os mesmos valores, nada e gravado (sem UPDATE nem commit).
+    """
     import json
     import uuid
 
@@ -422,6 +1236,8 @@ def upsert_score_historico(
     existing = db.scalars(stmt).first()
 
     if existing:
+        if _score_historico_matches(existing, score_data):
+            return existing
         existing.score_total = score_data["score_total"]
         existing.d1_comprometimento = score_data["d1_comprometimento"]
         existing.d2_parcelas = score_data["d2_parcelas"]
@@ -475,6 +1291,199 @@ def get_score_by_month(db: Session, user_id: str, mes_referencia: date) -> Score
     return db.scalars(stmt).first()
 
 
+def get_score_cache(db: Session, user_id: str) -> ScoreCache | None:
+    """Ultima resposta gravada de GET /api/score do usuario, com seu fingerprint."""
+    return db.scalars(select(ScoreCache).where(ScoreCache.user_id == user_id)).first()
+
+
+def upsert_score_cache(
+    db: Session, user_id: str, data_version: int, calculado_em: date, resposta: str
+) -> None:
+    """
+    Grava a resposta de GET /api/score e seu fingerprint, substituindo a
+    anterior (INSERT ... ON CONFLICT DO UPDATE, sem leitura previa).
+    """
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    values = {"data_version": data_version, "calculado_em": calculado_em, "resposta": resposta}
+    db.execute(
+        dialect_insert(ScoreCache.__table__)
+        .values(user_id=user_id, **values)
+        .on_conflict_do_update(index_elements=["user_id"], set_=values)
+    )
+    db.commit()
+
+
+def get_first_data_month(db: Session, user_id: str) -> date | None:
+    """Primeiro mes com despesa, receita ou gasto diario do usuario (None se nao ha dados)."""
+    firsts = union_all(*(
+        select(func.min(model.mes_referencia).label("mes")).where(model.user_id == user_id)
+        for model in (Expense, Income, DailyExpense)
+    )).subquery()
+    return db.scalar(select(func.min(firsts.c.mes)))
+
+
+def get_score_historico_map(db: Session, user_id: str) -> dict[date, ScoreHistorico]:
+    """Todos os scores gravados do usuario, por mes de referencia."""
+    stmt = select(ScoreHistorico).where(ScoreHistorico.user_id == user_id)
+    return {record.mes_referencia: record for record in db.scalars(stmt)}
+
+
+def bulk_upsert_score_historico(
+    db: Session, user_id: str, scores: dict[date, dict], existing: dict[date, ScoreHistorico]
+) -> tuple[int, int]:
+    """
+    Grava os scores de varios meses: um INSERT (executemany) para os meses sem
+    registro e um UPDATE (executemany) para os que mudaram; registros iguais
+    nao sao tocados. existing: retorno de get_score_historico_map. Nao faz
+    commit. Retorna (inseridos, atualizados).
+    """
+    import json
+    import uuid
+
+    inserts, updates = [], []
+    for mes, score_data in scores.items():
+        values = {field: score_data.get(field) for field in _SCORE_HISTORICO_FIELDS}
+        values["dados_snapshot"] = json.dumps(score_data.get("dados_snapshot", {}))
+        record = existing.get(mes)
+        if record is None:
+            inserts.append({
+                **values, "id": str(uuid.uuid4()), "user_id": user_id,
+                "mes_referencia": mes, "created_at": datetime.now(),
+            })
+        elif not _score_historico_matches(record, score_data):
+            updates.append({**values, "b_id": record.id})
+            db.expire(record)  # UPDATE via Core: recarregar no proximo acesso
+
+    table = ScoreHistorico.__table__
+    if inserts:
+        db.execute(insert(table), inserts)
+    if updates:
+        db.execute(update(table).where(table.c.id == bindparam("b_id")), updates)
+    return len(inserts), len(updates)
+
+
+# ========== Score em lote (colunar) ==========
+
+# Usuario-mes alvo do score em lote: tabela temporaria da conexao, carregada
+# com um executemany. Um VALUES com milhares de linhas custa mais para compilar
+# (e nao entra no cache de compilacao) do que as proprias queries.
+_score_alvo = Table(
+    "score_alvo", MetaData(),
+    Column("i", Integer, primary_key=True),
+    Column("user_id", String(36), nullable=False),
+    Column("mes", Date, nullable=False),
+    Column("mes_anterior", Date, nullable=False),
+    Column("hist_inicio", Date, nullable=False),
+    prefixes=["TEMPORARY"],
+)
+
+
+def get_score_column_rows(db: Session, user_months: list[tuple[str, date]]) -> dict[str, list]:
+    """
+    Linhas do Core para health_score.build_score_columns_from_rows de varios
+    (user_id, mes): os usuario-mes entram na tabela temporaria score_alvo e
+    cada query (Core, sem carregamento ORM) junta as tabelas pelos indices de
+    (user_id, mes_referencia), ja na ordem de score_inputs. Cada linha traz a
+    posicao i em user_months (parcelas: g, a posicao do grupo). Le os dados
+    como estao gravados (sem replicacao nem varredura de atraso); parcelas
+    apenas de planos.
+    months: (mes, renda, dados_snapshot do mes anterior), uma por usuario-mes.
+    """
+    conn = db.connection()
+    _score_alvo.create(conn, checkfirst=True)
+    conn.execute(delete(_score_alvo))
+    if user_months:
+        conn.execute(insert(_score_alvo), [
+            {"i": i, "user_id": user_id, "mes": mes,
+             "mes_anterior": add_months(mes, -1), "hist_inicio": add_months(mes, -3)}
+            for i, (user_id, mes) in enumerate(user_months)
+        ])
+    alvo = _score_alvo
+    rows: dict[str, list] = {}
+
+    renda = (
+        select(type_coerce(func.sum(Income.valor), Float))
+        .where(Income.user_id == alvo.c.user_id, Income.mes_referencia == alvo.c.mes)
+        .scalar_subquery()
+    )
+    rows["months"] = conn.execute(
+        select(alvo.c.mes, renda, ScoreHistorico.dados_snapshot)
+        .outerjoin(ScoreHistorico, and_(
+            ScoreHistorico.user_id == alvo.c.user_id,
+            ScoreHistorico.mes_referencia == alvo.c.mes_anterior,
+        ))
+        .order_by(alvo.c.i)
+    ).all()
+    rows["expenses"] = conn.execute(
+        select(alvo.c.i, type_coerce(Expense.valor, Float), Expense.status)
+        .join(Expense, and_(Expense.user_id == alvo.c.user_id, Expense.mes_referencia == alvo.c.mes))
+        .order_by(alvo.c.i, Expense.vencimento)
+    ).all()
+    rows["daily"] = conn.execute(
+        select(alvo.c.i, type_coerce(DailyExpense.valor, Float), DailyExpense.data)
+        .join(DailyExpense, and_(
+            DailyExpense.user_id == alvo.c.user_id, DailyExpense.mes_referencia == alvo.c.mes,
+        ))
+        .order_by(alvo.c.i, DailyExpense.data.desc(), DailyExpense.created_at.desc())
+    ).all()
+    total = func.sum(DailyExpense.valor)
+    rows["history"] = conn.execute(
+        select(alvo.c.i, type_coerce(total, Float))
+        .join(DailyExpense, and_(
+            DailyExpense.user_id == alvo.c.user_id,
+            DailyExpense.mes_referencia >= alvo.c.hist_inicio,
+            DailyExpense.mes_referencia < alvo.c.mes,
+        ))
+        .group_by(alvo.c.i, DailyExpense.mes_referencia)
+        .having(total > 0)
+        .order_by(alvo.c.i, DailyExpense.mes_referencia)
+    ).all()
+
+    # Planos do usuario (status independe do mes) lidos uma vez por usuario e
+    # repetidos em cada usuario-mes dele; g e a posicao do grupo em rows["groups"]
+    usuarios = select(alvo.c.user_id).distinct().subquery()
+    planos = (
+        select(
+            usuarios.c.user_id,
+            func.row_number().over(
+                partition_by=usuarios.c.user_id,
+                order_by=(_PLAN_SORT_NOME, InstallmentPlan.primeiro_vencimento, InstallmentPlan.id),
+            ).label("ordem"),
+            InstallmentPlan.id.label("plan_id"),
+            InstallmentPlan.parcela_total,
+            case(
+                (_plan_status_clause("Em andamento"), "Em andamento"), else_="Concluído"
+            ).label("status_geral"),
+        )
+        .join(InstallmentPlan, and_(
+            InstallmentPlan.user_id == usuarios.c.user_id, InstallmentPlan.quantidade > 0,
+        ))
+        .subquery()
+    )
+    grupos_por_usuario: dict[str, list[tuple]] = {}
+    for user_id, parcela_total, status_geral in conn.execute(
+        select(planos.c.user_id, planos.c.parcela_total, planos.c.status_geral)
+        .order_by(planos.c.user_id, planos.c.ordem)
+    ):
+        grupos_por_usuario.setdefault(user_id, []).append((parcela_total, status_geral, []))
+    for user_id, ordem, *parcela in conn.execute(
+        select(planos.c.user_id, planos.c.ordem, type_coerce(Expense.valor, Float), Expense.status,
+               Expense.parcela_atual, Expense.created_at)
+        .join(Expense, and_(Expense.plan_id == planos.c.plan_id, Expense.parcela_total > 1))
+        .order_by(planos.c.user_id, planos.c.ordem, Expense.vencimento)
+    ):
+        grupos_por_usuario[user_id][ordem - 1][2].append(parcela)
+
+    rows["groups"], rows["installments"] = [], []
+    for i, (user_id, _) in enumerate(user_months):
+        for parcela_total, status_geral, parcelas in grupos_por_usuario.get(user_id, ()):
+            g = len(rows["groups"])
+            rows["groups"].append((i, parcela_total, status_geral))
+            rows["installments"].extend((g, *parcela) for parcela in parcelas)
+    conn.execute(delete(_score_alvo))
+    return rows
+
+
 # ========== AI Analysis (CR-032) ==========
 
 def get_analise_by_month(
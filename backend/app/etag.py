@@ -0,0 +1,56 @@
+"""
+ETag / GET condicional para leituras derivadas dos dados do usuario.
+
+O ETag e derivado de users.data_version, da data atual (status de atraso e
+projecoes dependem do dia) e da URL. data_version e incrementado por toda
+gravacao de dados do usuario: endpoints de escrita
+(auth.get_current_user_for_write) e, fora deles, replicacao de meses,
+forward-fill, worker de virada de mes e varredura de atraso
+(services.bump_data_version). Como o usuario ja e carregado
+pela autenticacao, responder 304 nao toca nas tabelas de despesas.
+"""
+import hashlib
+from datetime import date
+
+from fastapi import Request, Response
+
+from app.models import User
+
+
+def user_data_etag(request: Request, user: User, today: date | None = None) -> str:
+    """ETag forte para a URL da requisicao na versao atual dos dados do usuario."""
+    today = today or date.today()
+    raw = f"{user.id}:{user.data_version}:{today.isoformat()}:{request.url.path}?{request.url.query}"
+    return '"' + hashlib.sha256(raw.encode()).hexdigest()[:32] + '"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _headers(request: Request, user: User) -> dict[str, str]:
+    return {"ETag": user_data_etag(request, user), "Cache-Control": "private, no-cache"}
+
+
+def conditional_get(request: Request, response: Response, user: User) -> Response | None:
+    """
+    Se If-None-Match corresponde a versao atual, retorna a resposta 304 que o
+    endpoint deve devolver sem calcular nada. Senao retorna None e o endpoint
+    chama set_etag depois de montar o corpo.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        headers = _headers(request, user)
+        if _matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+    return None
+
+
+def set_etag(request: Request, response: Response, user: User) -> None:
+    """
+    Define ETag/Cache-Control na resposta com a versao apos o calculo: a
+    leitura pode ter replicado meses ou varrido atrasos (data_version
+    incrementado), e o corpo ja reflete essa versao.
+    """
+    response.headers.update(_headers(request, user))
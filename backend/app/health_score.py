@@ -6,9 +6,17 @@ Calculo deterministico (sem IA), 0-100 pontos, 4 dimensoes ponderadas de 25 pont
 - D2: Pressao de parcelas
 - D3: Capacidade de poupanca
 - D4: Comportamento e disciplina
+
+calculate_health_scores_columnar avalia muitos usuario-mes de uma vez a
+partir de colunas compactas, com os mesmos pontos de calculate_health_score.
+As colunas vem de linhas do banco (build_score_columns_from_rows, sem objetos
+ORM) ou de argumentos de calculate_health_score (build_score_columns).
 """
 import calendar
+import math
+from array import array
 from datetime import date
+from itertools import accumulate
 
 from app.models import Expense, DailyExpense, ExpenseStatus
 from app.services import get_next_month
@@ -294,52 +302,14 @@ def _calc_d4(expenses: list[Expense], daily_expenses: list[DailyExpense],
     }
 
 
-# ========== Main Calculation ==========
+# ========== Dimensoes (usadas no calculo completo e no recalculo parcial) ==========
 
-def calculate_health_score(
-    renda: float,
-    expenses: list[Expense],
-    daily_expenses: list[DailyExpense],
-    installment_groups: list[dict],
-    daily_expense_history: list[tuple[date, float]],
-    prev_month_comprometimento: float | None,
-    mes_atual: date,
-) -> dict:
-    """
-    Calcula o score de saude financeira deterministico (0-100).
+DIMENSOES = ("d1_comprometimento", "d2_parcelas", "d3_poupanca", "d4_comportamento")
 
-    Args:
-        renda: total de receitas do mes
-        expenses: despesas planejadas do mes (com status atualizado)
-        daily_expenses: gastos diarios do mes
-        installment_groups: grupos de parcelas do crud.get_installment_expenses_grouped()
-        daily_expense_history: [(mes, total)] dos ultimos 3 meses para media de variaveis
-        prev_month_comprometimento: % de comprometimento do mes anterior (None se primeiro mes)
-        mes_atual: primeiro dia do mes de referencia
 
-    Returns:
-        dict com score total, dimensoes detalhadas, classificacao
-    """
-    # Edge case: sem renda
-    if renda <= 0:
-        return {
-            "score": {
-                "total": 0,
-                "classificacao": "Crítica",
-                "cor": "#C0392B",
-                "mensagem": "Cadastre sua renda para calcular o score",
-                "mensagem_contextual": "Cadastre sua renda para calcular o score de saúde financeira.",
-                "mes_referencia": mes_atual.strftime("%Y-%m"),
-            },
-            "dimensoes": {
-                "d1_comprometimento": {"pontos": 0, "maximo": 25, "percentual_comprometimento": 0.0, "detalhe": "Sem renda cadastrada"},
-                "d2_parcelas": {"pontos": 0, "maximo": 25, "subfatores": {}, "detalhe": "Sem renda cadastrada"},
-                "d3_poupanca": {"pontos": 0, "maximo": 25, "percentual_livre": 0.0, "estimativa_variaveis": False, "dias_dados_variaveis": 0, "detalhe": "Sem renda cadastrada"},
-                "d4_comportamento": {"pontos": 0, "maximo": 25, "subfatores": {}, "detalhe": "Sem renda cadastrada"},
-            },
-        }
-
-    # Calcular totais
+def _score_totals(renda: float, expenses: list[Expense], daily_expenses: list[DailyExpense],
+                  daily_expense_history: list[tuple[date, float]], mes_atual: date) -> dict:
+    """Totais compartilhados pelas dimensoes: fixos, media de variaveis e dias de dados."""
     total_fixos = sum(float(e.valor) for e in expenses)
     dias_no_mes = calendar.monthrange(mes_atual.year, mes_atual.month)[1]
 
@@ -357,40 +327,17 @@ def calculate_health_score(
             media_variaveis = 0.0
         dias_dados = dias_registrados
 
-    # Edge case: sem despesas
-    if not expenses and not daily_expenses and not installment_groups:
-        return {
-            "score": {
-                "total": 100,
-                "classificacao": "Excelente",
-                "cor": "#1E8449",
-                "mensagem": "Saúde financeira excepcional",
-                "mensagem_contextual": "Sem despesas cadastradas. Score máximo.",
-                "mes_referencia": mes_atual.strftime("%Y-%m"),
-            },
-            "dimensoes": {
-                "d1_comprometimento": {"pontos": 25, "maximo": 25, "percentual_comprometimento": 0.0, "detalhe": "Sem despesas fixas"},
-                "d2_parcelas": {"pontos": 25, "maximo": 25, "subfatores": {"d2a_percentual": {"pontos": 10, "valor": 0.0}, "d2b_quantidade": {"pontos": 5, "valor": 0}, "d2c_pendentes": {"pontos": 0, "quantidade": 0}, "d2d_alivio": {"pontos": 0, "percentual_liberacao": 0.0}}, "detalhe": "Sem parcelas ativas. Sem pressão significativa."},
-                "d3_poupanca": {"pontos": 25, "maximo": 25, "percentual_livre": 100.0, "estimativa_variaveis": False, "dias_dados_variaveis": 0, "detalhe": "Saldo livre de 100.0%"},
-                "d4_comportamento": {"pontos": 25, "maximo": 25, "subfatores": {"d4a_pontualidade": {"pontos": 10, "percentual_em_dia": 100.0}, "d4b_consistencia": {"pontos": 0, "dias_registro": 0}, "d4c_tendencia": {"pontos": 3, "primeiro_mes": True}, "d4d_disciplina": {"pontos": 5, "nova_parcela_longa": None}}, "detalhe": "Pagamentos em dia, poucos dias de registro"},
-            },
-        }
-
-    # D1: Comprometimento
-    d1 = _calc_d1(renda, total_fixos)
-
-    # D2: Pressao de parcelas
-    active_groups = [g for g in installment_groups if g.get("installments")]
-    d2 = _calc_d2(renda, active_groups, mes_atual)
-
-    # D3: Capacidade de poupanca
-    d3 = _calc_d3(renda, total_fixos, media_variaveis, dias_dados, dias_no_mes)
+    return {
+        "total_fixos": total_fixos,
+        "dias_no_mes": dias_no_mes,
+        "media_variaveis": media_variaveis,
+        "dias_dados": dias_dados,
+    }
 
-    # D4: Comportamento e disciplina
-    # Primeiro calcular comprometimento atual para D4c
-    comprometimento_atual = (total_fixos + media_variaveis) / renda * 100 if renda > 0 else 0
-    d4 = _calc_d4(expenses, daily_expenses, prev_month_comprometimento, active_groups, mes_atual)
 
+def _refine_d4(d4: dict, renda: float, active_groups: list[dict], prev_month_comprometimento: float | None,
+               comprometimento_atual: float, mes_atual: date) -> dict:
+    """Ajusta D4c (tendencia vs mes anterior) e D4d (impacto na renda de nova parcela longa)."""
     # Override D4c with proper trend calculation
     if prev_month_comprometimento is not None:
         diff = prev_month_comprometimento - comprometimento_atual
@@ -429,6 +376,29 @@ def calculate_health_score(
                 d4["pontos"] = d4["pontos"] - old_d4d + new_d4d
                 break
         break
+    return d4
+
+
+def _calc_dimension(key: str, renda: float, totais: dict, expenses: list[Expense],
+                    daily_expenses: list[DailyExpense], active_groups: list[dict],
+                    prev_month_comprometimento: float | None, mes_atual: date) -> dict:
+    """Calcula uma dimensao (chave de DIMENSOES) a partir das entradas e de _score_totals."""
+    total_fixos = totais["total_fixos"]
+    if key == "d1_comprometimento":
+        return _calc_d1(renda, total_fixos)
+    if key == "d2_parcelas":
+        return _calc_d2(renda, active_groups, mes_atual)
+    if key == "d3_poupanca":
+        return _calc_d3(renda, total_fixos, totais["media_variaveis"], totais["dias_dados"], totais["dias_no_mes"])
+
+    comprometimento_atual = (total_fixos + totais["media_variaveis"]) / renda * 100 if renda > 0 else 0
+    d4 = _calc_d4(expenses, daily_expenses, prev_month_comprometimento, active_groups, mes_atual)
+    return _refine_d4(d4, renda, active_groups, prev_month_comprometimento, comprometimento_atual, mes_atual)
+
+
+def _score_result(dimensoes: dict, active_groups: list[dict], mes_atual: date) -> dict:
+    """Total, classificacao e mensagem contextual a partir das quatro dimensoes."""
+    d1, d2, d3, d4 = (dimensoes[key] for key in DIMENSOES)
 
     # Total
     score_total = d1["pontos"] + d2["pontos"] + d3["pontos"] + d4["pontos"]
@@ -464,6 +434,118 @@ def calculate_health_score(
     }
 
 
+def is_regular_score(renda: float, expenses: list, daily_expenses: list, installment_groups: list[dict]) -> bool:
+    """False nos casos especiais de calculate_health_score (sem renda ou sem nenhuma despesa)."""
+    return renda > 0 and bool(expenses or daily_expenses or installment_groups)
+
+
+# ========== Main Calculation ==========
+
+def calculate_health_score(
+    renda: float,
+    expenses: list[Expense],
+    daily_expenses: list[DailyExpense],
+    installment_groups: list[dict],
+    daily_expense_history: list[tuple[date, float]],
+    prev_month_comprometimento: float | None,
+    mes_atual: date,
+) -> dict:
+    """
+    Calcula o score de saude financeira deterministico (0-100).
+
+    Args:
+        renda: total de receitas do mes
+        expenses: despesas planejadas do mes (com status atualizado)
+        daily_expenses: gastos diarios do mes
+        installment_groups: grupos de parcelas do crud.get_installment_expenses_grouped()
+        daily_expense_history: [(mes, total)] dos ultimos 3 meses para media de variaveis
+        prev_month_comprometimento: % de comprometimento do mes anterior (None se primeiro mes)
+        mes_atual: primeiro dia do mes de referencia
+
+    Returns:
+        dict com score total, dimensoes detalhadas, classificacao
+    """
+    # Edge case: sem renda
+    if renda <= 0:
+        return {
+            "score": {
+                "total": 0,
+                "classificacao": "Crítica",
+                "cor": "#C0392B",
+                "mensagem": "Cadastre sua renda para calcular o score",
+                "mensagem_contextual": "Cadastre sua renda para calcular o score de saúde financeira.",
+                "mes_referencia": mes_atual.strftime("%Y-%m"),
+            },
+            "dimensoes": {
+                "d1_comprometimento": {"pontos": 0, "maximo": 25, "percentual_comprometimento": 0.0, "detalhe": "Sem renda cadastrada"},
+                "d2_parcelas": {"pontos": 0, "maximo": 25, "subfatores": {}, "detalhe": "Sem renda cadastrada"},
+                "d3_poupanca": {"pontos": 0, "maximo": 25, "percentual_livre": 0.0, "estimativa_variaveis": False, "dias_dados_variaveis": 0, "detalhe": "Sem renda cadastrada"},
+                "d4_comportamento": {"pontos": 0, "maximo": 25, "subfatores": {}, "detalhe": "Sem renda cadastrada"},
+            },
+        }
+
+    # Calcular totais
+    totais = _score_totals(renda, expenses, daily_expenses, daily_expense_history, mes_atual)
+
+    # Edge case: sem despesas
+    if not expenses and not daily_expenses and not installment_groups:
+        return {
+            "score": {
+                "total": 100,
+                "classificacao": "Excelente",
+                "cor": "#1E8449",
+                "mensagem": "Saúde financeira excepcional",
+                "mensagem_contextual": "Sem despesas cadastradas. Score máximo.",
+                "mes_referencia": mes_atual.strftime("%Y-%m"),
+            },
+            "dimensoes": {
+                "d1_comprometimento": {"pontos": 25, "maximo": 25, "percentual_comprometimento": 0.0, "detalhe": "Sem despesas fixas"},
+                "d2_parcelas": {"pontos": 25, "maximo": 25, "subfatores": {"d2a_percentual": {"pontos": 10, "valor": 0.0}, "d2b_quantidade": {"pontos": 5, "valor": 0}, "d2c_pendentes": {"pontos": 0, "quantidade": 0}, "d2d_alivio": {"pontos": 0, "percentual_liberacao": 0.0}}, "detalhe": "Sem parcelas ativas. Sem pressão significativa."},
+                "d3_poupanca": {"pontos": 25, "maximo": 25, "percentual_livre": 100.0, "estimativa_variaveis": False, "dias_dados_variaveis": 0, "detalhe": "Saldo livre de 100.0%"},
+                "d4_comportamento": {"pontos": 25, "maximo": 25, "subfatores": {"d4a_pontualidade": {"pontos": 10, "percentual_em_dia": 100.0}, "d4b_consistencia": {"pontos": 0, "dias_registro": 0}, "d4c_tendencia": {"pontos": 3, "primeiro_mes": True}, "d4d_disciplina": {"pontos": 5, "nova_parcela_longa": None}}, "detalhe": "Pagamentos em dia, poucos dias de registro"},
+            },
+        }
+
+    active_groups = [g for g in installment_groups if g.get("installments")]
+    dimensoes = {
+        key: _calc_dimension(key, renda, totais, expenses, daily_expenses, active_groups,
+                             prev_month_comprometimento, mes_atual)
+        for key in DIMENSOES
+    }
+    return _score_result(dimensoes, active_groups, mes_atual)
+
+
+def recalculate_health_score(
+    base: dict,
+    dimensoes: set[str],
+    renda: float,
+    expenses: list[Expense],
+    daily_expenses: list[DailyExpense],
+    installment_groups: list[dict],
+    daily_expense_history: list[tuple[date, float]],
+    prev_month_comprometimento: float | None,
+    mes_atual: date,
+) -> dict:
+    """
+    Como calculate_health_score, mas recalcula apenas as dimensoes indicadas;
+    as demais sao reaproveitadas de base (resultado anterior com entradas que
+    diferem so no que afeta essas dimensoes). base e as novas entradas devem
+    ser regulares (is_regular_score); caso contrario, calcula tudo.
+    """
+    if not is_regular_score(renda, expenses, daily_expenses, installment_groups):
+        return calculate_health_score(renda, expenses, daily_expenses, installment_groups,
+                                      daily_expense_history, prev_month_comprometimento, mes_atual)
+
+    totais = _score_totals(renda, expenses, daily_expenses, daily_expense_history, mes_atual)
+    active_groups = [g for g in installment_groups if g.get("installments")]
+    recalculadas = {
+        key: _calc_dimension(key, renda, totais, expenses, daily_expenses, active_groups,
+                             prev_month_comprometimento, mes_atual)
+        for key in DIMENSOES if key in dimensoes
+    }
+    return _score_result({**base["dimensoes"], **recalculadas}, active_groups, mes_atual)
+
+
 def _build_contextual_message(dim_key: str, d1: dict, d2: dict, d3: dict, d4: dict,
                                installment_groups: list[dict]) -> str:
     """Gera mensagem contextual baseada na dimensao de menor pontuacao."""
@@ -697,3 +779,313 @@ def _estimate_d1_impact(renda: float, expenses: list[Expense], dimensoes: dict)
     new_fixos = target_pct / 100 * renda
     new_d1 = _calc_d1(renda, new_fixos)
     return max(0, new_d1["pontos"] - current_pontos)
+
+
+# ========== Avaliacao em lote (colunar) ==========
+
+# Codigos de status nas colunas (outros valores: 3)
+EXPENSE_STATUS_CODES = {
+    ExpenseStatus.PENDENTE.value: 0,
+    ExpenseStatus.PAGO.value: 1,
+    ExpenseStatus.ATRASADO.value: 2,
+}
+_PAGO, _ATRASADO = 1, 2
+GROUP_STATUS_CODES = {"Em andamento": 0, "Concluído": 1}
+_EM_ANDAMENTO, _CONCLUIDO = 0, 1
+
+
+def _month_index(value) -> int:
+    """Ano*12 + mes (0-11); -1 sem data."""
+    return value.year * 12 + value.month - 1 if value else -1
+
+
+def _empty_score_columns() -> dict:
+    return {
+        "renda": array("d"), "mes_index": array("i"), "dias_no_mes": array("i"),
+        "prev_comprometimento": array("d"),
+        "hist_off": array("i", [0]), "hist_total": array("d"),
+        "exp_off": array("i", [0]), "exp_valor": array("d"), "exp_status": array("b"),
+        "daily_off": array("i", [0]), "daily_valor": array("d"), "daily_dia": array("i"),
+        "grp_off": array("i", [0]), "grp_parcela_total": array("i"), "grp_status": array("b"),
+        "inst_off": array("i", [0]), "inst_valor": array("d"), "inst_status": array("b"),
+        "inst_parcela_atual": array("i"), "inst_created_mes": array("i"),
+    }
+
+
+def _append_month(cols: dict, renda, mes: date, prev) -> None:
+    cols["renda"].append(float(renda))
+    cols["mes_index"].append(_month_index(mes))
+    cols["dias_no_mes"].append(calendar.monthrange(mes.year, mes.month)[1])
+    cols["prev_comprometimento"].append(math.nan if prev is None else float(prev))
+
+
+def build_score_columns(months: list[dict]) -> dict:
+    """
+    Monta as colunas de calculate_health_scores_columnar a partir de varios
+    conjuntos de argumentos de calculate_health_score (um por usuario-mes).
+
+    Colunas por usuario-mes: renda, mes_index, dias_no_mes e prev_comprometimento
+    (NaN = primeiro mes). Listas (despesas, gastos diarios, historico, grupos,
+    parcelas) ficam achatadas em colunas, com offsets de tamanho n+1 delimitando
+    o trecho de cada usuario-mes (ou de cada grupo, para as parcelas).
+    """
+    cols = _empty_score_columns()
+    for m in months:
+        _append_month(cols, m["renda"], m["mes_atual"], m["prev_month_comprometimento"])
+
+        cols["hist_total"].extend(float(total) for _, total in m["daily_expense_history"])
+        cols["hist_off"].append(len(cols["hist_total"]))
+
+        for e in m["expenses"]:
+            cols["exp_valor"].append(float(e.valor))
+            cols["exp_status"].append(EXPENSE_STATUS_CODES.get(e.status, 3))
+        cols["exp_off"].append(len(cols["exp_valor"]))
+
+        for de in m["daily_expenses"]:
+            cols["daily_valor"].append(float(de.valor))
+            cols["daily_dia"].append(de.data.toordinal())
+        cols["daily_off"].append(len(cols["daily_valor"]))
+
+        for group in m["installment_groups"]:
+            cols["grp_parcela_total"].append(group["parcela_total"])
+            cols["grp_status"].append(GROUP_STATUS_CODES.get(group["status_geral"], 2))
+            for inst in group.get("installments") or []:
+                cols["inst_valor"].append(float(inst.valor))
+                cols["inst_status"].append(EXPENSE_STATUS_CODES.get(inst.status, 3))
+                cols["inst_parcela_atual"].append(inst.parcela_atual or 0)
+                cols["inst_created_mes"].append(_month_index(getattr(inst, "created_at", None)))
+            cols["inst_off"].append(len(cols["inst_valor"]))
+        cols["grp_off"].append(len(cols["grp_parcela_total"]))
+    return cols
+
+
+def build_score_columns_from_rows(
+    month_rows,
+    expense_rows,
+    daily_rows,
+    history_rows,
+    group_rows,
+    installment_rows,
+) -> dict:
+    """
+    Como build_score_columns, mas a partir de linhas de select() (Row do Core
+    ou tuplas), sem objetos ORM nem dicionarios por usuario-mes. O usuario-mes
+    e a posicao i em month_rows; as demais linhas trazem i (ou g, a posicao do
+    grupo em group_rows) na primeira coluna e vem ordenadas por ela, cada
+    trecho na ordem em que calculate_health_score receberia as listas
+    (ver crud.get_score_column_rows):
+
+    - month_rows: (renda, mes_atual, prev_comprometimento ou None)
+    - expense_rows: (i, valor, status)
+    - daily_rows: (i, valor, data)
+    - history_rows: (i, total) dos ate 3 meses anteriores com gasto, cronologico
+    - group_rows: (i, parcela_total, status_geral)
+    - installment_rows: (g, valor, status, parcela_atual, created_at)
+    """
+    cols = _empty_score_columns()
+    for renda, mes, prev in month_rows:
+        _append_month(cols, renda, mes, prev)
+    n = len(cols["renda"])
+
+    def offsets(counts: list[int]) -> array:
+        return array("i", accumulate(counts))
+
+    counts = [0] * (n + 1)
+    append_total = cols["hist_total"].append
+    for i, total in history_rows:
+        append_total(round(float(total), 2))  # como get_daily_expense_total_by_month
+        counts[i + 1] += 1
+    cols["hist_off"] = offsets(counts)
+
+    counts = [0] * (n + 1)
+    append_valor, append_status = cols["exp_valor"].append, cols["exp_status"].append
+    for i, valor, status in expense_rows:
+        append_valor(valor)
+        append_status(EXPENSE_STATUS_CODES.get(status, 3))
+        counts[i + 1] += 1
+    cols["exp_off"] = offsets(counts)
+
+    counts = [0] * (n + 1)
+    append_valor, append_dia = cols["daily_valor"].append, cols["daily_dia"].append
+    for i, valor, data in daily_rows:
+        append_valor(valor)
+        append_dia(data.toordinal())
+        counts[i + 1] += 1
+    cols["daily_off"] = offsets(counts)
+
+    counts = [0] * (n + 1)
+    append_total, append_status = cols["grp_parcela_total"].append, cols["grp_status"].append
+    for i, parcela_total, status_geral in group_rows:
+        append_total(parcela_total)
+        append_status(GROUP_STATUS_CODES.get(status_geral, 2))
+        counts[i + 1] += 1
+    cols["grp_off"] = offsets(counts)
+
+    counts = [0] * (len(cols["grp_parcela_total"]) + 1)
+    append_valor, append_status = cols["inst_valor"].append, cols["inst_status"].append
+    append_parcela, append_created = cols["inst_parcela_atual"].append, cols["inst_created_mes"].append
+    for g, valor, status, parcela_atual, created_at in installment_rows:
+        append_valor(valor)
+        append_status(EXPENSE_STATUS_CODES.get(status, 3))
+        append_parcela(parcela_atual or 0)
+        append_created(_month_index(created_at))
+        counts[g + 1] += 1
+    cols["inst_off"] = offsets(counts)
+    return cols
+
+
+def _faixa(valor: float, faixas: list[tuple]) -> int:
+    for limite, pts in faixas:
+        if valor <= limite:
+            return pts
+    return 0
+
+
+def calculate_health_scores_columnar(cols: dict) -> dict:
+    """
+    Pontos de D1-D4, total e classificacao de cada usuario-mes das colunas de
+    build_score_columns, sem objetos ORM nem dicionarios de detalhe. Mesmas
+    regras (e mesma ordem das somas) de calculate_health_score, inclusive os
+    casos sem renda e sem despesas.
+    Retorna colunas "total", "d1", "d2", "d3", "d4" e "classificacao".
+    """
+    renda_col, mes_col, dias_col, prev_col = (
+        cols["renda"], cols["mes_index"], cols["dias_no_mes"], cols["prev_comprometimento"])
+    hist_off, hist_total = cols["hist_off"], cols["hist_total"]
+    exp_off, exp_valor, exp_status = cols["exp_off"], cols["exp_valor"], cols["exp_status"]
+    daily_off, daily_valor, daily_dia = cols["daily_off"], cols["daily_valor"], cols["daily_dia"]
+    grp_off, grp_total, grp_status, inst_off = (
+        cols["grp_off"], cols["grp_parcela_total"], cols["grp_status"], cols["inst_off"])
+    inst_valor, inst_status, inst_parcela, inst_created = (
+        cols["inst_valor"], cols["inst_status"], cols["inst_parcela_atual"], cols["inst_created_mes"])
+
+    n = len(renda_col)
+    out = {key: array("i", bytes(4 * n)) for key in ("total", "d1", "d2", "d3", "d4")}
+    out_total, out_d1, out_d2, out_d3, out_d4 = out["total"], out["d1"], out["d2"], out["d3"], out["d4"]
+    classificacao = [""] * n
+    limites = [(limit, nome) for limit, nome, _, _ in SCORE_CLASSIFICATIONS]
+
+    for i in range(n):
+        renda = renda_col[i]
+        if renda <= 0:
+            classificacao[i] = "Crítica"
+            continue
+
+        e0, e1 = exp_off[i], exp_off[i + 1]
+        v0, v1 = daily_off[i], daily_off[i + 1]
+        g0, g1 = grp_off[i], grp_off[i + 1]
+        h0, h1 = hist_off[i], hist_off[i + 1]
+        dias_no_mes = dias_col[i]
+        total_fixos = sum(exp_valor[e0:e1])
+
+        dias_registrados = len(set(daily_dia[v0:v1]))
+        if h1 - h0 >= 3:
+            media_variaveis = sum(hist_total[h1 - 3:h1]) / 3
+            dias_dados = dias_no_mes
+        elif dias_registrados > 0:
+            media_variaveis = sum(daily_valor[v0:v1]) * (dias_no_mes / dias_registrados)
+            dias_dados = dias_registrados
+        else:
+            media_variaveis = 0.0
+            dias_dados = dias_registrados
+
+        if e0 == e1 and v0 == v1 and g0 == g1:
+            out_total[i], out_d1[i], out_d2[i], out_d3[i], out_d4[i] = 100, 25, 25, 25, 25
+            classificacao[i] = "Excelente"
+            continue
+
+        # D1
+        d1 = _faixa(total_fixos / renda * 100, D1_FAIXAS)
+
+        # D2 (grupos com parcelas) e D4d (primeira parcela longa criada no mes)
+        mes_index = mes_col[i]
+        total_parcelas_mensal = 0
+        valor_liberado_3m = 0.0
+        qtd_ativas = 0
+        qtd_pendentes = 0
+        d4d = 5
+        primeiro_longo = True
+        for g in range(g0, g1):
+            p0, p1 = inst_off[g], inst_off[g + 1]
+            if p0 == p1:
+                continue
+            parcela_total = grp_total[g]
+            status_geral = grp_status[g]
+            statuses = inst_status[p0:p1]
+            num_paid = statuses.count(_PAGO)
+            if num_paid == 0 and status_geral != _CONCLUIDO:
+                qtd_pendentes += 1
+            elif status_geral == _EM_ANDAMENTO:
+                qtd_ativas += 1
+                total_parcelas_mensal += inst_valor[p0]
+                if p1 - p0 >= parcela_total:
+                    parcelas_restantes = (p1 - p0) - num_paid
+                else:
+                    parcelas_restantes = parcela_total - max(
+                        inst_parcela[p] for p in range(p0, p1) if inst_status[p] == _PAGO)
+                if 0 < parcelas_restantes <= 3:
+                    valor_liberado_3m += inst_valor[p0]
+
+            if parcela_total > 12 and (primeiro_longo or d4d == 5):
+                for p in range(p0, p1):
+                    if inst_parcela[p] == 1 and inst_created[p] == mes_index:
+                        if primeiro_longo:
+                            d4d = 0 if inst_valor[p] / renda * 100 >= 5 else 2
+                        else:
+                            d4d = 2
+                        break
+                primeiro_longo = False
+
+        pct_liberacao = valor_liberado_3m / renda * 100
+        d2 = (_faixa(total_parcelas_mensal / renda * 100, D2A_FAIXAS)
+              + _faixa(qtd_ativas, D2B_FAIXAS)
+              + (-5 if qtd_pendentes > 0 else 0)
+              + (5 if pct_liberacao >= 10 else 3 if pct_liberacao >= 5 else 0))
+        d2 = max(0, min(25, d2))
+
+        # D3
+        pct_livre = (renda - total_fixos - media_variaveis) / renda * 100
+        if pct_livre >= 20:
+            d3 = 25
+        elif pct_livre <= 0:
+            d3 = 0
+        elif pct_livre < 5:
+            d3 = 3
+        elif pct_livre < 10:
+            d3 = 8
+        elif pct_livre < 15:
+            d3 = 15
+        else:
+            d3 = 20
+
+        # D4
+        if e1 > e0:
+            em_dia = (e1 - e0) - exp_status[e0:e1].count(_ATRASADO)
+            d4a = round(em_dia / (e1 - e0) * 10)
+        else:
+            d4a = 10
+        d4b = min(5, round(dias_registrados / 20 * 5))
+        prev = prev_col[i]
+        if prev != prev:  # NaN: primeiro mes
+            d4c = 3
+        else:
+            diff = prev - (total_fixos + media_variaveis) / renda * 100
+            if diff >= 3:
+                d4c = 5
+            elif diff > 0:
+                d4c = 3
+            elif abs(diff) <= 0.1:
+                d4c = 2
+            else:
+                d4c = 0
+        d4 = d4a + d4b + d4c + d4d
+
+        total = max(0, min(100, d1 + d2 + d3 + d4))
+        out_total[i], out_d1[i], out_d2[i], out_d3[i], out_d4[i] = total, d1, d2, d3, d4
+        for limit, nome in limites:
+            if total <= limit:
+                classificacao[i] = nome
+                break
+
+    out["classificacao"] = classificacao
+    return out
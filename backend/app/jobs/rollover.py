@@ -0,0 +1,158 @@
+"""
+RF-06: Worker de virada de mes.
+
+Pre-materializa o mes seguinte (generate_month_data) para todos os usuarios,
+fora do horario de pico, para que o primeiro acesso do mes seja so leitura.
+Percorre os usuarios em lotes ordenados por ID e grava um checkpoint JSON
+apos cada lote, permitindo retomar de onde parou.
+
+Uso:
+    cd backend
+    python -m app.jobs.rollover                      # mes seguinte ao atual
+    python -m app.jobs.rollover --month 2026-11 --chunk-size 200
+    python -m app.jobs.rollover --checkpoint /tmp/rollover.json --restart
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import date
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.services import generate_month_data, get_next_month
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_CHECKPOINT = "rollover_checkpoint.json"
+
+
+def _load_checkpoint(path: str | None, target_mes: date) -> dict:
+    """Le o checkpoint do mes-alvo; ignora checkpoints de outro mes."""
+    empty = {"mes_referencia": target_mes.isoformat(), "last_user_id": None,
+             "processed": 0, "materialized": 0, "failed": 0, "done": False}
+    if not path or not os.path.exists(path):
+        return empty
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("mes_referencia") != target_mes.isoformat():
+        return empty
+    return checkpoint
+
+
+def _save_checkpoint(path: str | None, checkpoint: dict) -> None:
+    """Grava o checkpoint de forma atomica (arquivo temporario + rename)."""
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def run_rollover(
+    session_factory: Callable[[], Session],
+    target_mes: date,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    checkpoint_path: str | None = None,
+) -> list[dict]:
+    """
+    Materializa target_mes para todos os usuarios, em lotes de chunk_size.
+
+    Cada lote usa uma sessao propria; falha em um usuario faz rollback apenas
+    dele e e contabilizada em 'failed'. Retorna um relatorio por lote
+    (usuarios, meses materializados, falhas e duracao em segundos).
+    """
+    checkpoint = _load_checkpoint(checkpoint_path, target_mes)
+    if checkpoint["done"]:
+        logger.info("Rollover %s already complete, nothing to do", target_mes)
+        return []
+
+    reports = []
+    while True:
+        started = time.perf_counter()
+        db = session_factory()
+        try:
+            user_ids = crud.get_user_ids_chunk(db, checkpoint["last_user_id"], chunk_size)
+            if not user_ids:
+                break
+            materialized = failed = 0
+            for user_id in user_ids:
+                try:
+                    if generate_month_data(db, target_mes, user_id):
+                        materialized += 1
+                except Exception:
+                    db.rollback()
+                    failed += 1
+                    logger.exception("Rollover failed for user_id=%s", user_id)
+        finally:
+            db.close()
+
+        report = {
+            "chunk": len(reports) + 1,
+            "users": len(user_ids),
+            "materialized": materialized,
+            "failed": failed,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        reports.append(report)
+        checkpoint["last_user_id"] = user_ids[-1]
+        checkpoint["processed"] += len(user_ids)
+        checkpoint["materialized"] += materialized
+        checkpoint["failed"] += failed
+        _save_checkpoint(checkpoint_path, checkpoint)
+        logger.info(
+            "Chunk %d: %d users, %d materialized, %d failed in %.3fs",
+            report["chunk"], report["users"], report["materialized"],
+            report["failed"], report["seconds"],
+        )
+
+    checkpoint["done"] = True
+    _save_checkpoint(checkpoint_path, checkpoint)
+    return reports
+
+
+def _parse_month(value: str) -> date:
+    """Converte 'YYYY-MM' no 1o dia do mes."""
+    year, month = value.split("-")
+    return date(int(year), int(month), 1)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Pre-materializa o proximo mes para todos os usuarios.")
+    parser.add_argument("--month", type=_parse_month, default=None,
+                        help="Mes-alvo YYYY-MM (padrao: mes seguinte ao atual)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT,
+                        help="Arquivo JSON de checkpoint (para retomar)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignora o checkpoint existente e recomeca do inicio")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    logging.getLogger("app.services").setLevel(logging.WARNING)
+
+    target_mes = args.month or get_next_month(date.today().replace(day=1))
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    from app.database import SessionLocal
+
+    started = time.perf_counter()
+    reports = run_rollover(SessionLocal, target_mes, args.chunk_size, args.checkpoint)
+    total_users = sum(r["users"] for r in reports)
+    total_failed = sum(r["failed"] for r in reports)
+    print(f"Rollover {target_mes:%Y-%m}: {len(reports)} lotes, {total_users} usuarios, "
+          f"{total_failed} falhas em {time.perf_counter() - started:.2f}s")
+    for r in reports:
+        print(f"  lote {r['chunk']}: {r['users']} usuarios, {r['materialized']} materializados, "
+              f"{r['failed']} falhas, {r['seconds']:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
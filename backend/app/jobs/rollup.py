@@ -0,0 +1,94 @@
+"""
+Reconstrucao e verificacao do read model monthly_rollup.
+
+rebuild: apaga e recalcula o rollup a partir de expenses, incomes e
+daily_expenses (todos os usuarios ou um so), em uma transacao, e em seguida
+verifica o resultado. verify: compara o rollup gravado com as tabelas brutas
+sem alterar nada e lista as divergencias.
+
+Uso:
+    cd backend
+    python -m app.jobs.rollup verify
+    python -m app.jobs.rollup rebuild
+    python -m app.jobs.rollup rebuild --user-id <uuid>
+"""
+
+import argparse
+import logging
+import sys
+import time
+import uuid
+
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models import MonthlyRollup
+
+logger = logging.getLogger(__name__)
+
+_INSERT_CHUNK = 1000
+
+
+def _key(row: dict) -> tuple:
+    return (row["user_id"], row["mes_referencia"], row["tipo"], row["status"], row["categoria"])
+
+
+def verify_rollup(db: Session, user_id: str | None = None) -> list[dict]:
+    """
+    Compara o rollup gravado com o recalculado das tabelas brutas.
+    Retorna as divergencias (chave, esperado, gravado); lista vazia = consistente.
+    """
+    expected = {_key(r): (r["total"], r["quantidade"]) for r in crud.aggregate_monthly_rollup(db, user_id)}
+    stored = {_key(r): (r["total"], r["quantidade"]) for r in crud.get_monthly_rollup_rows(db, user_id)}
+    mismatches = []
+    for key in sorted(expected.keys() | stored.keys(), key=str):
+        if expected.get(key) != stored.get(key):
+            mismatches.append({"key": key, "expected": expected.get(key), "stored": stored.get(key)})
+    return mismatches
+
+
+def rebuild_rollup(db: Session, user_id: str | None = None) -> int:
+    """Reconstroi o rollup do zero (todos os usuarios ou um), em uma transacao. Retorna linhas gravadas."""
+    stmt = delete(MonthlyRollup.__table__)
+    if user_id is not None:
+        stmt = stmt.where(MonthlyRollup.user_id == user_id)
+    db.execute(stmt)
+    rows = [{**row, "id": str(uuid.uuid4())} for row in crud.aggregate_monthly_rollup(db, user_id)]
+    for start in range(0, len(rows), _INSERT_CHUNK):
+        db.execute(insert(MonthlyRollup.__table__), rows[start:start + _INSERT_CHUNK])
+    db.commit()
+    return len(rows)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Reconstroi ou verifica o read model monthly_rollup.")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--user-id", default=None, help="Restringe a um usuario")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            started = time.perf_counter()
+            count = rebuild_rollup(db, args.user_id)
+            print(f"Rollup reconstruido: {count} linhas em {time.perf_counter() - started:.2f}s")
+        mismatches = verify_rollup(db, args.user_id)
+    finally:
+        db.close()
+
+    if mismatches:
+        print(f"Rollup INCONSISTENTE: {len(mismatches)} divergencias")
+        for m in mismatches[:50]:
+            print(f"  {m['key']}: esperado={m['expected']} gravado={m['stored']}")
+        return 1
+    print("Rollup consistente com as tabelas brutas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
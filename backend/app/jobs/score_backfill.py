@@ -0,0 +1,93 @@
+"""
+CR-026: Reconstrucao do historico de score_historico.
+
+score_historico so ganha a linha de um mes quando o usuario abre /api/score
+naquele mes. Este comando recalcula todos os meses anteriores ao atual de cada
+usuario (scoring.rebuild_score_history: dados carregados uma vez por usuario,
+meses percorridos em memoria, gravacao em lote), em lotes de usuarios com
+commit por usuario.
+
+Uso:
+    cd backend
+    python -m app.jobs.score_backfill
+    python -m app.jobs.score_backfill --user-id <uuid>
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.scoring import rebuild_score_history
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 200
+
+
+def run_score_backfill(db: Session, user_id: str | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Reconstroi o historico de score de um usuario ou de todos. Falhas de um
+    usuario sao registradas e nao interrompem os demais.
+    Retorna totais de usuarios, meses calculados, inseridos, atualizados e falhas.
+    """
+    totals = {"usuarios": 0, "meses_calculados": 0, "inseridos": 0, "atualizados": 0, "falhas": 0}
+
+    def _rebuild(uid: str) -> None:
+        try:
+            result = rebuild_score_history(db, uid)
+        except Exception:
+            db.rollback()
+            totals["falhas"] += 1
+            logger.exception("Score backfill failed for user_id=%s", uid)
+            return
+        totals["usuarios"] += 1
+        for key in ("meses_calculados", "inseridos", "atualizados"):
+            totals[key] += result[key]
+
+    if user_id is not None:
+        _rebuild(user_id)
+        return totals
+
+    last_user_id = None
+    while True:
+        user_ids = crud.get_user_ids_chunk(db, last_user_id, chunk_size)
+        if not user_ids:
+            break
+        for uid in user_ids:
+            _rebuild(uid)
+        last_user_id = user_ids[-1]
+        logger.info("Score backfill: %d users processed", totals["usuarios"] + totals["falhas"])
+    return totals
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Reconstroi o historico mensal de score_historico.")
+    parser.add_argument("--user-id", default=None, help="Restringe a um usuario")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        totals = run_score_backfill(db, args.user_id, args.chunk_size)
+    finally:
+        db.close()
+
+    print(
+        f"Historico de score: {totals['usuarios']} usuarios, {totals['meses_calculados']} meses "
+        f"({totals['inseridos']} inseridos, {totals['atualizados']} atualizados), "
+        f"{totals['falhas']} falhas em {time.perf_counter() - started:.2f}s"
+    )
+    return 1 if totals["falhas"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+RF-05: Varredura noturna de despesas em atraso para todos os usuarios.
+
+Executa o mesmo UPDATE set-based de sweep_overdue_expenses sem filtro de
+usuario e registra a data da varredura em todos os usuarios, de modo que as
+leituras do dia nao precisem escrever. Usuarios com despesas alteradas tem
+users.data_version incrementado, como na varredura por usuario.
+
+Uso:
+    cd backend
+    python -m app.jobs.status_sweep
+    python -m app.jobs.status_sweep --date 2026-11-01
+"""
+
+import argparse
+import logging
+import time
+from datetime import date
+
+from sqlalchemy.orm import Session
+
+from app import crud
+
+logger = logging.getLogger(__name__)
+
+
+def run_status_sweep(db: Session, today: date) -> dict:
+    """
+    Marca como Atrasado todas as despesas Pendentes vencidas antes de today,
+    em uma unica transacao, recalcula o rollup dos meses e os contadores
+    dos planos de parcelamento afetados e incrementa data_version dos
+    usuarios com despesas alteradas. A data de varredura dos usuarios e
+    gravada antes do UPDATE das despesas: uma escrita concorrente que
+    invalide a varredura (status_sweep_date = NULL) fica serializada depois
+    deste commit.
+    """
+    started = time.perf_counter()
+    users = crud.set_status_sweep_date_all_users(db, today)
+    meses = crud.get_overdue_pending_months(db, None, today)
+    plan_ids = crud.get_overdue_pending_plan_ids(db, None, today)
+    expenses = crud.mark_overdue_expenses(db, None, today)
+    for user_id, user_meses in meses.items():
+        crud.refresh_monthly_rollup(db, user_id, user_meses)
+    crud.refresh_installment_plans(db, plan_ids)
+    crud.increment_data_versions(db, set(meses))
+    db.commit()
+    report = {
+        "users": users,
+        "expenses": expenses,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(
+        "Status sweep %s: %d expenses marked overdue, %d users stamped in %.3fs",
+        today, expenses, users, report["seconds"],
+    )
+    return report
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Marca despesas vencidas como Atrasado para todos os usuarios.")
+    parser.add_argument("--date", type=date.fromisoformat, default=None,
+                        help="Data de referencia YYYY-MM-DD (padrao: hoje)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        report = run_status_sweep(db, args.date or date.today())
+    finally:
+        db.close()
+    print(f"Varredura de atraso: {report['expenses']} despesas, "
+          f"{report['users']} usuarios em {report['seconds']:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ from slowapi import _rate_limit_exceeded_handler  # CR-044
 from slowapi.errors import RateLimitExceeded  # CR-044
 
 from app.rate_limit import limiter  # CR-044
+from app.query_counter import HEADER_NAME as _SQL_COUNT_HEADER, count_statements
 from app.routers import expenses, incomes, months, auth, users, daily_expenses, dashboard, score, ai_analysis, alerts  # CR-002: auth, users; CR-005: daily_expenses; CR-019: dashboard; CR-026: score; CR-032: ai_analysis; CR-033: alerts
 
 _IS_PRODUCTION = os.environ.get("ENVIRONMENT", "development").lower() != "development"
@@ -48,6 +49,16 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         return response
 
 
+class SqlStatementCounterMiddleware(BaseHTTPMiddleware):
+    """Conta os comandos SQL de cada requisição; fora de produção expõe o total em header."""
+    async def dispatch(self, request: Request, call_next):
+        with count_statements() as counter:
+            response = await call_next(request)
+        if not _IS_PRODUCTION:
+            response.headers[_SQL_COUNT_HEADER] = str(counter.count)
+        return response
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: validar variáveis de ambiente obrigatórias
@@ -73,6 +84,7 @@ app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 app.add_middleware(SecurityHeadersMiddleware)
+app.add_middleware(SqlStatementCounterMiddleware)
 
 _ALLOWED_ORIGINS = os.environ.get("ALLOWED_ORIGINS", "http://localhost:5173").split(",")
 
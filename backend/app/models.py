@@ -2,7 +2,7 @@ import uuid
 import enum
 from datetime import date, datetime
 
-from sqlalchemy import String, Date, Boolean, Integer, Numeric, Text, ForeignKey, Index, UniqueConstraint
+from sqlalchemy import String, Date, Boolean, Integer, Numeric, Text, ForeignKey, Index, UniqueConstraint, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -26,6 +26,8 @@ class User(Base):
     google_id: Mapped[str | None] = mapped_column(String(255), nullable=True, unique=True)
     avatar_url: Mapped[str | None] = mapped_column(String(500), nullable=True)
     email_verified: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    status_sweep_date: Mapped[date | None] = mapped_column(Date, nullable=True)  # RF-05: ultima varredura de atraso
+    data_version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # ETag: incrementado a cada escrita
     created_at: Mapped[datetime] = mapped_column(default=datetime.now)
     updated_at: Mapped[datetime] = mapped_column(
         default=datetime.now, onupdate=datetime.now
@@ -36,15 +38,36 @@ class User(Base):
     refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan")
     daily_expenses = relationship("DailyExpense", back_populates="user", cascade="all, delete-orphan")  # CR-005
     score_historico = relationship("ScoreHistorico", back_populates="user", cascade="all, delete-orphan")  # CR-026
+    score_cache = relationship("ScoreCache", back_populates="user", uselist=False, cascade="all, delete-orphan")  # CR-026
     analises_financeiras = relationship("AnaliseFinanceira", back_populates="user", cascade="all, delete-orphan")  # CR-032
     alertas = relationship("AlertaEstado", back_populates="user", cascade="all, delete-orphan")  # CR-033
     configuracao_alertas = relationship("ConfiguracaoAlertas", back_populates="user", uselist=False, cascade="all, delete-orphan")  # CR-033
+    month_states = relationship("MonthState", back_populates="user", cascade="all, delete-orphan")  # RF-06 watermark
+    monthly_rollups = relationship("MonthlyRollup", back_populates="user", cascade="all, delete-orphan")  # read model de totais
+    installment_plans = relationship("InstallmentPlan", back_populates="user", cascade="all, delete-orphan")
 
 
 class Expense(Base):
     __tablename__ = "expenses"
     __table_args__ = (
         Index("ix_expenses_user_month", "user_id", "mes_referencia"),  # CR-002: indice composto
+        # Cobre SUM(valor) das parcelas em aberto sem tocar a tabela
+        Index("ix_expenses_user_parcela", "user_id", "parcela_total", "status", "valor"),
+        # Exclusao em serie (CR-009): mesmo nome e parcela_total do usuario
+        Index("ix_expenses_user_nome_parcela", "user_id", "nome", "parcela_total"),
+        # Deduplicacao de parcelas na replicacao (expense_installment_exists)
+        Index(
+            "ix_expenses_user_month_parcela",
+            "user_id", "mes_referencia", "nome", "parcela_atual", "parcela_total",
+        ),
+        # Varredura de atraso de todos os usuarios (RF-05): status = Pendente e vencimento < hoje
+        Index("ix_expenses_status_vencimento", "status", "vencimento"),
+        # Parcelas sem plano (legado) do usuario em ordem de vencimento
+        Index(
+            "ix_expenses_installments_without_plan", "user_id", "vencimento",
+            sqlite_where=text("parcela_total > 1 AND plan_id IS NULL"),
+            postgresql_where=text("parcela_total > 1 AND plan_id IS NULL"),
+        ),
     )
 
     id: Mapped[str] = mapped_column(
@@ -62,9 +85,15 @@ class Expense(Base):
     parcela_atual: Mapped[int | None] = mapped_column(Integer, nullable=True)
     parcela_total: Mapped[int | None] = mapped_column(Integer, nullable=True)
     recorrente: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    recorrencia_encerrada: Mapped[bool] = mapped_column(
+        Boolean, default=False, nullable=False
+    )  # CR-009: ultima ocorrencia de recorrente excluida "deste mes em diante"
     origem_id: Mapped[str | None] = mapped_column(
         String(36), nullable=True, index=True
     )  # ID da despesa de origem na replicacao (RF-06)
+    plan_id: Mapped[str | None] = mapped_column(
+        String(36), ForeignKey("installment_plans.id", ondelete="SET NULL"), nullable=True, index=True
+    )  # Compra parcelada a que a parcela pertence
     status: Mapped[str] = mapped_column(
         String(20), default=ExpenseStatus.PENDENTE.value, nullable=False
     )
@@ -74,6 +103,7 @@ class Expense(Base):
     )
 
     user = relationship("User", back_populates="expenses")  # CR-002
+    plan = relationship("InstallmentPlan", back_populates="expenses")
 
 
 class Income(Base):
@@ -176,6 +206,24 @@ class ScoreHistorico(Base):
     user = relationship("User", back_populates="score_historico")
 
 
+class ScoreCache(Base):
+    """
+    CR-026: Ultima resposta de GET /api/score do usuario e o fingerprint
+    (users.data_version, dia) com que foi calculada. Regravada a cada
+    recalculo; score_historico so muda quando o score muda.
+    """
+    __tablename__ = "score_cache"
+
+    user_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    data_version: Mapped[int] = mapped_column(Integer, nullable=False)
+    calculado_em: Mapped[date] = mapped_column(Date, nullable=False)
+    resposta: Mapped[str] = mapped_column(Text, nullable=False)
+
+    user = relationship("User", back_populates="score_cache")
+
+
 class AnaliseFinanceira(Base):
     """CR-032: Persistencia de analises financeiras geradas por IA."""
     __tablename__ = "analise_financeira"
@@ -265,3 +313,114 @@ class ConfiguracaoAlertas(Base):
     updated_at: Mapped[datetime] = mapped_column(default=datetime.now, onupdate=datetime.now)
 
     user = relationship("User", back_populates="configuracao_alertas")
+
+
+class MonthState(Base):
+    """
+    RF-06: Watermark de materializacao mensal por usuario.
+
+    source_version: incrementado sempre que as linhas replicaveis (recorrentes ou
+    parcelas) DESTE mes mudam. materialized_version: source_version do mes
+    anterior no momento em que este mes foi materializado (None = nunca).
+    O mes esta em dia quando materialized_version == source_version do anterior.
+    """
+    __tablename__ = "month_state"
+    __table_args__ = (
+        UniqueConstraint("user_id", "mes_referencia", name="uq_month_state_user_month"),
+    )
+
+    id: Mapped[str] = mapped_column(
+        String(36), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    user_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    mes_referencia: Mapped[date] = mapped_column(Date, nullable=False)
+    source_version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    materialized_version: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        default=datetime.now, onupdate=datetime.now
+    )
+
+    user = relationship("User", back_populates="month_states")
+
+
+class RollupTipo(str, enum.Enum):
+    DESPESA = "despesa"
+    RECEITA = "receita"
+    GASTO_DIARIO = "gasto_diario"
+
+
+class MonthlyRollup(Base):
+    """
+    Read model de totais mensais por usuario: uma linha por
+    (mes, tipo, status, categoria) com soma e quantidade.
+
+    - despesa: por status e categoria
+    - receita: total do mes (status e categoria vazios)
+    - gasto_diario: por categoria (status vazio)
+
+    Categoria/status ausentes sao gravados como "" (fazem parte da chave unica).
+    Mantido na mesma transacao das escritas em expenses, incomes e
+    daily_expenses (ver services); reconstruido por app.jobs.rollup.
+    """
+    __tablename__ = "monthly_rollup"
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "mes_referencia", "tipo", "status", "categoria",
+            name="uq_monthly_rollup_key",
+        ),
+    )
+
+    id: Mapped[str] = mapped_column(
+        String(36), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    user_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    mes_referencia: Mapped[date] = mapped_column(Date, nullable=False)
+    tipo: Mapped[str] = mapped_column(String(20), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="")
+    categoria: Mapped[str] = mapped_column(String(50), nullable=False, default="")
+    total: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False)
+    quantidade: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    user = relationship("User", back_populates="monthly_rollups")
+
+
+class InstallmentPlan(Base):
+    """
+    Compra parcelada: agrupa as parcelas (expenses.plan_id) por uma chave
+    propria em vez de (nome normalizado, parcela_total), de modo que duas
+    compras com o mesmo nome nao se misturam.
+
+    Criado junto com as parcelas (POST /api/expenses) e herdado pelas
+    replicas do RF-06. primeiro_vencimento e o vencimento da parcela 1.
+
+    Contadores (quantidade, parcelas_pagas, valor_*): resumo das parcelas do
+    plano, recalculado na mesma transacao de cada escrita que as toca (ver
+    services) para que as telas de parcelas nao recontem todas as linhas.
+    """
+    __tablename__ = "installment_plans"
+
+    id: Mapped[str] = mapped_column(
+        String(36), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    user_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    nome: Mapped[str] = mapped_column(String(255), nullable=False)
+    valor: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
+    parcela_total: Mapped[int] = mapped_column(Integer, nullable=False)
+    primeiro_vencimento: Mapped[date] = mapped_column(Date, nullable=False)
+    quantidade: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    parcelas_pagas: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    ultima_parcela_paga: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    valor_total: Mapped[float] = mapped_column(Numeric(12, 2), default=0, nullable=False)
+    valor_pago: Mapped[float] = mapped_column(Numeric(12, 2), default=0, nullable=False)
+    valor_pendente: Mapped[float] = mapped_column(Numeric(12, 2), default=0, nullable=False)
+    valor_atrasado: Mapped[float] = mapped_column(Numeric(12, 2), default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.now)
+
+    user = relationship("User", back_populates="installment_plans")
+    expenses = relationship("Expense", back_populates="plan")
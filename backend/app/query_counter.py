@@ -0,0 +1,45 @@
+"""
+Contador de comandos SQL por requisicao.
+
+Um listener global em Engine incrementa o contador ativo no contexto atual
+(contextvars, propagado para o threadpool dos endpoints sincronos). O
+middleware em main.py abre um contador por requisicao e, fora de producao,
+expoe o total no header X-SQL-Statement-Count, para que os testes possam
+verificar o numero de queries de cada endpoint.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+HEADER_NAME = "X-SQL-Statement-Count"
+
+
+class StatementCounter:
+    """Acumula o numero de comandos SQL executados."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+
+_current: ContextVar[StatementCounter | None] = ContextVar("sql_statement_counter", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = _current.get()
+    if counter is not None:
+        counter.count += 1
+
+
+@contextmanager
+def count_statements() -> Iterator[StatementCounter]:
+    """Conta os comandos SQL executados dentro do bloco (no contexto atual)."""
+    counter = StatementCounter()
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 from datetime import date
 
 from app.database import get_db
-from app.auth import get_current_user
+from app.auth import get_current_user, get_current_user_for_write
 from app.models import DailyExpense, User
 from app.schemas import (
     DailyExpenseCreate,
@@ -51,7 +51,7 @@ def create_daily_expense(
     month: int,
     data: DailyExpenseCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_for_write),
 ):
     """Criar novo gasto diario no mes especificado."""
     # Validar subcategoria
@@ -88,7 +88,7 @@ def update_daily_expense(
     daily_expense_id: str,
     data: DailyExpenseUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_for_write),
 ):
     """Atualizar gasto diario existente."""
     daily_expense = crud.get_daily_expense_by_id(db, daily_expense_id, current_user.id)
@@ -125,7 +125,7 @@ def update_daily_expense(
 def delete_daily_expense(
     daily_expense_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_for_write),
 ):
     """Excluir gasto diario por ID."""
     daily_expense = crud.get_daily_expense_by_id(db, daily_expense_id, current_user.id)
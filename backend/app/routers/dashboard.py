@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlalchemy.orm import Session
 from datetime import date
+from typing import Literal
 
 from app.database import get_db
 from app.auth import get_current_user
 from app.models import User
-from app.schemas import DashboardResponse
+from app.schemas import CategoryDrilldownResponse, DashboardResponse
 from app import services
+from app.etag import conditional_get, set_etag
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
@@ -15,13 +17,47 @@ router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 def get_dashboard(
     year: int,
     month: int,
+    request: Request,
+    response: Response,
+    months: int = Query(6, ge=6, le=36, description="Meses na serie de evolucao"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     CR-019: GET /api/dashboard/2026/3 → dados completos do dashboard.
     Retorna KPIs, breakdown por categoria (planejadas e diarios separados),
-    evolucao 6 meses e status breakdown.
+    evolucao de 6 a 36 meses (?months=, padrao 6) e status breakdown.
+    GET condicional: If-None-Match com o ETag atual responde 304.
     """
+    not_modified = conditional_get(request, response, current_user)
+    if not_modified:
+        return not_modified
     mes_referencia = date(year, month, 1)
-    return services.get_dashboard_data(db, mes_referencia, current_user.id)
+    data = services.get_dashboard_data(db, mes_referencia, current_user.id, evolution_months=months)
+    set_etag(request, response, current_user)
+    return data
+
+
+@router.get("/{year}/{month}/categories/{categoria}", response_model=CategoryDrilldownResponse)
+def get_category_drilldown(
+    year: int,
+    month: int,
+    categoria: str,
+    request: Request,
+    response: Response,
+    tipo: Literal["planejadas", "diarios"] = Query("planejadas"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    CR-019: GET /api/dashboard/2026/3/categories/Moradia?tipo=planejadas →
+    subcategorias da categoria no mes (total, percentual e quantidade),
+    calculadas por GROUP BY no banco.
+    """
+    not_modified = conditional_get(request, response, current_user)
+    if not_modified:
+        return not_modified
+    mes_referencia = date(year, month, 1)
+    data = services.get_category_drilldown(db, mes_referencia, current_user.id, categoria, tipo)
+    set_etag(request, response, current_user)
+    return data
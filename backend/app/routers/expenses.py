@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from datetime import date
+from typing import Literal, Optional
 
 from app.database import get_db
-from app.auth import get_current_user  # CR-002
+from app.auth import get_current_user, get_current_user_for_write  # CR-002
 from app.models import Expense, ExpenseStatus, User  # CR-002: User
-from app.schemas import ExpenseCreate, ExpenseUpdate, ExpenseResponse, InstallmentsResponse, InstallmentProjectionResponse
+from app.schemas import (
+    ExpenseBulkCreate, ExpenseCreate, ExpenseUpdate, ExpenseResponse, InstallmentsResponse, InstallmentProjectionResponse,
+    InstallmentSimulationRequest, InstallmentSimulationResponse,
+)
 from app.categories import EXPENSE_CATEGORIES, get_category_for_subcategory, is_valid_subcategory  # CR-016
-from app import crud, services
+from app import crud, services, simulation
+from app.etag import conditional_get, set_etag
 
 router = APIRouter(prefix="/api/expenses", tags=["expenses"])
 
@@ -20,26 +25,75 @@ def get_expense_categories():
 
 @router.get("/installments", response_model=InstallmentsResponse)
 def get_installments(
+    request: Request,
+    response: Response,
+    status: Optional[Literal["Em andamento", "Concluído"]] = Query(None, description="Filtra pelo status geral do grupo"),
+    summary: bool = Query(False, description="Retorna os grupos sem a lista de parcelas"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Grupos por pagina"),
+    cursor: Optional[str] = Query(None, description="next_cursor da pagina anterior"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Retorna todas as despesas parceladas agrupadas por compra.
+    Com ?status=, ?summary=true, ?limit= ou ?cursor= a filtragem, a ordem e a
+    paginacao (keyset) sao feitas no banco sobre installment_plans.
+    GET condicional: If-None-Match com o ETag atual responde 304.
     """
-    return crud.get_installment_expenses_grouped(db, current_user.id)
+    not_modified = conditional_get(request, response, current_user)
+    if not_modified:
+        return not_modified
+    if status is None and not summary and limit is None and cursor is None:
+        data = crud.get_installment_expenses_grouped(db, current_user.id)
+    else:
+        try:
+            data = services.get_installments_page(
+                db, current_user.id, status=status, summary_only=summary, cursor=cursor, limit=limit,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    set_etag(request, response, current_user)
+    return data
 
 
 @router.get("/installments/projection", response_model=InstallmentProjectionResponse)
 def get_installment_projection(
-    months: int = 12,
+    request: Request,
+    response: Response,
+    months: int = Query(12, ge=1, le=120, description="Horizonte da projecao em meses"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
-    CR-021: Retorna projecao de parcelas futuras para os proximos N meses.
+    CR-021: Retorna projecao de parcelas futuras para os proximos N meses (1 a 120).
     Inclui KPIs de resumo, projecao mensal e lista de parcelas ativas.
+    GET condicional: If-None-Match com o ETag atual responde 304.
     """
-    return services.get_installment_projection(db, current_user.id, months)
+    not_modified = conditional_get(request, response, current_user)
+    if not_modified:
+        return not_modified
+    data = services.get_installment_projection(db, current_user.id, months)
+    set_etag(request, response, current_user)
+    return data
+
+
+@router.post("/installments/projection/simulate", response_model=InstallmentSimulationResponse)
+def simulate_installment_projection(
+    data: InstallmentSimulationRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Simula compras parceladas hipoteticas sobre a projecao atual: projecao
+    mensal, variacao do comprometimento e impacto no score. Nada e gravado;
+    a linha de base fica em memoria ate a proxima escrita do usuario.
+    """
+    try:
+        return simulation.simulate_installment_projection(
+            db, current_user, [p.model_dump() for p in data.planos], data.months,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 # NOTE: duplicate route MUST be before create route to avoid
@@ -50,7 +104,7 @@ def get_installment_projection(
 def duplicate_expense(
     expense_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),  # CR-002
+    current_user: User = Depends(get_current_user_for_write),  # CR-002
 ):
     """RF-07: Duplicar despesa existente no mesmo mes."""
     original = crud.get_expense_by_id(db, expense_id, current_user.id)  # CR-002: ownership check
@@ -68,89 +122,61 @@ def duplicate_expense(
         parcela_atual=original.parcela_atual,
         parcela_total=original.parcela_total,
         recorrente=original.recorrente,
+        plan_id=original.plan_id,
         status=ExpenseStatus.PENDENTE.value,
     )
     return crud.create_expense(db, new_expense)
 
 
-from app.utils import add_months
-
-@router.post("/{year}/{month}", response_model=ExpenseResponse, status_code=201)
-def create_expense(
-    year: int,
-    month: int,
-    data: ExpenseCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),  # CR-002
-):
-    """
-    Criar nova despesa no mes especificado. 
-    Se for parcelada (parcela_total > 1), CRIA AUTOMATICAMENTE todas as parcelas futuras.
-    """
-    mes_referencia_inicial = date(year, month, 1)
-    
+def _purchase_values(data: ExpenseCreate) -> dict:
+    """Campos da despesa com a categoria derivada da subcategoria (CR-016)."""
     # Validações básicas
     if data.parcela_total and data.parcela_total > 1 and data.parcela_atual and data.parcela_atual > data.parcela_total:
         raise HTTPException(status_code=400, detail="Parcela atual não pode ser maior que total")
 
-    # CR-016: Validar e derivar categoria
     categoria = None
     if data.subcategoria:
         if not is_valid_subcategory(data.subcategoria):
             raise HTTPException(status_code=422, detail=f"Subcategoria inválida: {data.subcategoria}")
         categoria = get_category_for_subcategory(data.subcategoria)
+    return {**data.model_dump(), "categoria": categoria}
 
-    # 1. Criar a despesa do mês atual (que será retornada)
-    expense_atual = Expense(
-        user_id=current_user.id,
-        mes_referencia=mes_referencia_inicial,
-        nome=data.nome,
-        categoria=categoria,  # CR-016
-        subcategoria=data.subcategoria,  # CR-016
-        valor=data.valor,
-        vencimento=data.vencimento,
-        parcela_atual=data.parcela_atual,
-        parcela_total=data.parcela_total,
-        recorrente=data.recorrente,
-        status=ExpenseStatus.PENDENTE.value,
+
+@router.post("/{year}/{month}", response_model=ExpenseResponse, status_code=201)
+def create_expense(
+    year: int,
+    month: int,
+    data: ExpenseCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_for_write),  # CR-002
+):
+    """
+    Criar nova despesa no mes especificado.
+    Se for parcelada (parcela_total > 1), CRIA AUTOMATICAMENTE todas as parcelas
+    futuras, em um unico INSERT em lote (services.create_expense_purchases).
+    """
+    ids = services.create_expense_purchases(
+        db, current_user.id, date(year, month, 1), [_purchase_values(data)],
     )
-    db.add(expense_atual)
-    
-    # 2. Se for parcelada, criar as futuras (apenas se nao for recorrente infinita, que tem logica propria)
-    # Assumindo que 'recorrente' flag é para fixas mensais (Netflix) e 'parcela_total > 1' é compras parceladas (Notebook)
-    if data.parcela_total and data.parcela_total > 1:
-        # Quantas parcelas faltam criar?
-        # Se usuario ta criando parcela 1 de 10, faltam 9 (2 a 10)
-        start_p = (data.parcela_atual or 1) + 1
-        end_p = data.parcela_total
-        
-        for i in range(start_p, end_p + 1):
-            offset_months = i - data.parcela_atual
-            
-            # Calcular proximo mes de referencia
-            next_mes = add_months(mes_referencia_inicial, offset_months)
-            
-            # Calcular proximo vencimento (mantendo dia se possivel)
-            next_venc = add_months(data.vencimento, offset_months)
-            
-            future_expense = Expense(
-                user_id=current_user.id,
-                mes_referencia=next_mes,
-                nome=data.nome,
-                categoria=categoria,  # CR-016
-                subcategoria=data.subcategoria,  # CR-016
-                valor=data.valor,
-                vencimento=next_venc,
-                parcela_atual=i,
-                parcela_total=data.parcela_total,
-                recorrente=False, # Parcelas futuras nao sao "recorrentes" no sentido de flag
-                status=ExpenseStatus.PENDENTE.value
-            )
-            db.add(future_expense)
+    return crud.get_expense_by_id(db, ids[0], current_user.id)
 
-    db.commit()
-    db.refresh(expense_atual)
-    return expense_atual
+
+@router.post("/{year}/{month}/bulk", response_model=list[ExpenseResponse], status_code=201)
+def create_expenses_bulk(
+    year: int,
+    month: int,
+    data: ExpenseBulkCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_for_write),
+):
+    """
+    Cria varias despesas no mes especificado em uma transacao (ex.: importacao
+    da fatura do cartao). Cada compra parcelada gera todas as parcelas futuras.
+    Retorna a despesa do mes de cada compra, na ordem enviada.
+    """
+    compras = [_purchase_values(item) for item in data.despesas]
+    ids = services.create_expense_purchases(db, current_user.id, date(year, month, 1), compras)
+    return crud.get_expenses_by_ids(db, ids, current_user.id)
 
 
 @router.patch("/{expense_id}", response_model=ExpenseResponse)
@@ -158,7 +184,7 @@ def update_expense(
     expense_id: str,
     data: ExpenseUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),  # CR-002
+    current_user: User = Depends(get_current_user_for_write),  # CR-002
 ):
     """Atualizar despesa existente. PATCH: apenas campos enviados sao alterados."""
     expense = crud.get_expense_by_id(db, expense_id, current_user.id)  # CR-002: ownership check
@@ -182,6 +208,15 @@ def update_expense(
             setattr(expense, field, value.value)
         else:
             setattr(expense, field, value)
+    if "recorrente" in update_data:
+        expense.recorrencia_encerrada = False  # CR-009: recorrencia redefinida pelo usuario
+
+    # Despesa que passou a ser parcelada ganha seu proprio plano
+    if expense.parcela_total and expense.parcela_total > 1 and expense.plan_id is None:
+        expense.plan_id = crud.add_installment_plan(
+            db, current_user.id, expense.nome, expense.valor,
+            expense.parcela_total, expense.parcela_atual, expense.vencimento,
+        ).id
 
     return crud.update_expense(db, expense)
 
@@ -190,15 +225,26 @@ def update_expense(
 def delete_expense(
     expense_id: str,
     delete_all: bool = False,
+    forward: bool = Query(False, description="Com delete_all, exclui a recorrente deste mes em diante"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),  # CR-002
+    current_user: User = Depends(get_current_user_for_write),  # CR-002
 ):
-    """Excluir despesa por ID. Suporta exclusao em serie (CR-009)."""
+    """
+    Excluir despesa por ID. Suporta exclusao em serie (CR-009) com um DELETE
+    em lote; com forward=true, uma despesa recorrente e excluida do mes dela
+    em diante, mantendo os meses anteriores.
+    """
     expense = crud.get_expense_by_id(db, expense_id, current_user.id)  # CR-002: ownership check
     if not expense:
         raise HTTPException(status_code=404, detail="Despesa não encontrada")
 
-    if delete_all and ((expense.parcela_total is not None and expense.parcela_total > 1) or expense.recorrente):
-        crud.delete_expense_related(db, expense)
+    is_installment = expense.parcela_total is not None and expense.parcela_total > 1
+    if delete_all and (is_installment or expense.recorrente):
+        if forward and is_installment:
+            raise HTTPException(
+                status_code=400,
+                detail="Exclusão a partir do mês se aplica apenas a despesas recorrentes",
+            )
+        services.delete_expense_series(db, expense, expense.mes_referencia if forward else None)
     else:
         crud.delete_expense(db, expense)
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from datetime import date
 
 from app.database import get_db
-from app.auth import get_current_user  # CR-002
+from app.auth import get_current_user_for_write  # CR-002
 from app.models import Income, User  # CR-002: User
 from app.schemas import IncomeCreate, IncomeUpdate, IncomeResponse
 from app import crud
@@ -17,7 +17,7 @@ def create_income(
     month: int,
     data: IncomeCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),  # CR-002
+    current_user: User = Depends(get_current_user_for_write),  # CR-002
 ):
     """Criar nova receita no mes especificado. user_id setado automaticamente."""
     mes_referencia = date(year, month, 1)
@@ -37,7 +37,7 @@ def update_income(
     income_id: str,
     data: IncomeUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),  # CR-002
+    current_user: User = Depends(get_current_user_for_write),  # CR-002
 ):
     """Atualizar receita existente."""
     income = crud.get_income_by_id(db, income_id, current_user.id)  # CR-002: ownership check
@@ -55,7 +55,7 @@ def update_income(
 def delete_income(
     income_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),  # CR-002
+    current_user: User = Depends(get_current_user_for_write),  # CR-002
 ):
     """Excluir receita por ID."""
     income = crud.get_income_by_id(db, income_id, current_user.id)  # CR-002: ownership check
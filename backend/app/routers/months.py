@@ -1,20 +1,62 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from datetime import date
 
 from app.database import get_db
 from app.auth import get_current_user  # CR-002
 from app.models import User  # CR-002
-from app.schemas import MonthlySummary
+from app.schemas import MonthlySummary, MonthlyTotals, MonthlyRangeResponse
 from app import services
+from app.etag import conditional_get, set_etag
+from app.utils import months_between
 
 router = APIRouter(prefix="/api/months", tags=["months"])
 
+MAX_RANGE_MONTHS = 24
+_MONTH_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])$"
 
-@router.get("/{year}/{month}", response_model=MonthlySummary)
+
+def _parse_month(value: str) -> date:
+    """Converte 'YYYY-MM' (ja validado pelo pattern) no 1o dia do mes."""
+    year, month = value.split("-")
+    return date(int(year), int(month), 1)
+
+
+@router.get("/range", response_model=MonthlyRangeResponse)
+def get_monthly_range(
+    request: Request,
+    response: Response,
+    from_: str = Query(..., alias="from", pattern=_MONTH_PATTERN),
+    to: str = Query(..., pattern=_MONTH_PATTERN),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    GET /api/months/range?from=2026-01&to=2026-12 → visoes mensais do intervalo.
+    Despesas e receitas do intervalo inteiro sao carregadas com duas queries;
+    usado pelo frontend para prefetch de meses adjacentes. Maximo de 24 meses.
+    """
+    from_mes, to_mes = _parse_month(from_), _parse_month(to)
+    if from_mes > to_mes:
+        raise HTTPException(status_code=400, detail="'from' deve ser anterior ou igual a 'to'")
+    if months_between(from_mes, to_mes) >= MAX_RANGE_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Intervalo maximo de {MAX_RANGE_MONTHS} meses")
+
+    not_modified = conditional_get(request, response, current_user)
+    if not_modified:
+        return not_modified
+    meses = services.get_monthly_range(db, from_mes, to_mes, current_user.id)
+    set_etag(request, response, current_user)
+    return {"meses": meses}
+
+
+@router.get("/{year}/{month}", response_model=MonthlySummary | MonthlyTotals)
 def get_monthly_view(
     year: int,
     month: int,
+    request: Request,
+    response: Response,
+    summary: bool = Query(False, description="Retorna apenas os totalizadores, sem as listas"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),  # CR-002
 ):
@@ -22,9 +64,16 @@ def get_monthly_view(
     GET /api/months/2026/2 → visao mensal completa de fevereiro 2026.
     Dispara geracao de mes se vazio (RF-06).
     Aplica auto-deteccao de status (RF-05).
-    Retorna despesas, receitas e totalizadores.
+    Retorna despesas, receitas e totalizadores (?summary=true: so totalizadores).
     Dados filtrados por usuario autenticado (CR-002, RN-015).
+    GET condicional: If-None-Match com o ETag atual responde 304.
     """
+    not_modified = conditional_get(request, response, current_user)
+    if not_modified:
+        return not_modified
     mes_referencia = date(year, month, 1)
-    summary = services.get_monthly_summary(db, mes_referencia, current_user.id)  # CR-002
-    return summary
+    data = services.get_monthly_summary(
+        db, mes_referencia, current_user.id, summary_only=summary
+    )  # CR-002
+    set_etag(request, response, current_user)
+    return data
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, model_validator
 from datetime import date, datetime
-from typing import Optional
+from typing import Literal, Optional
 
 from app.models import ExpenseStatus
 
@@ -32,6 +32,11 @@ class ExpenseCreate(BaseModel):
         return self
 
 
+class ExpenseBulkCreate(BaseModel):
+    """Varias despesas criadas no mesmo mes em uma requisicao (ex.: fatura do cartao)."""
+    despesas: list[ExpenseCreate] = Field(..., min_length=1, max_length=500)
+
+
 class ExpenseUpdate(BaseModel):
     """Schema para atualizacao parcial (PATCH). Apenas campos enviados sao alterados."""
     nome: Optional[str] = Field(None, min_length=1, max_length=255)
@@ -58,6 +63,7 @@ class ExpenseResponse(BaseModel):
     parcela_atual: Optional[int]
     parcela_total: Optional[int]
     recorrente: bool
+    plan_id: Optional[str] = None
     status: str
     created_at: datetime
     updated_at: datetime
@@ -97,8 +103,8 @@ class IncomeResponse(BaseModel):
 
 # ========== Summary Schema ==========
 
-class MonthlySummary(BaseModel):
-    """Resposta composta da visao mensal: despesas + receitas + totalizadores."""
+class MonthlyTotals(BaseModel):
+    """Totalizadores da visao mensal (GET /api/months/{y}/{m}?summary=true)."""
     mes_referencia: date
     total_despesas: float
     total_receitas: float
@@ -106,10 +112,19 @@ class MonthlySummary(BaseModel):
     total_pago: float       # CR-004: total despesas com status Pago
     total_pendente: float   # CR-004: total despesas com status Pendente
     total_atrasado: float   # CR-004: total despesas com status Atrasado
+
+
+class MonthlySummary(MonthlyTotals):
+    """Resposta composta da visao mensal: despesas + receitas + totalizadores."""
     expenses: list[ExpenseResponse]
     incomes: list[IncomeResponse]
 
 
+class MonthlyRangeResponse(BaseModel):
+    """Visoes mensais de um intervalo (GET /api/months/range), em ordem cronologica."""
+    meses: list[MonthlySummary]
+
+
 # ========== Daily Expense Schemas (CR-005) ==========
 
 class DailyExpenseCreate(BaseModel):
@@ -239,13 +254,17 @@ class ChangePasswordRequest(BaseModel):
 
 class InstallmentGroup(BaseModel):
     """Grupo de parcelas de uma mesma compra."""
+    plan_id: Optional[str] = None
     nome: str
     parcela_total: int
     status_geral: str
+    primeiro_vencimento: Optional[date] = None
     valor_total_compra: float
     valor_pago: float
     valor_restante: float
-    installments: list[ExpenseResponse]
+    quantidade: int = 0
+    parcelas_pagas: int = 0
+    installments: list[ExpenseResponse] = []  # vazio com ?summary=true
 
 
 class InstallmentsResponse(BaseModel):
@@ -255,6 +274,7 @@ class InstallmentsResponse(BaseModel):
     total_pago: float
     total_pendente: float
     total_atrasado: float
+    next_cursor: Optional[str] = None  # keyset: passar em ?cursor= para a proxima pagina
 
 
 # ========== Installment Projection Schemas (CR-021) ==========
@@ -303,6 +323,43 @@ class InstallmentProjectionResponse(BaseModel):
     parcelas: list[InstallmentProjectionItem]
 
 
+class InstallmentSimulationPlan(BaseModel):
+    """Compra parcelada hipotetica; mes_inicio padrao e o proximo mes."""
+    nome: str = Field("Simulação", min_length=1, max_length=255)
+    valor_mensal: float = Field(..., gt=0)
+    parcela_total: int = Field(..., ge=2, le=120)
+    mes_inicio: Optional[date] = None
+
+
+class InstallmentSimulationRequest(BaseModel):
+    """Planos hipoteticos somados a projecao atual."""
+    planos: list[InstallmentSimulationPlan] = Field(..., min_length=1, max_length=20)
+    months: int = Field(12, ge=1, le=120)
+
+
+class MonthSimulationDelta(BaseModel):
+    """Variacao de um mes da projecao (simulado - atual)."""
+    mes: date
+    total_comprometido: float
+    percentual_comprometimento: float
+
+
+class SimulatedScoreImpact(BaseModel):
+    """Score de saude do mes atual antes e depois das compras simuladas."""
+    score_atual: int
+    score_simulado: int
+    variacao: int
+    classificacao_atual: str
+    classificacao_simulada: str
+
+
+class InstallmentSimulationResponse(BaseModel):
+    """Projecao com as compras hipoteticas, variacao mensal e impacto no score."""
+    projecao: InstallmentProjectionResponse
+    variacao_mensal: list[MonthSimulationDelta]
+    score: SimulatedScoreImpact
+
+
 # ========== Dashboard Schemas (CR-019) ==========
 
 class CategoryBreakdown(BaseModel):
@@ -313,6 +370,24 @@ class CategoryBreakdown(BaseModel):
     count: int
 
 
+class SubcategoryBreakdown(BaseModel):
+    """Detalhamento de uma categoria por subcategoria."""
+    subcategoria: str
+    total: float
+    percentual: float
+    count: int
+
+
+class CategoryDrilldownResponse(BaseModel):
+    """GET /api/dashboard/{y}/{m}/categories/{categoria}: subcategorias de uma fatia do donut."""
+    mes_referencia: date
+    categoria: str
+    tipo: Literal["planejadas", "diarios"]
+    total: float
+    count: int
+    subcategorias: list[SubcategoryBreakdown]
+
+
 class MonthEvolutionPoint(BaseModel):
     """Ponto de dados para grafico de evolucao mensal (6 meses)."""
     mes_referencia: date
@@ -436,6 +511,42 @@ class HealthScoreResponse(BaseModel):
     cenario_conservador: ConservativeScenario | None = None
     acoes: list[ScoreAction] = []
 
+class ScoreSimulationEdit(BaseModel):
+    """
+    Edicao hipotetica no mes atual: pagar, remover ou alterar_valor uma
+    despesa existente (expense_id), ou adicionar_parcelamento (valor_mensal,
+    parcela_total e mes_inicio opcional, padrao proximo mes).
+    """
+    tipo: Literal["pagar", "remover", "alterar_valor", "adicionar_parcelamento"]
+    expense_id: Optional[str] = None
+    valor: Optional[float] = Field(None, gt=0)
+    nome: str = Field("Simulação", min_length=1, max_length=255)
+    valor_mensal: Optional[float] = Field(None, gt=0)
+    parcela_total: Optional[int] = Field(None, ge=2, le=120)
+    mes_inicio: Optional[date] = None
+
+    @model_validator(mode="after")
+    def validate_campos(self) -> "ScoreSimulationEdit":
+        """Campos obrigatorios de cada tipo de edicao."""
+        if self.tipo == "adicionar_parcelamento":
+            if self.valor_mensal is None or self.parcela_total is None:
+                raise ValueError("adicionar_parcelamento requer valor_mensal e parcela_total")
+        elif self.expense_id is None:
+            raise ValueError(f"{self.tipo} requer expense_id")
+        if self.tipo == "alterar_valor" and self.valor is None:
+            raise ValueError("alterar_valor requer valor")
+        return self
+
+class ScoreSimulationRequest(BaseModel):
+    """Edicoes aplicadas em ordem sobre os dados atuais."""
+    edicoes: list[ScoreSimulationEdit] = Field(..., min_length=1, max_length=50)
+
+class ScoreSimulationResponse(BaseModel):
+    score: ScoreInfo
+    dimensoes: ScoreDimensoes
+    impacto: SimulatedScoreImpact
+    dimensoes_recalculadas: list[str]
+
 class ScoreHistoryItem(BaseModel):
     mes_referencia: str
     score_total: int
@@ -450,6 +561,11 @@ class ScoreHistoryResponse(BaseModel):
     meses_solicitados: int
     meses_disponiveis: int
 
+class ScoreHistoryRebuildResponse(BaseModel):
+    meses_calculados: int
+    inseridos: int
+    atualizados: int
+
 
 # ========== AI Analysis (CR-032) ==========
 
@@ -0,0 +1,492 @@
+"""
+Score de saude financeira do mes atual com cache por fingerprint (CR-026).
+
+Fingerprint: (users.data_version, dia), o mesmo versionamento dos ETags
+(ver app.etag). Cada calculo grava em score_cache o fingerprint e a
+resposta, devolvida enquanto o fingerprint nao muda, mesmo apos reinicio e
+entre workers; score_historico so e regravado quando o score muda. Uma
+camada em memoria por processo, com a mesma chave, guarda tambem as entradas
+do calculo (base de simulate_score) e evita a leitura da linha gravada.
+
+rebuild_score_history recalcula os meses anteriores ao atual de uma vez,
+preenchendo os meses em que o usuario nao abriu /api/score (D4c e alerta A4
+dependem do mes anterior), e incrementa data_version se gravou algo.
+
+simulate_score reavalia o score do mes atual com edicoes hipoteticas (pagar,
+remover, alterar valor, nova compra parcelada) sobre as entradas guardadas
+junto com a resposta, recalculando apenas as dimensoes afetadas.
+
+calculate_health_scores_bulk pontua muitos usuario-mes de uma vez: linhas do
+Core direto para as colunas do calculo colunar, sem objetos ORM.
+"""
+import json
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.health_score import (
+    DIMENSOES,
+    build_score_columns_from_rows,
+    calculate_conservative_score,
+    calculate_health_score,
+    calculate_health_scores_columnar,
+    generate_actions,
+    is_regular_score,
+    recalculate_health_score,
+)
+from app.models import Expense, ExpenseStatus, ScoreHistorico, User
+from app.services import bump_data_version, get_monthly_summary, get_next_month, get_previous_month
+from app.utils import add_months
+
+# Usuarios com entradas do score em memoria (LRU), base de simulate_score
+SCORE_CACHE_SIZE = 1024
+
+# Por usuario: (fingerprint, {"response", "inputs", "score_data"})
+_score_cache: "OrderedDict[str, tuple[tuple, dict]]" = OrderedDict()
+_score_lock = threading.Lock()
+
+
+def clear_score_cache(user_id: str | None = None) -> None:
+    """
+    Descarta a camada em memoria deste processo (testes: equivale a reiniciar).
+    A invalidacao e sempre pelo fingerprint; nenhum fluxo depende desta funcao.
+    """
+    with _score_lock:
+        if user_id is None:
+            _score_cache.clear()
+        else:
+            _score_cache.pop(user_id, None)
+
+
+def score_fingerprint(user: User, today: date) -> tuple:
+    """Versao dos dados que alimentam o score do dia."""
+    return (user.data_version, today)
+
+
+def score_inputs(db: Session, user_id: str, mes_atual: date, prev_score: ScoreHistorico | None) -> dict:
+    """Entradas de calculate_health_score para o mes (coleta de /api/score)."""
+    # 1. Dados do mes (com auto-generate e status detection)
+    monthly = get_monthly_summary(db, mes_atual, user_id)
+
+    # 2. Gastos diarios do mes
+    daily_expenses = crud.get_daily_expenses_by_month(db, mes_atual, user_id)
+
+    # 3. Grupos de parcelas
+    installment_groups = crud.get_installment_expenses_grouped(db, user_id)["groups"]
+
+    # 4. Historico de gastos diarios (3 meses anteriores para media de variaveis)
+    daily_expense_history = []
+    check_mes = get_previous_month(mes_atual)
+    for _ in range(3):
+        total = crud.get_daily_expense_total_by_month(db, check_mes, user_id)
+        if total > 0:
+            daily_expense_history.append((check_mes, total))
+        check_mes = get_previous_month(check_mes)
+    daily_expense_history.reverse()  # cronologico
+
+    # 5. Comprometimento do mes anterior (para D4c tendencia)
+    if prev_score and prev_score.dados_snapshot:
+        prev_comprometimento = json.loads(prev_score.dados_snapshot).get("comprometimento_pct")
+    else:
+        prev_comprometimento = None
+
+    return {
+        "renda": monthly["total_receitas"],
+        "expenses": monthly["expenses"],
+        "daily_expenses": daily_expenses,
+        "installment_groups": installment_groups,
+        "daily_expense_history": daily_expense_history,
+        "prev_month_comprometimento": prev_comprometimento,
+        "mes_atual": mes_atual,
+    }
+
+
+def score_persist_data(score_data: dict, cenario_conservador: dict | None, inputs: dict) -> dict:
+    """Valores gravados em score_historico para o score calculado."""
+    renda = inputs["renda"]
+    dims = score_data["dimensoes"]
+    total_fixos = sum(float(e.valor) for e in inputs["expenses"])
+    total_variaveis = sum(float(de.valor) for de in inputs["daily_expenses"])
+    comprometimento_pct = round((total_fixos + total_variaveis) / renda * 100, 1) if renda > 0 else 0
+
+    return {
+        "score_total": score_data["score"]["total"],
+        "d1_comprometimento": dims["d1_comprometimento"]["pontos"],
+        "d2_parcelas": dims["d2_parcelas"]["pontos"],
+        "d3_poupanca": dims["d3_poupanca"]["pontos"],
+        "d4_comportamento": dims["d4_comportamento"]["pontos"],
+        "classificacao": score_data["score"]["classificacao"],
+        "score_conservador": cenario_conservador["score"] if cenario_conservador else None,
+        "dados_snapshot": {
+            "renda": renda,
+            "total_fixos": total_fixos,
+            "total_variaveis": total_variaveis,
+            "comprometimento_pct": comprometimento_pct,
+            "qtd_parcelas": len([
+                g for g in inputs["installment_groups"] if g["status_geral"] == "Em andamento"
+            ]),
+        },
+    }
+
+
+def _build_score_entry(db: Session, user: User, today: date) -> tuple[tuple, dict]:
+    """
+    Calcula o score do mes, persiste em score_historico (se mudou) e a resposta
+    com o fingerprint em score_cache, e retorna (fingerprint, entrada): a
+    resposta com as entradas e o resultado de calculate_health_score (base de
+    simulate_score).
+    """
+    mes_atual = date(today.year, today.month, 1)
+    prev_score = crud.get_score_by_month(db, user.id, get_previous_month(mes_atual))
+    inputs = score_inputs(db, user.id, mes_atual, prev_score)
+    renda = inputs["renda"]
+    installment_groups = inputs["installment_groups"]
+
+    score_data = calculate_health_score(**inputs)
+    cenario_conservador = calculate_conservative_score(score_data, installment_groups, renda)
+    acoes = generate_actions(score_data, renda, inputs["expenses"], inputs["daily_expenses"], installment_groups)
+
+    variacao = None
+    if prev_score:
+        variacao = score_data["score"]["total"] - prev_score.score_total
+
+    response = {
+        "score": {
+            **score_data["score"],
+            "variacao_mes_anterior": variacao,
+        },
+        "dimensoes": score_data["dimensoes"],
+        "cenario_conservador": cenario_conservador,
+        "acoes": acoes,
+    }
+
+    # Apos a coleta: ela pode replicar o mes ou varrer atrasos (data_version incrementado)
+    fingerprint = score_fingerprint(user, today)
+    persist_data = score_persist_data(score_data, cenario_conservador, inputs)
+    crud.upsert_score_historico(db, user.id, mes_atual, persist_data)
+    crud.upsert_score_cache(db, user.id, *fingerprint, json.dumps(response, default=str))
+    return fingerprint, {"response": response, "inputs": inputs, "score_data": score_data}
+
+
+def _memory_entry(user_id: str, fingerprint: tuple) -> dict | None:
+    with _score_lock:
+        cached = _score_cache.get(user_id)
+        if cached is None or cached[0] != fingerprint:
+            return None
+        _score_cache.move_to_end(user_id)
+        return cached[1]
+
+
+def _store_memory_entry(user_id: str, fingerprint: tuple, entry: dict) -> dict:
+    with _score_lock:
+        _score_cache[user_id] = (fingerprint, entry)
+        _score_cache.move_to_end(user_id)
+        while len(_score_cache) > SCORE_CACHE_SIZE:
+            _score_cache.popitem(last=False)
+    return entry
+
+
+def get_score_entry(db: Session, user: User, today: date) -> dict:
+    """
+    Entrada em memoria do usuario: resposta, entradas do calculo e score_data
+    (base dos simuladores), recalculada quando o fingerprint muda.
+    """
+    entry = _memory_entry(user.id, score_fingerprint(user, today))
+    if entry is None:
+        entry = _store_memory_entry(user.id, *_build_score_entry(db, user, today))
+    return entry
+
+
+def get_health_score(db: Session, user: User, today: date | None = None) -> dict:
+    """
+    Resposta de GET /api/score. Com o fingerprint inalterado vem da camada em
+    memoria do processo ou, apos reinicio ou em outro worker, da resposta
+    gravada em score_cache (uma query); senao o score e recalculado. Duas
+    requisicoes concorrentes podem recalcular o mesmo score; os upserts sao
+    idempotentes e a ultima resposta gravada e identica.
+    """
+    today = today or date.today()
+    fingerprint = score_fingerprint(user, today)
+    entry = _memory_entry(user.id, fingerprint)
+    if entry is not None:
+        return entry["response"]
+    record = crud.get_score_cache(db, user.id)
+    if record is not None and (record.data_version, record.calculado_em) == fingerprint:
+        return json.loads(record.resposta)
+    return _store_memory_entry(user.id, *_build_score_entry(db, user, today))["response"]
+
+
+def hypothetical_item(plano: dict, mes_atual: date) -> dict:
+    """
+    Item de projecao de uma compra parcelada ainda nao feita (nenhuma parcela
+    paga). mes_inicio padrao: proximo mes; ValueError se anterior ao mes atual.
+    """
+    mes_inicio = plano.get("mes_inicio")
+    if mes_inicio is None:
+        mes_inicio = add_months(mes_atual, 1)
+    else:
+        mes_inicio = date(mes_inicio.year, mes_inicio.month, 1)
+    if mes_inicio < mes_atual:
+        raise ValueError("mes_inicio não pode ser anterior ao mês atual")
+
+    parcela_total = plano["parcela_total"]
+    return {
+        "nome": plano["nome"],
+        "valor_mensal": float(plano["valor_mensal"]),
+        "parcela_atual": 0,
+        "parcela_total": parcela_total,
+        "parcelas_restantes": parcela_total,
+        "mes_inicio": mes_inicio,
+        "mes_termino": add_months(mes_inicio, parcela_total - 1),
+        "status_badge": "Encerrando" if parcela_total <= 2 else "Ativa",
+    }
+
+
+def hypothetical_group(item: dict, created_at: datetime) -> dict:
+    """Grupo de parcelas no formato de get_installment_expenses_grouped, sem persistir."""
+    valor = Decimal(str(item["valor_mensal"]))
+    installments = [
+        Expense(
+            nome=item["nome"],
+            valor=valor,
+            mes_referencia=add_months(item["mes_inicio"], offset),
+            vencimento=add_months(item["mes_inicio"], offset),
+            parcela_atual=offset + 1,
+            parcela_total=item["parcela_total"],
+            recorrente=False,
+            status=ExpenseStatus.PENDENTE.value,
+            created_at=created_at,
+        )
+        for offset in range(item["parcela_total"])
+    ]
+    return {
+        "plan_id": None,
+        "nome": item["nome"],
+        "parcela_total": item["parcela_total"],
+        "status_geral": "Em andamento",
+        "installments": installments,
+    }
+
+
+_EXPENSE_ATTRS = tuple(attr.key for attr in inspect(Expense).column_attrs)
+
+
+def _edited_expense(expense: Expense, **changes) -> Expense:
+    """Copia transiente da despesa com os campos alterados (a do cache nao muda)."""
+    return Expense(**{**{key: getattr(expense, key) for key in _EXPENSE_ATTRS}, **changes})
+
+
+def _apply_score_edits(inputs: dict, edicoes: list[dict], mes_atual: date) -> tuple[dict, set[str]]:
+    """
+    Entradas de calculate_health_score com as edicoes aplicadas e as
+    dimensoes afetadas. Despesas do mes mexem em D1/D3/D4 (pagar: so D4,
+    pontualidade); parcelas mexem em D2/D4 (pagas, valor, nova parcela longa).
+    Levanta LookupError para despesa inexistente e ValueError para mes_inicio passado.
+    """
+    expenses = list(inputs["expenses"])
+    groups = list(inputs["installment_groups"])
+    afetadas: set[str] = set()
+    now = datetime.now()
+
+    for edicao in edicoes:
+        tipo = edicao["tipo"]
+        if tipo == "adicionar_parcelamento":
+            item = hypothetical_item(edicao, mes_atual)
+            group = hypothetical_group(item, now)
+            groups.append(group)
+            afetadas |= {"d2_parcelas", "d4_comportamento"}
+            if item["mes_inicio"] == mes_atual:
+                expenses.append(group["installments"][0])
+                afetadas |= {"d1_comprometimento", "d3_poupanca"}
+            continue
+
+        expense_id = edicao["expense_id"]
+        no_mes = next((i for i, e in enumerate(expenses) if e.id == expense_id), None)
+        no_grupo = next(
+            ((g, i) for g, group in enumerate(groups)
+             for i, inst in enumerate(group["installments"]) if inst.id == expense_id),
+            None,
+        )
+        if no_mes is None and no_grupo is None:
+            raise LookupError("Despesa não encontrada")
+
+        original = expenses[no_mes] if no_mes is not None else groups[no_grupo[0]]["installments"][no_grupo[1]]
+        if tipo == "pagar":
+            editada = _edited_expense(original, status=ExpenseStatus.PAGO.value)
+        elif tipo == "alterar_valor":
+            editada = _edited_expense(original, valor=Decimal(str(edicao["valor"])))
+        else:  # remover
+            editada = None
+
+        if no_mes is not None:
+            if editada is None:
+                del expenses[no_mes]
+            else:
+                expenses[no_mes] = editada
+            afetadas.add("d4_comportamento")
+            if tipo != "pagar":
+                afetadas |= {"d1_comprometimento", "d3_poupanca"}
+
+        if no_grupo is not None:
+            g, i = no_grupo
+            installments = list(groups[g]["installments"])
+            if editada is None:
+                del installments[i]
+            else:
+                installments[i] = editada
+            if installments:
+                todas_pagas = all(inst.status == ExpenseStatus.PAGO.value for inst in installments)
+                groups[g] = {
+                    **groups[g],
+                    "installments": installments,
+                    "status_geral": "Concluído" if todas_pagas else "Em andamento",
+                }
+            else:
+                del groups[g]  # compra sem parcelas sai da listagem
+            afetadas |= {"d2_parcelas", "d4_comportamento"}
+
+    return {**inputs, "expenses": expenses, "installment_groups": groups}, afetadas
+
+
+def simulate_score(db: Session, user: User, edicoes: list[dict], today: date | None = None) -> dict:
+    """
+    Score do mes atual com edicoes hipoteticas sobre as entradas guardadas no
+    cache de get_health_score (sem consultar o banco quando o cache esta
+    valido). Apenas as dimensoes afetadas pelas edicoes sao recalculadas; nos
+    casos especiais (sem renda ou sem despesas) o score e recalculado inteiro.
+    """
+    today = today or date.today()
+    entry = get_score_entry(db, user, today)
+    inputs, base = entry["inputs"], entry["score_data"]
+    simulado_inputs, afetadas = _apply_score_edits(inputs, edicoes, date(today.year, today.month, 1))
+
+    regular = is_regular_score(inputs["renda"], inputs["expenses"], inputs["daily_expenses"],
+                               inputs["installment_groups"])
+    if regular:
+        simulado = recalculate_health_score(base, afetadas, **simulado_inputs)
+    else:
+        simulado = calculate_health_score(**simulado_inputs)
+        afetadas = set(DIMENSOES)
+
+    atual_total = base["score"]["total"]
+    simulado_total = simulado["score"]["total"]
+    variacao_anterior = entry["response"]["score"]["variacao_mes_anterior"]
+    return {
+        "score": {
+            **simulado["score"],
+            "variacao_mes_anterior": (
+                None if variacao_anterior is None else variacao_anterior + simulado_total - atual_total
+            ),
+        },
+        "dimensoes": simulado["dimensoes"],
+        "impacto": {
+            "score_atual": atual_total,
+            "score_simulado": simulado_total,
+            "variacao": simulado_total - atual_total,
+            "classificacao_atual": base["score"]["classificacao"],
+            "classificacao_simulada": simulado["score"]["classificacao"],
+        },
+        "dimensoes_recalculadas": [key for key in DIMENSOES if key in afetadas],
+    }
+
+
+def _group_by_month(rows: list) -> dict[date, list]:
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row.mes_referencia].append(row)
+    return grouped
+
+
+def rebuild_score_history(db: Session, user_id: str, today: date | None = None) -> dict:
+    """
+    Recalcula o score de todos os meses do historico do usuario, do primeiro
+    mes com dados ate o mes anterior ao atual (o mes atual e gravado por
+    get_health_score). Despesas, receitas, gastos diarios, parcelas e scores
+    gravados sao carregados uma vez; os meses sao percorridos em memoria em
+    ordem cronologica, cada um usando o comprometimento do anterior (D4c), e
+    score_historico e gravado em lote. Meses sem nenhum dado sao ignorados.
+    Retorna contagens de meses calculados, inseridos e atualizados.
+    """
+    today = today or date.today()
+    ultimo_mes = get_previous_month(date(today.year, today.month, 1))
+    primeiro_mes = crud.get_first_data_month(db, user_id)
+    if primeiro_mes is None or primeiro_mes > ultimo_mes:
+        return {"meses_calculados": 0, "inseridos": 0, "atualizados": 0}
+
+    expenses = _group_by_month(crud.get_expenses_by_month_range(db, primeiro_mes, ultimo_mes, user_id))
+    incomes = _group_by_month(crud.get_incomes_by_month_range(db, primeiro_mes, ultimo_mes, user_id))
+    daily = _group_by_month(crud.get_daily_expenses_by_month_range(db, primeiro_mes, ultimo_mes, user_id))
+    installment_groups = crud.get_installment_expenses_grouped(db, user_id)["groups"]
+    existing = crud.get_score_historico_map(db, user_id)
+
+    # Mesmas somas de get_monthly_summary e get_daily_expense_total_by_month
+    daily_totals = {
+        mes: round(float(sum((Decimal(str(de.valor)) for de in rows), Decimal(0))), 2)
+        for mes, rows in daily.items()
+    }
+    comprometimento = {
+        mes: json.loads(record.dados_snapshot).get("comprometimento_pct")
+        for mes, record in existing.items() if record.dados_snapshot
+    }
+
+    scores = {}
+    mes = primeiro_mes
+    while mes <= ultimo_mes:
+        if mes in expenses or mes in incomes or mes in daily:
+            daily_expense_history = []
+            check_mes = get_previous_month(mes)
+            for _ in range(3):
+                total = daily_totals.get(check_mes, 0)
+                if total > 0:
+                    daily_expense_history.append((check_mes, total))
+                check_mes = get_previous_month(check_mes)
+            daily_expense_history.reverse()
+
+            inputs = {
+                "renda": float(sum((Decimal(str(i.valor)) for i in incomes.get(mes, [])), Decimal(0))),
+                "expenses": expenses.get(mes, []),
+                "daily_expenses": daily.get(mes, []),
+                "installment_groups": installment_groups,
+                "daily_expense_history": daily_expense_history,
+                "prev_month_comprometimento": comprometimento.get(get_previous_month(mes)),
+                "mes_atual": mes,
+            }
+            score_data = calculate_health_score(**inputs)
+            cenario_conservador = calculate_conservative_score(score_data, installment_groups, inputs["renda"])
+            scores[mes] = score_persist_data(score_data, cenario_conservador, inputs)
+            comprometimento[mes] = scores[mes]["dados_snapshot"]["comprometimento_pct"]
+        mes = get_next_month(mes)
+
+    inseridos, atualizados = crud.bulk_upsert_score_historico(db, user_id, scores, existing)
+    if inseridos or atualizados:
+        # variacao_mes_anterior e D4c do mes atual dependem do mes anterior
+        bump_data_version(db, user_id)
+    db.commit()
+    return {"meses_calculados": len(scores), "inseridos": inseridos, "atualizados": atualizados}
+
+
+def calculate_health_scores_bulk(db: Session, user_months: list[tuple[str, date]]) -> dict:
+    """
+    Pontos de D1-D4, total e classificacao de cada (user_id, mes), na ordem de
+    user_months (colunas de calculate_health_scores_columnar). As entradas sao
+    as de score_inputs lidas em lote (crud.get_score_column_rows), sem
+    replicacao nem varredura de atraso e sem parcelas fora de planos.
+    """
+    rows = crud.get_score_column_rows(db, user_months)
+    month_rows = [
+        (
+            round(renda or 0, 2),  # mesma soma em centavos de get_monthly_summary
+            mes,
+            json.loads(snapshot).get("comprometimento_pct") if snapshot else None,
+        )
+        for mes, renda, snapshot in rows["months"]
+    ]
+    cols = build_score_columns_from_rows(
+        month_rows, rows["expenses"], rows["daily"], rows["history"], rows["groups"], rows["installments"],
+    )
+    return calculate_health_scores_columnar(cols)
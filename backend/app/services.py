@@ -1,16 +1,26 @@
+import base64
 import calendar
+import json
 import logging
+import uuid
 from datetime import date
+from decimal import Decimal
+from itertools import chain
 
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 
 from collections import defaultdict
 
 from app import crud
-from app.models import Expense, ExpenseStatus, Income
+from app.models import DailyExpense, Expense, ExpenseStatus, Income, MonthState, User
+from app.utils import add_months, months_between
 
 logger = logging.getLogger(__name__)
 
+# RF-06: Maior lacuna (em meses) preenchida de uma vez pelo forward-fill
+MAX_FORWARD_FILL_MONTHS = 120
+
 
 def get_next_month(current: date) -> date:
     """Dado um mes_referencia (1o dia do mes), retorna 1o dia do proximo mes."""
@@ -36,21 +46,390 @@ def adjust_vencimento_to_month(original_date: date, target_mes: date) -> date:
     return date(target_mes.year, target_mes.month, day)
 
 
-def apply_status_auto_detection(
-    expenses: list[Expense], today: date
-) -> list[Expense]:
+def sweep_overdue_expenses(db: Session, user_id: str, today: date) -> int:
     """
-    RF-05: Para despesas com status "Pendente" e vencimento < hoje,
-    marca como "Atrasado". Modifica as instancias in-place.
-    O chamador decide se persiste as mudancas.
+    RF-05: Marca como "Atrasado" as despesas "Pendente" com vencimento < hoje,
+    com um unico UPDATE set-based, no maximo uma vez por dia por usuario
+    (guardado por User.status_sweep_date). Leituras no mesmo dia nao escrevem.
+    Retorna o numero de despesas alteradas.
     """
-    for expense in expenses:
-        if (
-            expense.status == ExpenseStatus.PENDENTE.value
-            and expense.vencimento < today
-        ):
-            expense.status = ExpenseStatus.ATRASADO.value
-    return expenses
+    user = db.get(User, user_id)
+    if user is None or user.status_sweep_date == today:
+        return 0
+    meses = crud.get_overdue_pending_months(db, user_id, today)
+    plan_ids = crud.get_overdue_pending_plan_ids(db, user_id, today) if meses else set()
+    count = crud.mark_overdue_expenses(db, user_id, today)
+    for mes_user_id, user_meses in meses.items():
+        crud.refresh_monthly_rollup(db, mes_user_id, user_meses)  # UPDATE em lote nao passa pelo flush
+    crud.refresh_installment_plans(db, plan_ids)
+    user.status_sweep_date = today
+    if count:
+        user.data_version = User.data_version + 1  # ETag: status alterado fora de escrita
+    db.commit()
+    return count
+
+
+def bump_data_version(db: Session, user_id: str) -> None:
+    """
+    Para gravacoes fora de auth.get_current_user_for_write (replicacao RF-06
+    em leituras e no worker de virada de mes, reconstrucao do historico de
+    score): incrementa users.data_version na mesma transacao, invalidando
+    ETags e o score guardado. Nao faz commit.
+    """
+    user = db.get(User, user_id)
+    if user is not None:
+        user.data_version = User.data_version + 1
+
+
+def _invalidate_status_sweep(db: Session, user_id: str) -> None:
+    """RF-05: Forca nova varredura de atraso para o usuario no proximo acesso."""
+    user = db.get(User, user_id)
+    if user is not None:
+        user.status_sweep_date = None
+
+
+# ========== Watermark de materializacao (RF-06) ==========
+
+# Campos copiados (ou que decidem a copia) na replicacao. Mudar o status NAO invalida.
+_REPLICATION_FIELDS = (
+    "nome", "categoria", "subcategoria", "valor", "vencimento", "data",
+    "parcela_atual", "parcela_total", "recorrente",
+)
+_REPLICATION_FLAGS = {"parcela_atual", "parcela_total", "recorrente"}
+
+
+def _is_replicable(obj: Expense | Income) -> bool:
+    """True se a linha gera replica no mes seguinte (parcela nao finalizada ou recorrente)."""
+    parcela_atual = getattr(obj, "parcela_atual", None)
+    parcela_total = getattr(obj, "parcela_total", None)
+    if parcela_atual is not None and parcela_total is not None:
+        return parcela_atual < parcela_total
+    return bool(obj.recorrente)
+
+
+def _changes_replication_source(obj: Expense | Income, new_or_deleted: bool) -> bool:
+    """True se a escrita desta linha pode mudar o que o mes seguinte deveria conter."""
+    if new_or_deleted:
+        return _is_replicable(obj)
+    attrs = inspect(obj).attrs
+    changed = {
+        name for name in _REPLICATION_FIELDS
+        if name in attrs and attrs[name].history.has_changes()
+    }
+    if not changed:
+        return False
+    return _is_replicable(obj) or bool(changed & _REPLICATION_FLAGS)
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_month_source_versions(session: Session, flush_context, instances) -> None:
+    """
+    RF-06: Invalida o watermark do mes seguinte quando linhas recorrentes ou de
+    parcela de um mes sao criadas, alteradas ou removidas, incrementando o
+    source_version do mes da linha. Mudancas so de status nao invalidam.
+    """
+    touched: set[tuple[str, date]] = set()
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, (Expense, Income)) and _changes_replication_source(obj, True):
+            touched.add((obj.user_id, obj.mes_referencia))
+    for obj in session.dirty:
+        if isinstance(obj, (Expense, Income)) and _changes_replication_source(obj, False):
+            touched.add((obj.user_id, obj.mes_referencia))
+    if not touched:
+        return
+
+    meses_by_user: dict[str, list[date]] = defaultdict(list)
+    for user_id, mes in touched:
+        meses_by_user[user_id].append(mes)
+    with session.no_autoflush:
+        for user_id, meses in meses_by_user.items():
+            states = crud.ensure_month_states(
+                session, user_id, meses, crud.get_month_states(session, user_id, meses)
+            )
+            for mes in meses:
+                states[mes].source_version = (states[mes].source_version or 0) + 1
+
+
+@event.listens_for(Session, "before_flush")
+def _invalidate_sweep_on_overdue_pending(session: Session, flush_context, instances) -> None:
+    """
+    RF-05: Despesa gravada como Pendente com vencimento ja passado (criacao,
+    edicao ou reabertura) invalida a varredura do dia do usuario.
+    """
+    today = date.today()
+    user_ids = {
+        obj.user_id
+        for obj in chain(session.new, session.dirty)
+        if isinstance(obj, Expense)
+        and obj.status == ExpenseStatus.PENDENTE.value
+        and obj.vencimento is not None
+        and obj.vencimento < today
+    }
+    with session.no_autoflush:
+        for user_id in user_ids:
+            _invalidate_status_sweep(session, user_id)
+
+
+# ========== Read model monthly_rollup ==========
+
+_ROLLUP_FIELDS = ("valor", "status", "categoria", "mes_referencia")
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_rollup_months(session: Session, flush_context, instances) -> None:
+    """
+    Registra os (usuario, mes) cujas linhas de despesas, receitas ou gastos
+    diarios serao criadas, removidas ou alteradas neste flush (inclusive o mes
+    antigo quando mes_referencia muda). O recalculo ocorre no after_flush.
+    """
+    pending = session.info.setdefault("rollup_pending", set())
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, (Expense, Income, DailyExpense)):
+            pending.add((obj.user_id, obj.mes_referencia))
+    for obj in session.dirty:
+        if not isinstance(obj, (Expense, Income, DailyExpense)):
+            continue
+        attrs = inspect(obj).attrs
+        if not any(name in attrs and attrs[name].history.has_changes() for name in _ROLLUP_FIELDS):
+            continue
+        pending.add((obj.user_id, obj.mes_referencia))
+        pending.update((obj.user_id, mes) for mes in attrs.mes_referencia.history.deleted or ())
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_rollup_months(session: Session, flush_context) -> None:
+    """Recalcula o rollup dos meses tocados, na mesma transacao da escrita."""
+    pending = session.info.pop("rollup_pending", None)
+    if not pending:
+        return
+    meses_by_user: dict[str, set[date]] = defaultdict(set)
+    for user_id, mes in pending:
+        meses_by_user[user_id].add(mes)
+    for user_id, meses in meses_by_user.items():
+        crud.refresh_monthly_rollup(session, user_id, sorted(meses))
+
+
+# ========== Contadores de installment_plans ==========
+
+_PLAN_FIELDS = ("valor", "status", "parcela_atual", "parcela_total", "plan_id")
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_installment_plans(session: Session, flush_context, instances) -> None:
+    """
+    Registra os planos cujas parcelas serao criadas, removidas ou alteradas
+    (valor, status, numeracao ou plano) neste flush, inclusive o plano antigo
+    quando plan_id muda. O recalculo dos contadores ocorre no after_flush.
+    """
+    pending = session.info.setdefault("plans_pending", set())
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, Expense) and obj.plan_id is not None:
+            pending.add(obj.plan_id)
+    for obj in session.dirty:
+        if not isinstance(obj, Expense):
+            continue
+        attrs = inspect(obj).attrs
+        if not any(attrs[name].history.has_changes() for name in _PLAN_FIELDS):
+            continue
+        if obj.plan_id is not None:
+            pending.add(obj.plan_id)
+        pending.update(plan_id for plan_id in attrs.plan_id.history.deleted or () if plan_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_installment_plans(session: Session, flush_context) -> None:
+    """Recalcula os contadores dos planos tocados, na mesma transacao da escrita."""
+    pending = session.info.pop("plans_pending", None)
+    if pending:
+        crud.refresh_installment_plans(session, pending)
+
+
+def _is_materialized(states: dict[date, MonthState], mes: date) -> bool:
+    """True se o watermark de 'mes' corresponde a versao atual do mes anterior."""
+    prev_mes = get_previous_month(mes)
+    source_version = states[prev_mes].source_version if prev_mes in states else 0
+    state = states.get(mes)
+    return state is not None and state.materialized_version == source_version
+
+
+def build_expense_replicas(
+    sources: list[dict],
+    target_mes: date,
+    user_id: str,
+    existing_origens: set[str],
+    existing_parcelas: set[tuple[str, int, int]],
+) -> list[dict]:
+    """
+    RF-06: Calcula em memoria as replicas de despesas que faltam no mes-alvo.
+
+    sources: despesas do mes anterior (crud.get_expense_replication_sources)
+    existing_origens / existing_parcelas: chaves ja presentes no mes-alvo
+    (crud.get_expense_replica_keys). Retorna linhas prontas para
+    crud.bulk_insert_expenses, com id proprio para servirem de origem_id.
+    """
+    rows = []
+    for exp in sources:
+        parcela_atual = exp["parcela_atual"]
+        parcela_total = exp["parcela_total"]
+        if parcela_atual is not None and parcela_total is not None:
+            # Despesa parcelada
+            if parcela_atual >= parcela_total:
+                logger.debug(
+                    "SKIP last installment: '%s' parcela %d/%d",
+                    exp["nome"], parcela_atual, parcela_total,
+                )
+                continue
+            if exp["id"] in existing_origens:
+                logger.debug("SKIP already replicated: '%s'", exp["nome"])
+                continue
+            if (exp["nome"], parcela_atual + 1, parcela_total) in existing_parcelas:
+                logger.debug("SKIP already upfront-created: '%s'", exp["nome"])
+                continue
+            next_parcela = parcela_atual + 1
+            recorrente = exp["recorrente"]
+            plan_id = exp["plan_id"]
+        elif exp["recorrente"]:
+            # Despesa recorrente sem parcela
+            if exp["id"] in existing_origens:
+                logger.debug("SKIP already replicated: '%s'", exp["nome"])
+                continue
+            next_parcela = None
+            parcela_total = None
+            recorrente = True
+            plan_id = None
+        else:
+            logger.debug("SKIP non-recurring: '%s'", exp["nome"])
+            continue
+
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "mes_referencia": target_mes,
+            "nome": exp["nome"],
+            "categoria": exp["categoria"],  # CR-016
+            "subcategoria": exp["subcategoria"],  # CR-016
+            "valor": exp["valor"],
+            "vencimento": adjust_vencimento_to_month(exp["vencimento"], target_mes),
+            "parcela_atual": next_parcela,
+            "parcela_total": parcela_total,
+            "recorrente": recorrente,
+            "origem_id": exp["id"],
+            "plan_id": plan_id,
+            "status": ExpenseStatus.PENDENTE.value,
+        })
+    return rows
+
+
+def build_income_replicas(
+    sources: list[dict],
+    target_mes: date,
+    user_id: str,
+    existing_origens: set[str],
+) -> list[dict]:
+    """RF-06: Calcula em memoria as replicas de receitas recorrentes que faltam no mes-alvo."""
+    rows = []
+    for inc in sources:
+        if not inc["recorrente"]:
+            logger.debug("SKIP non-recurring income: '%s'", inc["nome"])
+            continue
+        if inc["id"] in existing_origens:
+            logger.debug("SKIP already replicated income: '%s'", inc["nome"])
+            continue
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "mes_referencia": target_mes,
+            "nome": inc["nome"],
+            "valor": inc["valor"],
+            "data": (
+                adjust_vencimento_to_month(inc["data"], target_mes)
+                if inc["data"]
+                else None
+            ),
+            "recorrente": True,
+            "origem_id": inc["id"],
+        })
+    return rows
+
+
+def forward_fill_months(db: Session, from_mes: date, target_mes: date, user_id: str) -> bool:
+    """
+    RF-06: Materializa toda a cadeia de meses vazios entre from_mes (ultimo mes
+    populado) e target_mes em uma unica transacao.
+
+    A progressao das parcelas e as copias recorrentes de cada mes intermediario
+    sao calculadas em memoria a partir das replicas do mes anterior (mesma regra
+    de generate_month_data, aplicada mes a mes), e tudo e inserido em um unico
+    INSERT em lote por tabela. Os meses intermediarios estao vazios por definicao;
+    apenas o mes-alvo pode ter chaves de deduplicacao (ex.: parcelas CR-007).
+
+    Meses intermediarios ja materializados a partir da versao atual do anterior
+    estao vazios porque o usuario apagou as copias: a cadeia recomeca depois
+    deles, sem reinserir as linhas nem sobrescrever o watermark.
+
+    Retorna True se novos dados foram gerados.
+    """
+    meses = []
+    mes = get_next_month(from_mes)
+    while mes <= target_mes:
+        meses.append(mes)
+        mes = get_next_month(mes)
+
+    states = crud.get_month_states(db, user_id, [from_mes, *meses])
+    while meses[0] != target_mes and _is_materialized(states, meses[0]):
+        from_mes = meses.pop(0)
+
+    logger.info(
+        "forward_fill_months: %s -> %s (%d months), user_id=%s",
+        from_mes, target_mes, len(meses), user_id,
+    )
+
+    expense_sources = crud.get_expense_replication_sources(db, from_mes, user_id)
+    income_sources = crud.get_income_replication_sources(db, from_mes, user_id)
+    target_origens, target_parcelas = crud.get_expense_replica_keys(db, target_mes, user_id)
+    target_income_origens = crud.get_income_replica_origins(db, target_mes, user_id)
+    source_version = states[from_mes].source_version if from_mes in states else 0
+    states = crud.ensure_month_states(db, user_id, meses, states)
+
+    all_expense_rows: list[dict] = []
+    all_income_rows: list[dict] = []
+    for mes in meses:
+        if mes == target_mes:
+            keys = (target_origens, target_parcelas, target_income_origens)
+        else:
+            keys = (set(), set(), set())
+        expense_rows = build_expense_replicas(expense_sources, mes, user_id, keys[0], keys[1])
+        income_rows = build_income_replicas(income_sources, mes, user_id, keys[2])
+
+        state = states[mes]
+        state.materialized_version = source_version
+        if expense_rows or income_rows:
+            state.source_version += 1
+        source_version = state.source_version
+
+        all_expense_rows.extend(expense_rows)
+        all_income_rows.extend(income_rows)
+        # As replicas deste mes sao a origem do proximo
+        expense_sources = expense_rows
+        income_sources = income_rows
+
+    crud.bulk_insert_expenses(db, all_expense_rows)
+    crud.bulk_insert_incomes(db, all_income_rows)
+    crud.refresh_monthly_rollup(
+        db, user_id,
+        sorted({row["mes_referencia"] for row in chain(all_expense_rows, all_income_rows)}),
+    )
+    crud.refresh_installment_plans(db, {row["plan_id"] for row in all_expense_rows if row["plan_id"]})
+    if any(row["vencimento"] < date.today() for row in all_expense_rows):
+        _invalidate_status_sweep(db, user_id)
+    if all_expense_rows or all_income_rows:
+        bump_data_version(db, user_id)
+    db.commit()
+    logger.info(
+        "Forward-fill complete: %d expenses, %d incomes across %d months",
+        len(all_expense_rows), len(all_income_rows), len(meses),
+    )
+    return bool(all_expense_rows or all_income_rows)
 
 
 def generate_month_data(db: Session, target_mes: date, user_id: str) -> bool:
@@ -60,229 +439,408 @@ def generate_month_data(db: Session, target_mes: date, user_id: str) -> bool:
 
     Chamado quando o usuario navega para qualquer mes.
     Olha os dados do mes anterior DO MESMO USUARIO e replica entradas faltantes
-    para target_mes, usando origem_id para deduplicacao por-item.
+    para target_mes, usando origem_id para deduplicacao por-item. Se o mes
+    anterior estiver vazio, delega a forward_fill_months a partir do ultimo
+    mes populado.
 
     Retorna True se novos dados foram gerados, False se nada foi replicado.
 
-    Algoritmo:
-    1. Buscar despesas e receitas do usuario no mes anterior
-    2. Para cada despesa que deveria replicar:
-       - Checar se ja existe replica no mes-alvo (por origem_id)
-       - Se nao existe, criar replica
-    3. Mesma logica para receitas
-    4. Novas entradas recebem status=Pendente, novos UUIDs, origem_id=id da origem.
+    Algoritmo (set-based, numero de queries constante):
+    0. Se o watermark (MonthState) indica que o mes ja foi materializado a partir
+       da versao atual do mes anterior, retorna sem ler nem escrever mais nada
+    1. Buscar despesas e receitas replicaveis do usuario no mes anterior
+    2. Carregar de uma vez as chaves ja existentes no mes-alvo
+       (origem_id e (nome, parcela_atual, parcela_total))
+    3. Calcular em memoria as replicas faltantes
+    4. Inserir tudo com um INSERT em lote por tabela.
+    Novas entradas recebem status=Pendente, novos UUIDs, origem_id=id da origem.
     """
+    prev_mes = get_previous_month(target_mes)
+
+    # Passo 0: Watermark — mes ja materializado a partir da versao atual do anterior
+    states = crud.get_month_states(db, user_id, [prev_mes, target_mes])
+    if _is_materialized(states, target_mes):
+        return False
+    # Requisicoes concorrentes (ex.: mes atual e prefetch) materializam uma de
+    # cada vez; a que esperou rele o watermark e nao replica de novo
+    crud.lock_user_materialization(db, user_id)
+    states = crud.get_month_states(db, user_id, [prev_mes, target_mes], refresh=True)
+    if _is_materialized(states, target_mes):
+        db.commit()
+        return False
+    source_version = states[prev_mes].source_version if prev_mes in states else 0
+    target_state = states.get(target_mes)
+
     logger.info(
         "generate_month_data called: target_mes=%s, user_id=%s",
         target_mes, user_id,
     )
 
-    # Passo 1: Buscar dados do usuario no mes anterior
-    prev_mes = get_previous_month(target_mes)
-    prev_expenses = crud.get_expenses_by_month(db, prev_mes, user_id)
-    prev_incomes = crud.get_incomes_by_month(db, prev_mes, user_id)
+    # Passo 1: Buscar dados replicaveis do usuario no mes anterior
+    prev_expenses = crud.get_expense_replication_sources(db, prev_mes, user_id)
+    prev_incomes = crud.get_income_replication_sources(db, prev_mes, user_id)
     logger.info(
-        "Previous month %s: %d expenses, %d incomes",
+        "Previous month %s: %d replicable expenses, %d replicable incomes",
         prev_mes, len(prev_expenses), len(prev_incomes),
     )
 
     if not prev_expenses and not prev_incomes:
-        logger.info("SKIP: Previous month has no data, returning False")
+        # Lacuna: mes anterior vazio -> preencher a cadeia desde o ultimo mes populado
+        last_mes = crud.get_last_populated_month(db, user_id, target_mes)
+        if (
+            last_mes is not None
+            and last_mes < prev_mes
+            and months_between(last_mes, target_mes) <= MAX_FORWARD_FILL_MONTHS
+        ):
+            return forward_fill_months(db, last_mes, target_mes, user_id)
+
+    if target_state is None:
+        target_state = crud.ensure_month_states(db, user_id, [target_mes], states)[target_mes]
+    target_state.materialized_version = source_version
+
+    if not prev_expenses and not prev_incomes:
+        logger.info("SKIP: Previous month has no replicable data, returning False")
+        db.commit()
         return False
 
-    # Passo 2: Replicar despesas (incremental, com deduplicacao por origem_id)
-    replicated_count = 0
-    for exp in prev_expenses:
-        if exp.parcela_atual is not None and exp.parcela_total is not None:
-            # Despesa parcelada
-            if exp.parcela_atual < exp.parcela_total:
-                if crud.expense_replica_exists(db, target_mes, user_id, exp.id):
-                    logger.debug("SKIP already replicated: '%s'", exp.nome)
-                    continue
-                if crud.expense_installment_exists(db, target_mes, user_id, exp.nome, exp.parcela_atual + 1, exp.parcela_total):
-                    logger.debug("SKIP already upfront-created: '%s'", exp.nome)
-                    continue
-                logger.info(
-                    "REPLICATE installment: '%s' parcela %d/%d -> %d/%d",
-                    exp.nome, exp.parcela_atual, exp.parcela_total,
-                    exp.parcela_atual + 1, exp.parcela_total,
-                )
-                new_exp = Expense(
-                    user_id=user_id,
-                    mes_referencia=target_mes,
-                    nome=exp.nome,
-                    categoria=exp.categoria,  # CR-016
-                    subcategoria=exp.subcategoria,  # CR-016
-                    valor=exp.valor,
-                    vencimento=adjust_vencimento_to_month(
-                        exp.vencimento, target_mes
-                    ),
-                    parcela_atual=exp.parcela_atual + 1,
-                    parcela_total=exp.parcela_total,
-                    recorrente=exp.recorrente,
-                    origem_id=exp.id,
-                    status=ExpenseStatus.PENDENTE.value,
-                )
-                db.add(new_exp)
-                replicated_count += 1
-            else:
-                logger.debug(
-                    "SKIP last installment: '%s' parcela %d/%d",
-                    exp.nome, exp.parcela_atual, exp.parcela_total,
-                )
-        else:
-            # Despesa sem parcela
-            if exp.recorrente:
-                if crud.expense_replica_exists(db, target_mes, user_id, exp.id):
-                    logger.debug("SKIP already replicated: '%s'", exp.nome)
-                    continue
-                logger.info("REPLICATE recurring: '%s'", exp.nome)
-                new_exp = Expense(
-                    user_id=user_id,
-                    mes_referencia=target_mes,
-                    nome=exp.nome,
-                    categoria=exp.categoria,  # CR-016
-                    subcategoria=exp.subcategoria,  # CR-016
-                    valor=exp.valor,
-                    vencimento=adjust_vencimento_to_month(
-                        exp.vencimento, target_mes
-                    ),
-                    parcela_atual=None,
-                    parcela_total=None,
-                    recorrente=True,
-                    origem_id=exp.id,
-                    status=ExpenseStatus.PENDENTE.value,
-                )
-                db.add(new_exp)
-                replicated_count += 1
-            else:
-                logger.debug(
-                    "SKIP non-recurring: '%s' (recorrente=%s)",
-                    exp.nome, exp.recorrente,
-                )
+    # Passo 2: Chaves de deduplicacao do mes-alvo (uma query por tabela)
+    existing_origens, existing_parcelas = crud.get_expense_replica_keys(db, target_mes, user_id)
+    existing_income_origens = (
+        crud.get_income_replica_origins(db, target_mes, user_id) if prev_incomes else set()
+    )
 
-    # Passo 3: Replicar receitas (incremental, com deduplicacao por origem_id)
-    replicated_incomes = 0
-    for inc in prev_incomes:
-        if inc.recorrente:
-            if crud.income_replica_exists(db, target_mes, user_id, inc.id):
-                logger.debug("SKIP already replicated income: '%s'", inc.nome)
-                continue
-            logger.info("REPLICATE income: '%s'", inc.nome)
-            new_inc = Income(
-                user_id=user_id,
-                mes_referencia=target_mes,
-                nome=inc.nome,
-                valor=inc.valor,
-                data=(
-                    adjust_vencimento_to_month(inc.data, target_mes)
-                    if inc.data
-                    else None
-                ),
-                recorrente=True,
-                origem_id=inc.id,
-            )
-            db.add(new_inc)
-            replicated_incomes += 1
-        else:
-            logger.debug("SKIP non-recurring income: '%s'", inc.nome)
+    # Passo 3: Replicas faltantes, calculadas em memoria
+    expense_rows = build_expense_replicas(
+        prev_expenses, target_mes, user_id, existing_origens, existing_parcelas
+    )
+    income_rows = build_income_replicas(
+        prev_incomes, target_mes, user_id, existing_income_origens
+    )
 
-    if replicated_count > 0 or replicated_incomes > 0:
+    # Passo 4: Escrita em lote (INSERT Core nao passa pelo before_flush:
+    # o source_version do mes-alvo e incrementado aqui)
+    if expense_rows or income_rows:
+        crud.bulk_insert_expenses(db, expense_rows)
+        crud.bulk_insert_incomes(db, income_rows)
+        crud.refresh_monthly_rollup(db, user_id, [target_mes])  # INSERT Core nao passa pelo flush
+        crud.refresh_installment_plans(db, {row["plan_id"] for row in expense_rows if row["plan_id"]})
+        target_state.source_version += 1
+        if any(row["vencimento"] < date.today() for row in expense_rows):
+            _invalidate_status_sweep(db, user_id)
+        bump_data_version(db, user_id)
         logger.info(
             "Replication complete: %d expenses, %d incomes replicated for %s",
-            replicated_count, replicated_incomes, target_mes,
+            len(expense_rows), len(income_rows), target_mes,
         )
         db.commit()
         return True
 
     logger.info("No new items to replicate for %s", target_mes)
+    db.commit()
     return False
 
 
-def get_monthly_summary(db: Session, mes_referencia: date, user_id: str) -> dict:
+# ========== Criacao de despesas e compras parceladas em lote ==========
+
+def _bump_source_versions(db: Session, user_id: str, meses: set[date]) -> None:
+    """
+    RF-06: Mesmo efeito de _bump_month_source_versions para escritas Core
+    (INSERT/DELETE em lote), que nao passam pelo before_flush.
+    """
+    if not meses:
+        return
+    meses = sorted(meses)
+    states = crud.ensure_month_states(db, user_id, meses, crud.get_month_states(db, user_id, meses))
+    for mes in meses:
+        states[mes].source_version = (states[mes].source_version or 0) + 1
+
+
+def _is_replicable_row(row: dict) -> bool:
+    """_is_replicable para linhas de INSERT Core."""
+    if row["parcela_atual"] is not None and row["parcela_total"] is not None:
+        return row["parcela_atual"] < row["parcela_total"]
+    return bool(row["recorrente"])
+
+
+def build_purchase_rows(
+    compra: dict, mes_referencia: date, user_id: str, plan_id: str | None
+) -> list[dict]:
+    """
+    Linhas de uma despesa criada em mes_referencia. Compra parcelada (parcela_total
+    > 1): a parcela informada e todas as seguintes, com mes_referencia e
+    vencimento avancando juntos um mes por parcela (dia do vencimento com clamp
+    no fim do mes), calculadas em uma unica passada. A primeira linha e a do mes.
+    """
+    parcela_atual = compra["parcela_atual"]
+    parcela_total = compra["parcela_total"]
+    vencimento = compra["vencimento"]
+    base = {
+        "user_id": user_id,
+        "nome": compra["nome"],
+        "categoria": compra.get("categoria"),  # CR-016
+        "subcategoria": compra.get("subcategoria"),  # CR-016
+        "valor": compra["valor"],
+        "parcela_total": parcela_total,
+        "plan_id": plan_id,
+        "status": ExpenseStatus.PENDENTE.value,
+    }
+    rows = [{
+        **base,
+        "id": str(uuid.uuid4()),
+        "mes_referencia": mes_referencia,
+        "vencimento": vencimento,
+        "parcela_atual": parcela_atual,
+        "recorrente": compra["recorrente"],
+    }]
+    if not parcela_total or parcela_total <= 1:
+        return rows
+
+    # Indices absolutos de mes (ano * 12 + mes - 1) evitam add_months por linha
+    mes_idx = mes_referencia.year * 12 + mes_referencia.month - 1
+    venc_idx = vencimento.year * 12 + vencimento.month - 1
+    dia = vencimento.day
+    for offset, parcela in enumerate(range(parcela_atual + 1, parcela_total + 1), start=1):
+        year, month = divmod(mes_idx + offset, 12)
+        venc_year, venc_month = divmod(venc_idx + offset, 12)
+        rows.append({
+            **base,
+            "id": str(uuid.uuid4()),
+            "mes_referencia": date(year, month + 1, 1),
+            "vencimento": date(
+                venc_year, venc_month + 1,
+                min(dia, calendar.monthrange(venc_year, venc_month + 1)[1]),
+            ),
+            "parcela_atual": parcela,
+            # Parcelas futuras nao sao "recorrentes" no sentido de flag
+            "recorrente": False,
+        })
+    return rows
+
+
+def create_expense_purchases(
+    db: Session, user_id: str, mes_referencia: date, compras: list[dict]
+) -> list[str]:
+    """
+    Cria varias despesas em mes_referencia com um commit: compras parceladas
+    (parcela_total > 1) geram seu installment_plan e todas as parcelas futuras.
+    Planos e despesas sao inseridos com um INSERT Core (executemany) por tabela;
+    como INSERT Core nao passa pelo flush, rollup, contadores dos planos,
+    watermarks (RF-06) e varredura de atraso (RF-05) sao atualizados aqui.
+
+    compras: dicts com os campos de ExpenseCreate e categoria derivada.
+    Retorna, na ordem de compras, o id da despesa criada em mes_referencia.
+    """
+    plan_rows: list[dict] = []
+    expense_rows: list[dict] = []
+    ids: list[str] = []
+    for compra in compras:
+        plan_id = None
+        if compra["parcela_total"] and compra["parcela_total"] > 1:
+            plan = crud.installment_plan_row(
+                user_id, compra["nome"], compra["valor"],
+                compra["parcela_total"], compra["parcela_atual"], compra["vencimento"],
+            )
+            plan_rows.append(plan)
+            plan_id = plan["id"]
+        rows = build_purchase_rows(compra, mes_referencia, user_id, plan_id)
+        ids.append(rows[0]["id"])
+        expense_rows.extend(rows)
+
+    crud.bulk_insert_installment_plans(db, plan_rows)
+    crud.bulk_insert_expenses(db, expense_rows)
+    crud.refresh_monthly_rollup(db, user_id, sorted({row["mes_referencia"] for row in expense_rows}))
+    crud.refresh_installment_plans(db, {plan["id"] for plan in plan_rows})
+
+    # RF-06: linhas replicaveis mudam a origem do mes seguinte
+    _bump_source_versions(
+        db, user_id, {row["mes_referencia"] for row in expense_rows if _is_replicable_row(row)}
+    )
+
+    today = date.today()
+    if any(row["vencimento"] < today for row in expense_rows):
+        _invalidate_status_sweep(db, user_id)
+    db.commit()
+    return ids
+
+
+def delete_expense_series(db: Session, expense: Expense, from_mes: date | None = None) -> int:
+    """
+    CR-009: Exclui a serie da despesa (parcelas ou recorrentes com mesmo nome)
+    com um DELETE set-based. Com from_mes (serie recorrente), exclui apenas as
+    ocorrencias a partir desse mes e encerra a recorrencia na anterior.
+    Rollup, contadores dos planos e watermarks (RF-06) sao atualizados aqui,
+    na mesma transacao. Retorna o numero de despesas removidas.
+    """
+    user_id = expense.user_id
+    meses, meses_replicaveis, plan_ids = crud.get_expense_series_footprint(db, expense, from_mes)
+    if from_mes is not None and expense.recorrente and not (expense.parcela_total or 0) > 1:
+        mes_encerrado = crud.end_expense_recurrence(db, expense, from_mes)
+        if mes_encerrado is not None:
+            meses_replicaveis.add(mes_encerrado)
+    count = crud.delete_expense_related(db, expense, from_mes)
+    crud.refresh_monthly_rollup(db, user_id, sorted(meses))  # DELETE em lote nao passa pelo flush
+    crud.refresh_installment_plans(db, plan_ids)
+    _bump_source_versions(db, user_id, meses_replicaveis)
+    db.commit()
+    return count
+
+
+def get_monthly_summary(
+    db: Session, mes_referencia: date, user_id: str, summary_only: bool = False
+) -> dict:
     """
     Constroi a visao mensal completa para um usuario especifico. (CR-002: user_id)
     Passos:
     1. Tenta gerar dados do mes se vazio (RF-06)
-    2. Busca despesas e receitas do usuario
-    3. Aplica auto-deteccao de status (RF-05)
-    4. Calcula totalizadores (RF-04)
+    2. Varredura diaria de atraso (RF-05, no maximo uma escrita por dia)
+    3. Calcula totalizadores de despesas no banco (RF-04, SUM ... GROUP BY status, Decimal)
+    4. Busca despesas e receitas do usuario (summary_only: so o SUM das receitas)
     """
     # Passo 1: Auto-gerar se necessario (escopo por usuario)
     generate_month_data(db, mes_referencia, user_id)  # CR-002
 
-    # Passo 2: Buscar dados do usuario
-    expenses = crud.get_expenses_by_month(db, mes_referencia, user_id)  # CR-002
-    incomes = crud.get_incomes_by_month(db, mes_referencia, user_id)  # CR-002
+    # Passo 2: Auto-detectar status de atraso (set-based, uma vez por dia)
+    sweep_overdue_expenses(db, user_id, date.today())
 
-    # Passo 3: Auto-detectar status de atraso
-    today = date.today()
-    apply_status_auto_detection(expenses, today)
-    db.commit()  # Persiste mudancas de status
-
-    # Passo 4: Calcular totalizadores
-    total_despesas = sum(float(e.valor) for e in expenses)
-    total_receitas = sum(float(i.valor) for i in incomes)
+    # Passo 3: Totalizadores (RF-04) e por status (CR-004), aritmetica exata
+    by_status = crud.get_expense_totals_by_status(db, mes_referencia, user_id)
+    total_despesas = sum(by_status.values(), Decimal(0))
 
-    # Passo 5: Totalizadores por status (CR-004)
-    total_pago = sum(float(e.valor) for e in expenses if e.status == ExpenseStatus.PAGO.value)
-    total_pendente = sum(float(e.valor) for e in expenses if e.status == ExpenseStatus.PENDENTE.value)
-    total_atrasado = sum(float(e.valor) for e in expenses if e.status == ExpenseStatus.ATRASADO.value)
+    # Passo 4: Buscar dados do usuario (receitas somadas das linhas ja carregadas)
+    if summary_only:
+        expenses = incomes = None
+        total_receitas = crud.get_income_sum_by_month(db, mes_referencia, user_id)
+    else:
+        expenses = crud.get_expenses_by_month(db, mes_referencia, user_id)  # CR-002
+        incomes = crud.get_incomes_by_month(db, mes_referencia, user_id)  # CR-002
+        total_receitas = sum((Decimal(str(i.valor)) for i in incomes), Decimal(0))
 
+    summary = {
+        "mes_referencia": mes_referencia,
+        "total_despesas": float(total_despesas),
+        "total_receitas": float(total_receitas),
+        "saldo_livre": float(total_receitas - total_despesas),
+        "total_pago": float(by_status.get(ExpenseStatus.PAGO.value, 0)),
+        "total_pendente": float(by_status.get(ExpenseStatus.PENDENTE.value, 0)),
+        "total_atrasado": float(by_status.get(ExpenseStatus.ATRASADO.value, 0)),
+    }
+    if not summary_only:
+        summary["expenses"] = expenses
+        summary["incomes"] = incomes
+    return summary
+
+
+def _build_month_summary(mes_referencia: date, expenses: list[Expense], incomes: list[Income]) -> dict:
+    """Totalizadores (RF-04, CR-004) de um mes a partir das linhas ja carregadas, em Decimal."""
+    by_status: dict[str, Decimal] = defaultdict(Decimal)
+    for e in expenses:
+        by_status[e.status] += Decimal(str(e.valor))
+    total_despesas = sum(by_status.values(), Decimal(0))
+    total_receitas = sum((Decimal(str(i.valor)) for i in incomes), Decimal(0))
     return {
         "mes_referencia": mes_referencia,
-        "total_despesas": round(total_despesas, 2),
-        "total_receitas": round(total_receitas, 2),
-        "saldo_livre": round(total_receitas - total_despesas, 2),
-        "total_pago": round(total_pago, 2),
-        "total_pendente": round(total_pendente, 2),
-        "total_atrasado": round(total_atrasado, 2),
+        "total_despesas": float(total_despesas),
+        "total_receitas": float(total_receitas),
+        "saldo_livre": float(total_receitas - total_despesas),
+        "total_pago": float(by_status[ExpenseStatus.PAGO.value]),
+        "total_pendente": float(by_status[ExpenseStatus.PENDENTE.value]),
+        "total_atrasado": float(by_status[ExpenseStatus.ATRASADO.value]),
         "expenses": expenses,
         "incomes": incomes,
     }
 
 
-def _build_category_breakdown(items: list, category_attr: str = "categoria") -> list[dict]:
-    """Agrupa itens por categoria e calcula percentuais. Retorna lista ordenada por total desc."""
-    cat_map: dict[str, dict] = defaultdict(lambda: {"total": 0.0, "count": 0})
-    for item in items:
-        cat = getattr(item, category_attr, None) or "Outros"
-        cat_map[cat]["total"] += float(item.valor)
-        cat_map[cat]["count"] += 1
+def get_monthly_range(db: Session, from_mes: date, to_mes: date, user_id: str) -> list[dict]:
+    """
+    RF-04: Visao mensal de varios meses (from_mes..to_mes) em uma chamada,
+    para prefetch de meses adjacentes.
+    1. Materializa (RF-06) apenas a partir do primeiro mes com watermark desatualizado
+    2. Varredura diaria de atraso (RF-05)
+    3. Carrega despesas e receitas do intervalo com duas queries e agrupa em memoria
+    """
+    meses = []
+    mes = from_mes
+    while mes <= to_mes:
+        meses.append(mes)
+        mes = get_next_month(mes)
+
+    # Passo 1: meses seguintes a um mes regenerado tambem precisam ser revistos
+    states = crud.get_month_states(db, user_id, [get_previous_month(from_mes), *meses])
+    stale = [mes for mes in meses if not _is_materialized(states, mes)]
+    if stale:
+        for mes in meses[meses.index(stale[0]):]:
+            generate_month_data(db, mes, user_id)
+
+    # Passo 2
+    sweep_overdue_expenses(db, user_id, date.today())
+
+    # Passo 3
+    expenses_by_month: dict[date, list[Expense]] = defaultdict(list)
+    for e in crud.get_expenses_by_month_range(db, from_mes, to_mes, user_id):
+        expenses_by_month[e.mes_referencia].append(e)
+    incomes_by_month: dict[date, list[Income]] = defaultdict(list)
+    for i in crud.get_incomes_by_month_range(db, from_mes, to_mes, user_id):
+        incomes_by_month[i.mes_referencia].append(i)
+
+    return [
+        _build_month_summary(mes, expenses_by_month[mes], incomes_by_month[mes])
+        for mes in meses
+    ]
 
-    total_geral = sum(v["total"] for v in cat_map.values())
+
+def _build_category_breakdown(totals: list[tuple[str, Decimal, int]], key: str = "categoria") -> list[dict]:
+    """Calcula percentuais sobre os totais agregados (grupo, total, count). Ordena por total desc."""
+    total_geral = sum((total for _, total, _ in totals), Decimal(0))
 
     result = []
-    for cat, data in cat_map.items():
-        pct = (data["total"] / total_geral * 100) if total_geral > 0 else 0
+    for grupo, total, count in totals:
+        pct = (total / total_geral * 100) if total_geral > 0 else 0
         result.append({
-            "categoria": cat,
-            "total": round(data["total"], 2),
-            "percentual": round(pct, 1),
-            "count": data["count"],
+            key: grupo,
+            "total": round(float(total), 2),
+            "percentual": round(float(pct), 1),
+            "count": count,
         })
 
     return sorted(result, key=lambda x: x["total"], reverse=True)
 
 
-def get_dashboard_data(db: Session, mes_referencia: date, user_id: str) -> dict:
+def get_category_drilldown(
+    db: Session, mes_referencia: date, user_id: str, categoria: str, tipo: str = "planejadas"
+) -> dict:
+    """
+    CR-019: Detalhamento de uma categoria do donut por subcategoria, com a
+    mesma query agregada do breakdown (nenhuma linha e materializada).
+    """
+    totals = crud.get_category_totals(db, tipo, mes_referencia, user_id, categoria=categoria)
+    return {
+        "mes_referencia": mes_referencia,
+        "categoria": categoria,
+        "tipo": tipo,
+        "total": round(float(sum((t for _, t, _ in totals), Decimal(0))), 2),
+        "count": sum(c for _, _, c in totals),
+        "subcategorias": _build_category_breakdown(totals, key="subcategoria"),
+    }
+
+
+def get_dashboard_data(
+    db: Session, mes_referencia: date, user_id: str, evolution_months: int = 6
+) -> dict:
     """
     CR-019: Constroi dados completos do dashboard para um mes.
     1. Dados do mes atual (com auto-generate e status detection via get_monthly_summary)
     2. Gastos diarios do mes
     3. Parcelas futuras
-    4. Breakdown por categoria (separados: planejadas e diarios)
-    5. Evolucao 6 meses (queries agregadas, sem auto-generate)
+    4. Breakdown por categoria (separados: planejadas e diarios; agregado no banco)
+    5. Evolucao de evolution_months meses (uma query agregada, sem auto-generate)
     """
-    # 1. Dados do mes atual (triggers RF-05 e RF-06)
-    monthly = get_monthly_summary(db, mes_referencia, user_id)
-    expenses = monthly["expenses"]
+    # 1. Totais do mes atual (triggers RF-05 e RF-06; sem carregar linhas)
+    monthly = get_monthly_summary(db, mes_referencia, user_id, summary_only=True)
     total_despesas_planejadas = monthly["total_despesas"]
     total_receitas = monthly["total_receitas"]
 
     # 2. Gastos diarios do mes
-    daily_expenses = crud.get_daily_expenses_by_month(db, mes_referencia, user_id)
-    total_gastos_diarios = round(sum(float(de.valor) for de in daily_expenses), 2)
+    total_gastos_diarios = crud.get_daily_expense_total_by_month(db, mes_referencia, user_id)
 
     # 3. Totais combinados
     total_despesas_geral = round(total_despesas_planejadas + total_gastos_diarios, 2)
@@ -292,43 +850,42 @@ def get_dashboard_data(db: Session, mes_referencia: date, user_id: str) -> dict:
     )
 
     # 4. Parcelas futuras (valor restante de todas as parcelas ativas)
-    installments_data = crud.get_installment_expenses_grouped(db, user_id)
-    total_parcelas_futuras = round(
-        sum(g["valor_restante"] for g in installments_data["groups"] if g["status_geral"] == "Em andamento"),
-        2
+    total_parcelas_futuras = round(float(crud.get_installment_remaining_total(db, user_id)), 2)
+
+    # 5. Breakdown por categoria — SEPARADOS (GROUP BY categoria)
+    categorias_planejadas = _build_category_breakdown(
+        crud.get_category_totals(db, "planejadas", mes_referencia, user_id)
+    )
+    categorias_diarios = _build_category_breakdown(
+        crud.get_category_totals(db, "diarios", mes_referencia, user_id)
     )
 
-    # 5. Breakdown por categoria — SEPARADOS
-    categorias_planejadas = _build_category_breakdown(expenses)
-    categorias_diarios = _build_category_breakdown(daily_expenses)
+    # 6. Evolucao N meses (atual + N-1 anteriores) — uma query agregada, sem auto-generate
+    meses = [mes_referencia]
+    for _ in range(evolution_months - 1):
+        meses.append(get_previous_month(meses[-1]))
+    meses.reverse()  # ordem cronologica (mais antigo primeiro)
+    series = crud.get_monthly_totals_series(db, user_id, meses[0], get_previous_month(mes_referencia))
+    # Mes atual: usar dados ja calculados
+    series[mes_referencia] = {
+        "total_despesas": total_despesas_planejadas,
+        "total_receitas": total_receitas,
+        "total_gastos_diarios": total_gastos_diarios,
+    }
 
-    # 6. Evolucao 6 meses (atual + 5 anteriores) — queries agregadas leves
     evolucao = []
-    current_mes = mes_referencia
-    for _ in range(6):
-        if current_mes == mes_referencia:
-            # Mes atual: usar dados ja calculados
-            ev_despesas = total_despesas_planejadas
-            ev_receitas = total_receitas
-            ev_diarios = total_gastos_diarios
-        else:
-            # Meses anteriores: queries agregadas (sem auto-generate)
-            ev_despesas = crud.get_expense_total_by_month(db, current_mes, user_id)
-            ev_receitas = crud.get_income_total_by_month(db, current_mes, user_id)
-            ev_diarios = crud.get_daily_expense_total_by_month(db, current_mes, user_id)
-
-        ev_saldo = round(ev_receitas - ev_despesas - ev_diarios, 2)
+    for mes in meses:
+        totals = series.get(mes, {})
+        ev_despesas = totals.get("total_despesas", 0.0)
+        ev_receitas = totals.get("total_receitas", 0.0)
+        ev_diarios = totals.get("total_gastos_diarios", 0.0)
         evolucao.append({
-            "mes_referencia": current_mes,
+            "mes_referencia": mes,
             "total_despesas": ev_despesas,
             "total_receitas": ev_receitas,
             "total_gastos_diarios": ev_diarios,
-            "saldo_livre": ev_saldo,
+            "saldo_livre": round(ev_receitas - ev_despesas - ev_diarios, 2),
         })
-        current_mes = get_previous_month(current_mes)
-
-    # Inverter para ordem cronologica (mais antigo primeiro)
-    evolucao.reverse()
 
     return {
         "mes_referencia": mes_referencia,
@@ -348,27 +905,63 @@ def get_dashboard_data(db: Session, mes_referencia: date, user_id: str) -> dict:
     }
 
 
-def get_installment_projection(db: Session, user_id: str, months: int = 12) -> dict:
-    """
-    CR-021: Calcula projecao de parcelas futuras para os proximos N meses.
-    Retorna resumo com KPIs, projecao mensal e lista de parcelas ativas.
+# ========== Listagem paginada de parcelamentos ==========
 
-    Reutiliza crud.get_installment_expenses_grouped() para dados de parcelas
-    e crud.get_income_total_by_month() para renda do mes atual.
-    """
-    today = date.today()
-    mes_atual = date(today.year, today.month, 1)
+def encode_installment_cursor(key: tuple[str, date, str]) -> str:
+    """Cursor opaco (base64 url-safe) a partir da chave de ordenacao do ultimo grupo."""
+    nome, primeiro_vencimento, plan_id = key
+    raw = json.dumps([nome, primeiro_vencimento.isoformat(), plan_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
 
-    # 1. Buscar grupos de parcelas
-    installments_data = crud.get_installment_expenses_grouped(db, user_id)
-    groups = installments_data["groups"]
 
-    # 2. Buscar renda do mes atual
-    renda_atual = crud.get_income_total_by_month(db, mes_atual, user_id)
+def decode_installment_cursor(cursor: str) -> tuple[str, date, str]:
+    """Inverso de encode_installment_cursor. ValueError se o cursor for invalido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        nome, primeiro_vencimento, plan_id = json.loads(raw)
+        return str(nome), date.fromisoformat(primeiro_vencimento), str(plan_id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Cursor inválido") from exc
 
-    # 3. Extrair info de cada grupo ativo para projecao
+
+def get_installments_page(
+    db: Session,
+    user_id: str,
+    status: str | None = None,
+    summary_only: bool = False,
+    cursor: str | None = None,
+    limit: int | None = None,
+) -> dict:
+    """
+    GET /api/expenses/installments com filtros: grupos lidos de installment_plans
+    com status, ordem e keyset no SQL; parcelas so dos grupos da pagina (nenhuma
+    com summary_only). Totais somam todos os grupos do filtro, nao so a pagina.
+    next_cursor e None na ultima pagina. ValueError se o cursor for invalido.
+    """
+    after = decode_installment_cursor(cursor) if cursor else None
+    page = crud.get_installment_groups_page(
+        db, user_id, status=status, after=after,
+        limit=limit + 1 if limit is not None else None,
+        include_installments=not summary_only,
+    )
+    next_cursor = None
+    if limit is not None and len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_installment_cursor(page[-1][1])
+    return {
+        "groups": [group for group, _ in page],
+        **crud.get_installment_plan_totals(db, user_id, status),
+        "next_cursor": next_cursor,
+    }
+
+
+def projection_items(groups: list[dict], mes_atual: date) -> list[dict]:
+    """
+    CR-021/CR-024: Converte os grupos de parcelas em itens de projecao
+    (valor mensal, progresso, mes_inicio e mes_termino). Grupos concluidos so
+    entram se tiverem vencimento no mes atual.
+    """
     parcelas_info = []
-    from app.models import ExpenseStatus
 
     for group in groups:
         installments = group["installments"]
@@ -396,19 +989,11 @@ def get_installment_projection(db: Session, user_id: str, months: int = 12) -> d
         #   → usar contagem de PAGO como progresso
         # - Incremental: apenas parcelas recentes existem (len < parcela_total)
         #   → usar max(parcela_atual) como progresso
-        num_paid = sum(
-            1 for inst in installments
-            if inst.status == ExpenseStatus.PAGO.value
-        )
-
-        if len(installments) >= parcela_total:
-            progresso = num_paid
+        # (contadores do grupo: quantidade, parcelas_pagas, ultima_parcela_paga)
+        if group["quantidade"] >= parcela_total:
+            progresso = group["parcelas_pagas"]
         else:
-            paid_parcela_nums = [
-                inst.parcela_atual or 0 for inst in installments
-                if inst.status == ExpenseStatus.PAGO.value
-            ]
-            progresso = max(paid_parcela_nums) if paid_parcela_nums else 0
+            progresso = group["ultima_parcela_paga"]
 
         parcelas_restantes = parcela_total - progresso
 
@@ -434,10 +1019,6 @@ def get_installment_projection(db: Session, user_id: str, months: int = 12) -> d
             inst for inst in installments
             if date(inst.vencimento.year, inst.vencimento.month, 1) >= mes_atual
         ]
-        unpaid_installments = [
-            inst for inst in installments
-            if inst.status != ExpenseStatus.PAGO.value
-        ]
 
         if future_installments:
             first_future_venc = min(inst.vencimento for inst in future_installments)
@@ -447,24 +1028,20 @@ def get_installment_projection(db: Session, user_id: str, months: int = 12) -> d
             last_venc = max(inst.vencimento for inst in installments)
             mes_termino_from_db = date(last_venc.year, last_venc.month, 1)
 
-            if len(installments) >= parcela_total:
+            if group["quantidade"] >= parcela_total:
                 # Upfront: todas as parcelas existem, usar último vencimento do banco
                 mes_termino = mes_termino_from_db
             else:
                 # Incremental: parcelas futuras podem não estar no banco ainda
                 # Estimar mes_termino = mes_inicio + parcelas_restantes - 1 meses
-                mes_termino = mes_inicio
-                for _ in range(parcelas_restantes - 1):
-                    mes_termino = get_next_month(mes_termino)
+                mes_termino = add_months(mes_inicio, parcelas_restantes - 1)
                 # Se o banco tem dados mais distantes, usar esses
                 if mes_termino_from_db > mes_termino:
                     mes_termino = mes_termino_from_db
-        elif unpaid_installments:
+        elif group["quantidade"] > group["parcelas_pagas"]:
             # Todos os vencimentos no passado mas tem pendências (atrasados)
             mes_inicio = mes_atual
-            mes_termino = mes_atual
-            for _ in range(parcelas_restantes - 1):
-                mes_termino = get_next_month(mes_termino)
+            mes_termino = add_months(mes_atual, max(parcelas_restantes - 1, 0))
         else:
             # Fallback: sem parcelas futuras nem pendentes
             mes_inicio = mes_atual
@@ -472,8 +1049,8 @@ def get_installment_projection(db: Session, user_id: str, months: int = 12) -> d
 
         # Recalcular parcelas_restantes para upfront baseado em contagem real
         # Para incremental, manter parcela_total - progresso
-        if len(installments) >= parcela_total:
-            parcelas_restantes = len(unpaid_installments)
+        if group["quantidade"] >= parcela_total:
+            parcelas_restantes = group["quantidade"] - group["parcelas_pagas"]
 
         status_badge = "Encerrando" if parcelas_restantes <= 2 else "Ativa"
 
@@ -488,45 +1065,89 @@ def get_installment_projection(db: Session, user_id: str, months: int = 12) -> d
             "status_badge": status_badge,
         })
 
-    # 4. Construir projecao mensal
+    return parcelas_info
+
+
+def project_installment_months(
+    parcelas_info: list[dict], mes_atual: date, months: int, renda_atual: float
+) -> list[dict]:
+    """
+    Projecao mensal por sweep-line: cada parcela vira dois eventos (entra em
+    mes_inicio, sai depois de mes_termino) sobre o indice inteiro do mes
+    (0 = mes_atual). Somas prefixadas dos arrays de diferencas dao total
+    comprometido e parcelas ativas de todos os meses em O(parcelas + meses).
+    Valores acumulados em centavos para nao somar erro de ponto flutuante.
+    """
+    deltas = projection_deltas(parcelas_info, mes_atual, months)
+    return accumulate_projection(deltas, mes_atual, months, renda_atual)
+
+
+def projection_deltas(
+    parcelas_info: list[dict], mes_atual: date, months: int, base: tuple | None = None
+) -> tuple[list[int], list[int], dict[int, list[str]]]:
+    """
+    Eventos da sweep-line: arrays de diferencas (centavos e parcelas ativas) e
+    nomes encerrando por indice do mes. Com base, os eventos sao somados sobre
+    uma copia de deltas ja calculados (simulacao sobre a projecao atual).
+    """
+    if base is None:
+        delta_centavos = [0] * (months + 1)
+        delta_ativas = [0] * (months + 1)
+        encerrando: dict[int, list[str]] = defaultdict(list)
+    else:
+        delta_centavos = list(base[0])
+        delta_ativas = list(base[1])
+        encerrando = defaultdict(list, {k: list(v) for k, v in base[2].items()})
+
+    for p in parcelas_info:
+        # CR-024: A parcela esta ativa se mes_inicio <= mes_projecao <= mes_termino
+        inicio = max(months_between(mes_atual, p["mes_inicio"]), 0)
+        fim = months_between(mes_atual, p["mes_termino"])
+        if fim < inicio or inicio >= months:
+            continue
+        centavos = round(p["valor_mensal"] * 100)
+        saida = min(fim + 1, months)
+        delta_centavos[inicio] += centavos
+        delta_centavos[saida] -= centavos
+        delta_ativas[inicio] += 1
+        delta_ativas[saida] -= 1
+        if fim < months:
+            encerrando[fim].append(p["nome"])
+
+    return delta_centavos, delta_ativas, encerrando
+
+
+def accumulate_projection(
+    deltas: tuple, mes_atual: date, months: int, renda_atual: float
+) -> list[dict]:
+    """Somas prefixadas dos deltas da sweep-line em pontos de projecao mensal."""
+    delta_centavos, delta_ativas, encerrando = deltas
     projecao_mensal = []
+    centavos = 0
+    ativas = 0
     prev_total = None
-
     for offset in range(months):
-        mes_projecao = mes_atual
-        for _ in range(offset):
-            mes_projecao = get_next_month(mes_projecao)
-
-        # CR-024: Parcelas ativas neste mes (entre mes_inicio e mes_termino)
-        ativas_nomes = []
-        total_comprometido = 0.0
-        encerrando_nomes = []
-
-        for p in parcelas_info:
-            # CR-024: A parcela esta ativa se mes_inicio <= mes_projecao <= mes_termino
-            if p["mes_inicio"] <= mes_projecao <= p["mes_termino"]:
-                ativas_nomes.append(p["nome"])
-                total_comprometido += p["valor_mensal"]
-
-                # Encerrando neste mes especifico?
-                if p["mes_termino"] == mes_projecao:
-                    encerrando_nomes.append(p["nome"])
-
-        total_comprometido = round(total_comprometido, 2)
+        centavos += delta_centavos[offset]
+        ativas += delta_ativas[offset]
+        total_comprometido = round(centavos / 100, 2)
         valor_liberado = round(prev_total - total_comprometido, 2) if prev_total is not None else 0.0
         pct = round((total_comprometido / renda_atual * 100) if renda_atual > 0 else 0, 1)
 
         projecao_mensal.append({
-            "mes": mes_projecao,
+            "mes": add_months(mes_atual, offset),
             "total_comprometido": total_comprometido,
-            "parcelas_ativas": len(ativas_nomes),
-            "parcelas_encerrando": encerrando_nomes,
+            "parcelas_ativas": ativas,
+            "parcelas_encerrando": encerrando.get(offset, []),
             "valor_liberado": valor_liberado,
             "percentual_comprometimento": pct,
         })
         prev_total = total_comprometido
 
-    # 5. Calcular KPIs de resumo
+    return projecao_mensal
+
+
+def projection_summary(parcelas_info: list[dict], projecao_mensal: list[dict], renda_atual: float) -> dict:
+    """CR-021: KPIs de resumo da projecao (cards) e resposta completa."""
     total_comprometido_mes_atual = projecao_mensal[0]["total_comprometido"] if projecao_mensal else 0.0
 
     # Excluir parcelas concluídas (restantes=0) dos KPIs de "ativas" e "restante"
@@ -575,6 +1196,34 @@ def get_installment_projection(db: Session, user_id: str, months: int = 12) -> d
     }
 
 
+def get_installment_projection(db: Session, user_id: str, months: int = 12) -> dict:
+    """
+    CR-021: Calcula projecao de parcelas futuras para os proximos N meses
+    (ate 120). Retorna resumo com KPIs, projecao mensal e lista de parcelas ativas.
+
+    Reutiliza crud.get_installment_expenses_grouped() para dados de parcelas
+    e crud.get_income_total_by_month() para renda do mes atual; a projecao
+    mensal e calculada por project_installment_months (sweep-line).
+    """
+    today = date.today()
+    mes_atual = date(today.year, today.month, 1)
+
+    # 1. Buscar grupos de parcelas
+    installments_data = crud.get_installment_expenses_grouped(db, user_id)
+
+    # 2. Buscar renda do mes atual
+    renda_atual = crud.get_income_total_by_month(db, mes_atual, user_id)
+
+    # 3. Extrair info de cada grupo ativo para projecao
+    parcelas_info = projection_items(installments_data["groups"], mes_atual)
+
+    # 4. Construir projecao mensal
+    projecao_mensal = project_installment_months(parcelas_info, mes_atual, months, renda_atual)
+
+    # 5. Calcular KPIs de resumo
+    return projection_summary(parcelas_info, projecao_mensal, renda_atual)
+
+
 def get_daily_expenses_monthly_summary(db: Session, mes_referencia: date, user_id: str) -> dict:
     """
     CR-005: Constroi a visao mensal de gastos diarios, agrupados por dia.
@@ -0,0 +1,104 @@
+"""
+Simulador what-if de compras parceladas sobre a projecao (CR-021).
+
+A linha de base vem da entrada do cache do score (scoring.get_score_entry,
+mesma chave por fingerprint): score atual e entradas do calculo, cujos grupos
+de parcelas alimentam a projecao. Os itens e deltas da sweep-line de cada
+horizonte sao guardados na propria entrada; cada simulacao so soma os eventos
+dos planos hipoteticos aos deltas, sem consultar o banco.
+"""
+from datetime import date, datetime
+
+from sqlalchemy.orm import Session
+
+from app import scoring
+from app.health_score import calculate_health_score
+from app.models import User
+from app.services import (
+    accumulate_projection,
+    projection_deltas,
+    projection_items,
+    projection_summary,
+)
+
+
+def _projection_baseline(entry: dict, mes_atual: date, months: int) -> dict:
+    """
+    Projecao atual (como get_installment_projection) a partir das entradas do
+    score, calculada uma vez por horizonte e guardada na entrada do cache.
+    """
+    projecoes = entry.setdefault("projecoes", {})
+    if months not in projecoes:
+        renda_atual = entry["inputs"]["renda"]
+        parcelas_info = projection_items(entry["inputs"]["installment_groups"], mes_atual)
+        deltas = projection_deltas(parcelas_info, mes_atual, months)
+        projecoes[months] = {
+            "parcelas_info": parcelas_info,
+            "deltas": deltas,
+            "renda_atual": renda_atual,
+            "projecao_mensal": accumulate_projection(deltas, mes_atual, months, renda_atual),
+        }
+    return projecoes[months]
+
+
+def _simulated_score(entry: dict, hipoteticas: list[dict], mes_atual: date) -> dict:
+    """
+    Score do mes atual como se as compras tivessem sido cadastradas hoje: cada
+    plano entra como grupo de parcelas (D2/D4d) e, se comeca no mes atual, a
+    primeira parcela entra nas despesas do mes (D1/D3/D4a).
+    """
+    inputs = entry["inputs"]
+    now = datetime.now()
+    groups = [scoring.hypothetical_group(item, now) for item in hipoteticas]
+    novas_despesas = [
+        group["installments"][0] for item, group in zip(hipoteticas, groups)
+        if item["mes_inicio"] == mes_atual
+    ]
+    simulado = calculate_health_score(**{
+        **inputs,
+        "expenses": [*inputs["expenses"], *novas_despesas],
+        "installment_groups": [*inputs["installment_groups"], *groups],
+    })["score"]
+    atual = entry["score_data"]["score"]
+    return {
+        "score_atual": atual["total"],
+        "score_simulado": simulado["total"],
+        "variacao": simulado["total"] - atual["total"],
+        "classificacao_atual": atual["classificacao"],
+        "classificacao_simulada": simulado["classificacao"],
+    }
+
+
+def simulate_installment_projection(db: Session, user: User, planos: list[dict], months: int = 12) -> dict:
+    """
+    Projecao de parcelas e score com compras hipoteticas somadas a linha de
+    base. Cada plano: nome, valor_mensal, parcela_total e mes_inicio opcional
+    (padrao: proximo mes). Levanta ValueError se mes_inicio for passado.
+    """
+    today = date.today()
+    mes_atual = date(today.year, today.month, 1)
+    hipoteticas = [scoring.hypothetical_item(plano, mes_atual) for plano in planos]
+    entry = scoring.get_score_entry(db, user, today)
+    baseline = _projection_baseline(entry, mes_atual, months)
+    renda_atual = baseline["renda_atual"]
+
+    deltas = projection_deltas(hipoteticas, mes_atual, months, base=baseline["deltas"])
+    projecao_mensal = accumulate_projection(deltas, mes_atual, months, renda_atual)
+    projecao = projection_summary([*baseline["parcelas_info"], *hipoteticas], projecao_mensal, renda_atual)
+
+    variacao_mensal = [
+        {
+            "mes": simulado["mes"],
+            "total_comprometido": round(simulado["total_comprometido"] - base["total_comprometido"], 2),
+            "percentual_comprometimento": round(
+                simulado["percentual_comprometimento"] - base["percentual_comprometimento"], 1
+            ),
+        }
+        for base, simulado in zip(baseline["projecao_mensal"], projecao_mensal)
+    ]
+
+    return {
+        "projecao": projecao,
+        "variacao_mensal": variacao_mensal,
+        "score": _simulated_score(entry, hipoteticas, mes_atual),
+    }
@@ -11,3 +11,8 @@ def add_months(source_date: date, months: int) -> date:
     month = month % 12 + 1
     day = min(source_date.day, calendar.monthrange(year, month)[1])
     return date(year, month, day)
+
+
+def months_between(start: date, end: date) -> int:
+    """Numero de meses de 'start' ate 'end' (ignora o dia). Negativo se end < start."""
+    return (end.year - start.year) * 12 + (end.month - start.month)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Benchmark do score em lote (CR-026), do banco ate os pontos: ORM + calculate_health_score vs colunar.
+
+Semeia um SQLite em memoria com usuarios, meses, despesas, gastos diarios,
+compras parceladas e scores anteriores, e pontua todos os usuario-mes:
+
+- por linha: as mesmas leituras em lote por usuario de rebuild_score_history
+  (objetos ORM) e calculate_health_score por usuario-mes;
+- colunar: scoring.calculate_health_scores_bulk, linhas do Core
+  (crud.get_score_column_rows) direto para as colunas
+  (build_score_columns_from_rows) e calculate_health_scores_columnar.
+
+Os dois tempos incluem as queries. Antes de medir, confere que os dois
+caminhos produzem o mesmo resultado para todos os usuario-mes.
+
+Uso:
+    cd backend
+    python -m scripts.bench_health_score
+    python -m scripts.bench_health_score --users 1000 --months 10 --repeat 3
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+
+sys.path.insert(0, ".")
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.database import Base
+from app.health_score import build_score_columns_from_rows, calculate_health_score, calculate_health_scores_columnar
+from app.models import DailyExpense, Expense, ExpenseStatus, Income, InstallmentPlan, ScoreHistorico, User
+from app.scoring import calculate_health_scores_bulk
+from app.utils import add_months
+
+_STATUSES = [ExpenseStatus.PAGO.value, ExpenseStatus.PENDENTE.value, ExpenseStatus.ATRASADO.value]
+PRIMEIRO_MES = date(2026, 1, 1)
+
+
+def _seed(db, users: int, months: int, rng: random.Random) -> list[tuple[str, date]]:
+    """Usuario-mes tipico: ~10 despesas, ~25 gastos diarios, ~3 compras parceladas por usuario."""
+    meses = [add_months(PRIMEIRO_MES, k) for k in range(months)]
+    rows = defaultdict(list)
+    user_months = []
+    for u in range(users):
+        user_id = str(uuid.uuid4())
+        rows[User].append({"id": user_id, "nome": f"Usuario {u}", "email": f"u{u}@example.com"})
+        for g in range(rng.randint(0, 6)):
+            parcela_total = rng.choice((3, 6, 10, 12, 18, 24))
+            inicio = add_months(PRIMEIRO_MES, rng.randint(-parcela_total + 1, months - 1))
+            valor = round(rng.uniform(40, 900), 2)
+            plan = crud.installment_plan_row(user_id, f"Compra {g}", valor, parcela_total, 1, inicio)
+            rows[InstallmentPlan].append(plan)
+            for p in range(1, parcela_total + 1):
+                mes = add_months(inicio, p - 1)
+                rows[Expense].append({
+                    "id": str(uuid.uuid4()), "user_id": user_id, "mes_referencia": mes, "nome": f"Compra {g}",
+                    "valor": valor, "vencimento": mes, "parcela_atual": p, "parcela_total": parcela_total,
+                    "recorrente": False, "plan_id": plan["id"],
+                    "status": ExpenseStatus.PAGO.value if mes < meses[-1] else ExpenseStatus.PENDENTE.value,
+                    "created_at": datetime(inicio.year, inicio.month, 3),
+                })
+        for mes in meses:
+            user_months.append((user_id, mes))
+            rows[Income].append({"id": str(uuid.uuid4()), "user_id": user_id, "mes_referencia": mes,
+                                 "nome": "Salario", "valor": round(rng.uniform(2000, 20000), 2), "data": mes})
+            for i in range(rng.randint(4, 16)):
+                rows[Expense].append({
+                    "id": str(uuid.uuid4()), "user_id": user_id, "mes_referencia": mes, "nome": f"Despesa {i}",
+                    "valor": round(rng.uniform(30, 2500), 2), "vencimento": date(mes.year, mes.month, i + 1),
+                    "parcela_atual": None, "parcela_total": None, "recorrente": False, "plan_id": None,
+                    "status": rng.choice(_STATUSES), "created_at": datetime(mes.year, mes.month, 1),
+                })
+            for _ in range(rng.randint(0, 50)):
+                dia = date(mes.year, mes.month, rng.randint(1, 28))
+                rows[DailyExpense].append({
+                    "id": str(uuid.uuid4()), "user_id": user_id, "mes_referencia": mes, "descricao": "Gasto",
+                    "valor": round(rng.uniform(5, 250), 2), "data": dia, "categoria": "Outros",
+                    "subcategoria": "Outros", "metodo_pagamento": "Pix",
+                    "created_at": datetime(dia.year, dia.month, dia.day), "updated_at": datetime.now(),
+                })
+            if rng.random() < 0.7:
+                rows[ScoreHistorico].append({
+                    "id": str(uuid.uuid4()), "user_id": user_id, "mes_referencia": mes, "score_total": 60,
+                    "d1_comprometimento": 15, "d2_parcelas": 15, "d3_poupanca": 15, "d4_comportamento": 15,
+                    "classificacao": "Estável", "created_at": datetime.now(),
+                    "dados_snapshot": json.dumps({"comprometimento_pct": round(rng.uniform(20, 120), 1)}),
+                })
+    # Core (sem eventos de flush): contadores dos planos recalculados no fim
+    for model in (User, InstallmentPlan, Income, Expense, DailyExpense, ScoreHistorico):
+        db.execute(insert(model.__table__), rows[model])
+    crud.refresh_installment_plans(db, {plan["id"] for plan in rows[InstallmentPlan]})
+    db.commit()
+    return user_months
+
+
+def _group_by_month(items) -> dict:
+    grouped = defaultdict(list)
+    for item in items:
+        grouped[item.mes_referencia].append(item)
+    return grouped
+
+
+def score_row_by_row(db, user_months: list[tuple[str, date]]) -> list[tuple]:
+    """Leituras ORM em lote por usuario (como rebuild_score_history) e calculate_health_score por mes."""
+    meses_por_usuario = defaultdict(list)
+    for user_id, mes in user_months:
+        meses_por_usuario[user_id].append(mes)
+    resultados = {}
+    for user_id, meses in meses_por_usuario.items():
+        inicio, fim = add_months(min(meses), -3), max(meses)
+        expenses = _group_by_month(crud.get_expenses_by_month_range(db, inicio, fim, user_id))
+        incomes = _group_by_month(crud.get_incomes_by_month_range(db, inicio, fim, user_id))
+        daily = _group_by_month(crud.get_daily_expenses_by_month_range(db, inicio, fim, user_id))
+        groups = crud.get_installment_expenses_grouped(db, user_id)["groups"]
+        existing = crud.get_score_historico_map(db, user_id)
+        daily_totals = {
+            mes: round(float(sum((Decimal(str(de.valor)) for de in items), Decimal(0))), 2)
+            for mes, items in daily.items()
+        }
+        for mes in meses:
+            history = [
+                (add_months(mes, -k), daily_totals[add_months(mes, -k)])
+                for k in (3, 2, 1) if daily_totals.get(add_months(mes, -k), 0) > 0
+            ]
+            prev = existing.get(add_months(mes, -1))
+            score = calculate_health_score(
+                renda=float(sum((Decimal(str(i.valor)) for i in incomes.get(mes, [])), Decimal(0))),
+                expenses=expenses.get(mes, []),
+                daily_expenses=daily.get(mes, []),
+                installment_groups=groups,
+                daily_expense_history=history,
+                prev_month_comprometimento=json.loads(prev.dados_snapshot).get("comprometimento_pct") if prev else None,
+                mes_atual=mes,
+            )
+            resultados[(user_id, mes)] = (
+                *(dim["pontos"] for dim in score["dimensoes"].values()),
+                score["score"]["total"], score["score"]["classificacao"],
+            )
+        db.expunge_all()
+    return [resultados[key] for key in user_months]
+
+
+def _as_tuples(result: dict) -> list[tuple]:
+    return list(zip(result["d1"], result["d2"], result["d3"], result["d4"], result["total"], result["classificacao"]))
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--months", type=int, default=10, help="Meses por usuario")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    user_months = _seed(db, args.users, args.months, random.Random(42))
+
+    if _as_tuples(calculate_health_scores_bulk(db, user_months)) != score_row_by_row(db, user_months):
+        raise SystemExit("Divergencia entre os caminhos por linha e colunar")
+
+    rows = crud.get_score_column_rows(db, user_months)
+    month_rows = [(round(renda or 0, 2), mes, json.loads(s).get("comprometimento_pct") if s else None)
+                  for mes, renda, s in rows["months"]]
+    cols = build_score_columns_from_rows(
+        month_rows, rows["expenses"], rows["daily"], rows["history"], rows["groups"], rows["installments"])
+
+    por_linha = _best(lambda: score_row_by_row(db, user_months), args.repeat)
+    colunar = _best(lambda: calculate_health_scores_bulk(db, user_months), args.repeat)
+    queries = _best(lambda: crud.get_score_column_rows(db, user_months), args.repeat)
+    montagem = _best(lambda: build_score_columns_from_rows(
+        month_rows, rows["expenses"], rows["daily"], rows["history"], rows["groups"], rows["installments"],
+    ), args.repeat)
+    calculo = _best(lambda: calculate_health_scores_columnar(cols), args.repeat)
+
+    print(f"Score de {len(user_months)} usuario-mes, do banco ate os pontos (resultados identicos)")
+    print(f"{'caminho':<40} | {'tempo (ms)':>11} | {'ganho':>6}")
+    print("-" * 64)
+    print(f"{'ORM + calculate_health_score':<40} | {por_linha * 1000:>11.1f} | {'1.0x':>6}")
+    print(f"{'colunar (calculate_health_scores_bulk)':<40} | {colunar * 1000:>11.1f} | {por_linha / colunar:>5.1f}x")
+    print(f"{'  queries (get_score_column_rows)':<40} | {queries * 1000:>11.1f} |")
+    print(f"{'  colunas (from_rows)':<40} | {montagem * 1000:>11.1f} |")
+    print(f"{'  calculo colunar':<40} | {calculo * 1000:>11.1f} |")
+
+
+if __name__ == "__main__":
+    main()
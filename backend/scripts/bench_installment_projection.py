@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark da projecao de parcelas (CR-021): laco mes a mes vs sweep-line.
+
+O caminho antigo recalculava mes_projecao com get_next_month aninhado a cada
+offset e percorria todas as parcelas em todos os meses (O(meses x parcelas)).
+O caminho novo (services.project_installment_months) transforma cada parcela
+em eventos de inicio/fim sobre o indice do mes e soma um array de diferencas.
+
+Mede o motor isolado e o servico completo (get_installment_projection) com
+N planos simultaneos em SQLite in-memory, para horizontes de 12 a 120 meses.
+
+Uso:
+    cd backend
+    python -m scripts.bench_installment_projection
+    python -m scripts.bench_installment_projection --plans 200 --horizons 12 60 120 --repeat 5
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, ".")
+
+from app import crud
+from app.database import Base
+from app.models import Expense, ExpenseStatus, User
+from app.services import get_installment_projection, get_next_month, project_installment_months
+from app.utils import add_months
+
+MES_ATUAL = date(date.today().year, date.today().month, 1)
+
+
+def legacy_project_months(parcelas_info: list[dict], mes_atual: date, months: int, renda_atual: float) -> list[dict]:
+    """Copia do laco anterior: get_next_month aninhado e varredura de todas as parcelas por mes."""
+    projecao_mensal = []
+    prev_total = None
+    for offset in range(months):
+        mes_projecao = mes_atual
+        for _ in range(offset):
+            mes_projecao = get_next_month(mes_projecao)
+        ativas_nomes = []
+        total_comprometido = 0.0
+        encerrando_nomes = []
+        for p in parcelas_info:
+            if p["mes_inicio"] <= mes_projecao <= p["mes_termino"]:
+                ativas_nomes.append(p["nome"])
+                total_comprometido += p["valor_mensal"]
+                if p["mes_termino"] == mes_projecao:
+                    encerrando_nomes.append(p["nome"])
+        total_comprometido = round(total_comprometido, 2)
+        valor_liberado = round(prev_total - total_comprometido, 2) if prev_total is not None else 0.0
+        pct = round((total_comprometido / renda_atual * 100) if renda_atual > 0 else 0, 1)
+        projecao_mensal.append({
+            "mes": mes_projecao,
+            "total_comprometido": total_comprometido,
+            "parcelas_ativas": len(ativas_nomes),
+            "parcelas_encerrando": encerrando_nomes,
+            "valor_liberado": valor_liberado,
+            "percentual_comprometimento": pct,
+        })
+        prev_total = total_comprometido
+    return projecao_mensal
+
+
+def _random_items(n_plans: int) -> list[dict]:
+    rng = random.Random(42)
+    items = []
+    for i in range(n_plans):
+        inicio = add_months(MES_ATUAL, rng.randint(0, 24))
+        items.append({
+            "nome": f"Plano {i}",
+            "valor_mensal": round(rng.uniform(20, 1500), 2),
+            "mes_inicio": inicio,
+            "mes_termino": add_months(inicio, rng.randint(1, 96)),
+        })
+    return items
+
+
+def _seed(n_plans: int):
+    """Banco in-memory com n_plans compras de 12x a 48x criadas de uma vez (upfront)."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    rng = random.Random(7)
+    with factory() as db:
+        db.add(User(id="bench-user", nome="Bench", email="bench@example.com", email_verified=True))
+        for i in range(n_plans):
+            total = rng.choice((12, 24, 36, 48))
+            valor = round(rng.uniform(20, 1500), 2)
+            vencimento = add_months(date(MES_ATUAL.year, MES_ATUAL.month, 10), -rng.randint(0, total - 1))
+            plan = crud.add_installment_plan(db, "bench-user", f"Compra {i}", valor, total, 1, vencimento)
+            for parcela in range(1, total + 1):
+                venc = add_months(vencimento, parcela - 1)
+                db.add(Expense(
+                    user_id="bench-user", mes_referencia=date(venc.year, venc.month, 1),
+                    nome=f"Compra {i}", valor=valor, vencimento=venc,
+                    parcela_atual=parcela, parcela_total=total, recorrente=False, plan_id=plan.id,
+                    status=ExpenseStatus.PAGO.value if venc < MES_ATUAL else ExpenseStatus.PENDENTE.value,
+                ))
+        db.commit()
+    return factory
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--plans", type=int, default=200)
+    parser.add_argument("--horizons", type=int, nargs="+", default=[12, 36, 60, 120])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    items = _random_items(args.plans)
+    print(f"Motor de projecao com {args.plans} planos")
+    print(f"{'meses':>6} | {'antigo (ms)':>12} | {'sweep (ms)':>11} | {'ganho':>6}")
+    print("-" * 46)
+    for months in args.horizons:
+        legacy = _best(lambda: legacy_project_months(items, MES_ATUAL, months, 10000.0), args.repeat)
+        sweep = _best(lambda: project_installment_months(items, MES_ATUAL, months, 10000.0), args.repeat)
+        print(f"{months:>6} | {legacy * 1000:>12.2f} | {sweep * 1000:>11.2f} | {legacy / sweep:>5.1f}x")
+
+    factory = _seed(args.plans)
+    print(f"\nget_installment_projection com {args.plans} planos (SQLite in-memory)")
+    print(f"{'meses':>6} | {'tempo (ms)':>11}")
+    print("-" * 21)
+    with factory() as db:
+        for months in args.horizons:
+            elapsed = _best(lambda: get_installment_projection(db, "bench-user", months), args.repeat)
+            print(f"{months:>6} | {elapsed * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark da transicao de mes (RF-06): caminho antigo (item a item) vs set-based.
+
+O caminho antigo faz, para cada item do mes anterior, ate duas queries de
+existencia (crud.expense_replica_exists / crud.expense_installment_exists) e um
+db.add por replica. O caminho novo (services.generate_month_data) carrega as
+chaves do mes-alvo em uma query e grava com um INSERT em lote.
+
+Cada cenario usa metade recorrentes e metade parcelas, em SQLite in-memory.
+
+Uso:
+    cd backend
+    python -m scripts.bench_month_replication
+    python -m scripts.bench_month_replication --sizes 10 100 1000 --repeat 5
+"""
+
+import argparse
+import logging
+import sys
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, ".")
+
+from app import crud
+from app.database import Base
+from app.models import Expense, ExpenseStatus, User
+from app.services import adjust_vencimento_to_month, generate_month_data, get_previous_month
+
+SOURCE_MES = date(2026, 1, 1)
+TARGET_MES = date(2026, 2, 1)
+
+
+def legacy_generate_month_data(db: Session, target_mes: date, user_id: str) -> bool:
+    """Copia do algoritmo anterior: duas queries de existencia por item + db.add por replica."""
+    prev_expenses = crud.get_expenses_by_month(db, get_previous_month(target_mes), user_id)
+    replicated = 0
+    for exp in prev_expenses:
+        if exp.parcela_atual is not None and exp.parcela_total is not None:
+            if exp.parcela_atual >= exp.parcela_total:
+                continue
+            if crud.expense_replica_exists(db, target_mes, user_id, exp.id):
+                continue
+            if crud.expense_installment_exists(
+                db, target_mes, user_id, exp.nome, exp.parcela_atual + 1, exp.parcela_total
+            ):
+                continue
+            parcela_atual, parcela_total = exp.parcela_atual + 1, exp.parcela_total
+        elif exp.recorrente:
+            if crud.expense_replica_exists(db, target_mes, user_id, exp.id):
+                continue
+            parcela_atual, parcela_total = None, None
+        else:
+            continue
+        db.add(Expense(
+            user_id=user_id,
+            mes_referencia=target_mes,
+            nome=exp.nome,
+            categoria=exp.categoria,
+            subcategoria=exp.subcategoria,
+            valor=exp.valor,
+            vencimento=adjust_vencimento_to_month(exp.vencimento, target_mes),
+            parcela_atual=parcela_atual,
+            parcela_total=parcela_total,
+            recorrente=exp.recorrente,
+            origem_id=exp.id,
+            status=ExpenseStatus.PENDENTE.value,
+        ))
+        replicated += 1
+    if replicated:
+        db.commit()
+        return True
+    return False
+
+
+def _seed(n_items: int) -> tuple[sessionmaker, str]:
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        user = User(id="bench-user", nome="Bench", email="bench@example.com")
+        db.add(user)
+        for i in range(n_items):
+            installment = i % 2 == 1
+            db.add(Expense(
+                user_id=user.id,
+                mes_referencia=SOURCE_MES,
+                nome=f"Item {i}",
+                valor=10.00 + i,
+                vencimento=date(2026, 1, 1 + i % 28),
+                parcela_atual=1 if installment else None,
+                parcela_total=12 if installment else None,
+                recorrente=not installment,
+                status=ExpenseStatus.PAGO.value,
+            ))
+        db.commit()
+    return factory, "bench-user"
+
+
+def _run(fn, n_items: int) -> tuple[float, int]:
+    """Executa fn em um banco recem-populado. Retorna (segundos, comandos SQL)."""
+    factory, user_id = _seed(n_items)
+    statements = 0
+
+    def _count(*_args):
+        nonlocal statements
+        statements += 1
+
+    engine = factory.kw["bind"]
+    event.listen(engine, "before_cursor_execute", _count)
+    with factory() as db:
+        start = time.perf_counter()
+        fn(db, TARGET_MES, user_id)
+        elapsed = time.perf_counter() - start
+    event.remove(engine, "before_cursor_execute", _count)
+    return elapsed, statements
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.getLogger("app.services").setLevel(logging.WARNING)
+
+    print(f"{'itens':>6} | {'antigo (ms)':>12} {'SQL':>6} | {'novo (ms)':>10} {'SQL':>6} | {'ganho':>6}")
+    print("-" * 60)
+    for n in args.sizes:
+        legacy = min(_run(legacy_generate_month_data, n) for _ in range(args.repeat))
+        bulk = min(_run(generate_month_data, n) for _ in range(args.repeat))
+        speedup = legacy[0] / bulk[0] if bulk[0] else float("inf")
+        print(
+            f"{n:>6} | {legacy[0] * 1000:>12.1f} {legacy[1]:>6} | "
+            f"{bulk[0] * 1000:>10.1f} {bulk[1]:>6} | {speedup:>5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
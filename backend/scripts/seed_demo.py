@@ -47,12 +47,12 @@ if "--database-url" in sys.argv:
 
 from app.database import SessionLocal, engine
 from app.models import (
-    User, Expense, Income, DailyExpense, ScoreHistorico,
+    User, Expense, Income, DailyExpense, ScoreHistorico, MonthState, MonthlyRollup, InstallmentPlan,
     ExpenseStatus, Base,
 )
 from app.categories import get_category_for_subcategory
 from app.health_score import calculate_health_score, calculate_conservative_score
-from app.crud import get_installment_expenses_grouped, upsert_score_historico
+from app.crud import add_installment_plan, get_installment_expenses_grouped, upsert_score_historico
 
 DEMO_EMAIL = "meucontrole.demo@gmail.com"
 
@@ -371,7 +371,7 @@ def seed_demo_data():
 
         # 2. Limpeza idempotente
         print("\nLimpando dados existentes...")
-        for model in [ScoreHistorico, DailyExpense, Expense, Income]:
+        for model in [ScoreHistorico, DailyExpense, Expense, InstallmentPlan, Income, MonthState, MonthlyRollup]:
             count = db.execute(
                 delete(model).where(model.user_id == user_id)
             ).rowcount
@@ -467,6 +467,11 @@ def seed_demo_data():
             dia_venc = inst_def["dia_vencimento"]
             categoria = get_category_for_subcategory(subcategoria)
             prev_installment_id = None
+            mes_inicial, parcela_inicial = inst_def["parcelas"][0]
+            plan = add_installment_plan(
+                db, user_id, nome, valor, parcela_total, parcela_inicial,
+                date(mes_inicial.year, mes_inicial.month, dia_venc),
+            )
 
             for mes, parcela_atual in inst_def["parcelas"]:
                 expense_id = _id()
@@ -486,6 +491,7 @@ def seed_demo_data():
                     parcela_total=parcela_total,
                     recorrente=False,
                     origem_id=prev_installment_id,
+                    plan_id=plan.id,
                     status=status,
                 )
                 db.add(expense)
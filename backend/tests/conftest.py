@@ -2,8 +2,12 @@ import pytest
 from datetime import date
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.testclient import TestClient
 
-from app.database import Base
+from app.auth import create_access_token
+from app.database import Base, SessionLocal, get_db
+from app.main import app
 from app.models import User, Expense, Income, ExpenseStatus
 
 
@@ -12,7 +16,7 @@ def db():
     """In-memory SQLite session for fast tests."""
     engine = create_engine("sqlite:///:memory:")
     Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
+    Session = sessionmaker(**{**SessionLocal.kw, "bind": engine})  # mesmas opcoes da app
     session = Session()
     yield session
     session.close()
@@ -83,3 +87,46 @@ def january_data(db, test_user):
         db.add(i)
     db.commit()
     return expenses, incomes
+
+
+@pytest.fixture
+def api_db():
+    """
+    Session factory over an in-memory SQLite shared (StaticPool) between the
+    test and the app: get_db is overridden to open sessions on the same engine.
+    """
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    TestingSession = sessionmaker(**{**SessionLocal.kw, "bind": engine})
+
+    def _override():
+        s = TestingSession()
+        try:
+            yield s
+        finally:
+            s.close()
+
+    app.dependency_overrides[get_db] = _override
+    yield TestingSession
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture
+def api_user(api_db):
+    """User persisted in the api_db database."""
+    with api_db() as session:
+        user = User(nome="API User", email="api@example.com", password_hash="x", email_verified=True)
+        session.add(user)
+        session.commit()
+    return user
+
+
+@pytest.fixture
+def api(api_user):
+    """TestClient authenticated as api_user: (client, headers)."""
+    token = create_access_token({"sub": api_user.id})
+    return TestClient(app), {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,110 @@
+"""
+GET condicional (ETag / 304) para /api/months, /api/dashboard e
+/api/expenses/installments, derivado de users.data_version.
+"""
+from datetime import date
+
+import pytest
+
+from app.jobs.rollover import run_rollover
+from app.models import Expense, ExpenseStatus
+from app.query_counter import HEADER_NAME
+
+
+def _create_expense(client, headers):
+    r = client.post("/api/expenses/2026/3", headers=headers, json={
+        "nome": "Internet", "valor": 120.0, "vencimento": "2026-03-10", "recorrente": True,
+    })
+    assert r.status_code == 201, r.text
+    return r.json()
+
+
+@pytest.mark.parametrize("path", [
+    "/api/months/2026/3",
+    "/api/dashboard/2026/3",
+    "/api/expenses/installments",
+])
+def test_if_none_match_returns_304_without_touching_expenses(api, path):
+    client, headers = api
+    _create_expense(client, headers)
+
+    first = client.get(path, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('"')
+
+    cached = client.get(path, headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+    # Apenas o SELECT do usuario autenticado
+    assert cached.headers[HEADER_NAME] == "1"
+
+
+def test_write_changes_etag(api):
+    client, headers = api
+    expense = _create_expense(client, headers)
+    etag = client.get("/api/months/2026/3", headers=headers).headers["ETag"]
+
+    r = client.patch(f"/api/expenses/{expense['id']}", headers=headers, json={"valor": 130.0})
+    assert r.status_code == 200
+
+    again = client.get("/api/months/2026/3", headers={**headers, "If-None-Match": etag})
+    assert again.status_code == 200
+    assert again.headers["ETag"] != etag
+    assert again.json()["total_despesas"] == 130.0
+
+
+def test_failed_write_keeps_etag(api):
+    client, headers = api
+    _create_expense(client, headers)
+    etag = client.get("/api/months/2026/3", headers=headers).headers["ETag"]
+
+    r = client.patch("/api/expenses/nao-existe", headers=headers, json={"valor": 1.0})
+    assert r.status_code == 404
+
+    cached = client.get("/api/months/2026/3", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+
+def test_etag_depends_on_url(api):
+    client, headers = api
+    a = client.get("/api/months/2026/3", headers=headers).headers["ETag"]
+    b = client.get("/api/months/2026/3?summary=true", headers=headers).headers["ETag"]
+    c = client.get("/api/months/2026/4", headers=headers).headers["ETag"]
+    assert len({a, b, c}) == 3
+
+
+def _seed_first_installment(api_db, api_user):
+    """Parcela 1/6 sem as seguintes: replicadas apenas quando um mes posterior e aberto."""
+    with api_db() as session:
+        session.add(Expense(user_id=api_user.id, mes_referencia=date(2026, 3, 1), nome="Sofa", valor=250.0,
+                            vencimento=date(2026, 3, 10), parcela_atual=1, parcela_total=6,
+                            recorrente=False, status=ExpenseStatus.PAGO.value))
+        session.commit()
+
+
+def test_replication_on_read_changes_etag(api, api_db, api_user):
+    client, headers = api
+    _seed_first_installment(api_db, api_user)
+    first = client.get("/api/expenses/installments", headers=headers)
+    etag = first.headers["ETag"]
+
+    # Forward-fill de abril e maio ao abrir maio: novas parcelas sem endpoint de escrita
+    assert client.get("/api/months/2026/5", headers=headers).status_code == 200
+
+    again = client.get("/api/expenses/installments", headers={**headers, "If-None-Match": etag})
+    assert again.status_code == 200
+    assert again.headers["ETag"] != etag
+    assert again.content != first.content
+
+
+def test_rollover_changes_etag(api, api_db, api_user):
+    client, headers = api
+    _seed_first_installment(api_db, api_user)
+    etag = client.get("/api/expenses/installments", headers=headers).headers["ETag"]
+
+    run_rollover(api_db, date(2026, 4, 1))
+
+    again = client.get("/api/expenses/installments", headers={**headers, "If-None-Match": etag})
+    assert again.status_code == 200
@@ -3,11 +3,21 @@ CR-026: Testes do servico de calculo do Score de Saude Financeira.
 Cenarios da secao 14 do CR-026.
 """
 import pytest
+import random
 from datetime import date, datetime
 from unittest.mock import patch
 
-from app.models import Expense, Income, DailyExpense, ExpenseStatus
-from app.health_score import calculate_health_score, calculate_conservative_score, generate_actions
+from app import crud
+from app.models import Expense, Income, DailyExpense, ExpenseStatus, ScoreHistorico, User
+from app.health_score import (
+    build_score_columns,
+    calculate_conservative_score,
+    calculate_health_score,
+    calculate_health_scores_columnar,
+    generate_actions,
+)
+from app.scoring import calculate_health_scores_bulk
+from app.utils import add_months
 
 
 # ========== Fixtures ==========
@@ -495,3 +505,170 @@ class TestActionsGenerator:
         actions = generate_actions(result, 10000.00, [], [], [])
         # With perfect score, most dimensions are at 80%+, so few actions
         assert len(actions) <= 1
+
+
+# ========== Avaliacao em lote (colunar) ==========
+
+_STATUSES = [ExpenseStatus.PAGO.value, ExpenseStatus.PENDENTE.value, ExpenseStatus.ATRASADO.value]
+
+
+def _random_user_month(rng: random.Random) -> dict:
+    """Argumentos aleatorios de calculate_health_score (valores redondos para cair nas faixas)."""
+    mes = date(rng.randint(2024, 2026), rng.randint(1, 12), 1)
+    dias = 28
+    expenses = [
+        Expense(nome=f"D{i}", valor=rng.choice([50, 100, 250, 500, 1000, rng.uniform(10, 3000)]),
+                status=rng.choice(_STATUSES), vencimento=mes, mes_referencia=mes)
+        for i in range(rng.choice([0, 0, 1, 3, 8, 15]))
+    ]
+    daily = [
+        DailyExpense(descricao="G", valor=round(rng.uniform(5, 300), 2),
+                     data=date(mes.year, mes.month, rng.randint(1, dias)))
+        for _ in range(rng.choice([0, 0, 2, 10, 40]))
+    ]
+    groups = []
+    for g in range(rng.choice([0, 0, 1, 2, 5, 12])):
+        parcela_total = rng.choice([2, 3, 6, 10, 12, 18, 24])
+        inicio = add_months(mes, -rng.randint(0, parcela_total))
+        valor = rng.choice([100, 200, 350, rng.uniform(20, 900)])
+        installments = []
+        for parcela in range(1, parcela_total + 1):
+            if rng.random() < 0.15:
+                continue  # parcelas faltando (len < parcela_total)
+            installments.append(Expense(
+                nome=f"P{g}", valor=valor, parcela_atual=parcela, parcela_total=parcela_total,
+                status=rng.choice(_STATUSES),
+                created_at=datetime(mes.year, mes.month, 2) if rng.random() < 0.3 else datetime(inicio.year, inicio.month, 2),
+            ))
+        groups.append({
+            "plan_id": None, "nome": f"P{g}", "parcela_total": parcela_total,
+            "status_geral": rng.choice(["Em andamento", "Em andamento", "Concluído"]),
+            "installments": installments if rng.random() < 0.95 else [],
+        })
+    history = [(add_months(mes, -k), rng.choice([0.0, 400.0, rng.uniform(100, 2500)]))
+               for k in range(rng.choice([0, 1, 2, 3, 4]), 0, -1)]
+    return {
+        "renda": rng.choice([0, 0.0, 2000.0, 5000.0, 10000.0, rng.uniform(500, 20000)]),
+        "expenses": expenses,
+        "daily_expenses": daily,
+        "installment_groups": groups,
+        "daily_expense_history": history,
+        "prev_month_comprometimento": rng.choice([None, 30.0, 55.5, rng.uniform(0, 150)]),
+        "mes_atual": mes,
+    }
+
+
+class TestColumnarScore:
+    """calculate_health_scores_columnar: mesmos pontos de calculate_health_score."""
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_matches_row_by_row_on_random_inputs(self, seed):
+        rng = random.Random(seed)
+        months = [_random_user_month(rng) for _ in range(400)]
+        result = calculate_health_scores_columnar(build_score_columns(months))
+
+        for i, kwargs in enumerate(months):
+            expected = calculate_health_score(**kwargs)
+            dims = expected["dimensoes"]
+            assert (
+                result["total"][i], result["d1"][i], result["d2"][i], result["d3"][i], result["d4"][i],
+                result["classificacao"][i],
+            ) == (
+                expected["score"]["total"],
+                dims["d1_comprometimento"]["pontos"], dims["d2_parcelas"]["pontos"],
+                dims["d3_poupanca"]["pontos"], dims["d4_comportamento"]["pontos"],
+                expected["score"]["classificacao"],
+            ), (seed, i)
+
+    def test_edge_cases(self):
+        mes = date(2026, 3, 1)
+        base = {"expenses": [], "daily_expenses": [], "installment_groups": [],
+                "daily_expense_history": [], "prev_month_comprometimento": None, "mes_atual": mes}
+        result = calculate_health_scores_columnar(build_score_columns([
+            {**base, "renda": 0},
+            {**base, "renda": 10000.00},
+        ]))
+        assert list(result["total"]) == [0, 100]
+        assert result["classificacao"] == ["Crítica", "Excelente"]
+        assert calculate_health_scores_columnar(build_score_columns([]))["classificacao"] == []
+
+    def test_bulk_from_database_matches_row_by_row(self, db):
+        rng = random.Random(7)
+        meses = [date(2026, m, 1) for m in range(1, 7)]
+        user_months = []
+        for u in range(4):
+            user = User(id=f"bulk-{u}", nome=f"Bulk {u}", email=f"bulk{u}@example.com", password_hash="x")
+            db.add(user)
+            db.flush()
+            for g in range(rng.choice([0, 1, 3])):
+                parcela_total = rng.choice([3, 10, 18])
+                inicio = rng.choice(meses[:3])
+                plan = crud.add_installment_plan(db, user.id, f"Compra {g}", 300.00, parcela_total, 1, inicio)
+                db.flush()
+                for parcela in range(1, min(parcela_total, 6) + 1):
+                    mes = add_months(inicio, parcela - 1)
+                    db.add(Expense(
+                        user_id=user.id, mes_referencia=mes, nome=f"Compra {g}", valor=300.00,
+                        vencimento=mes, parcela_atual=parcela, parcela_total=parcela_total, plan_id=plan.id,
+                        recorrente=False, status=rng.choice(_STATUSES),
+                        created_at=datetime(inicio.year, inicio.month, 2),
+                    ))
+            for mes in meses:
+                user_months.append((user.id, mes))
+                if rng.random() < 0.8:
+                    db.add(Income(user_id=user.id, mes_referencia=mes, nome="Salario",
+                                  valor=rng.choice([3000.10, 5000.00, 8200.55]), data=mes))
+                for i in range(rng.randint(0, 6)):
+                    db.add(Expense(user_id=user.id, mes_referencia=mes, nome=f"Fixa {i}",
+                                   valor=round(rng.uniform(50, 1500), 2), vencimento=date(mes.year, mes.month, i + 1),
+                                   recorrente=False, status=rng.choice(_STATUSES)))
+                for _ in range(rng.randint(0, 12)):
+                    db.add(DailyExpense(user_id=user.id, mes_referencia=mes, descricao="Gasto",
+                                        valor=round(rng.uniform(5, 300), 2),
+                                        data=date(mes.year, mes.month, rng.randint(1, 28)),
+                                        categoria="Outros", subcategoria="Outros", metodo_pagamento="Pix"))
+                if rng.random() < 0.5:
+                    db.add(ScoreHistorico(user_id=user.id, mes_referencia=mes, score_total=60,
+                                          d1_comprometimento=15, d2_parcelas=15, d3_poupanca=15,
+                                          d4_comportamento=15, classificacao="Estável",
+                                          dados_snapshot=f'{{"comprometimento_pct": {rng.uniform(20, 120):.1f}}}'))
+        db.commit()
+
+        result = calculate_health_scores_bulk(db, user_months)
+        # A tabela temporaria score_alvo fica na conexao e e esvaziada a cada chamada
+        assert calculate_health_scores_bulk(db, user_months[::-1])["total"] == result["total"][::-1]
+
+        for i, (user_id, mes) in enumerate(user_months):
+            expected = calculate_health_score(**_score_inputs_from_db(db, user_id, mes))
+            dims = expected["dimensoes"]
+            assert (
+                result["total"][i], result["d1"][i], result["d2"][i], result["d3"][i], result["d4"][i],
+                result["classificacao"][i],
+            ) == (
+                expected["score"]["total"],
+                dims["d1_comprometimento"]["pontos"], dims["d2_parcelas"]["pontos"],
+                dims["d3_poupanca"]["pontos"], dims["d4_comportamento"]["pontos"],
+                expected["score"]["classificacao"],
+            ), (user_id, mes)
+
+
+def _score_inputs_from_db(db, user_id: str, mes: date) -> dict:
+    """Entradas de scoring.score_inputs lidas sem get_monthly_summary (sem replicacao nem varredura)."""
+    import json
+    from decimal import Decimal
+
+    history = []
+    for k in range(3, 0, -1):
+        total = crud.get_daily_expense_total_by_month(db, add_months(mes, -k), user_id)
+        if total > 0:
+            history.append((add_months(mes, -k), total))
+    prev = crud.get_score_by_month(db, user_id, add_months(mes, -1))
+    return {
+        "renda": float(sum((Decimal(str(i.valor)) for i in crud.get_incomes_by_month(db, mes, user_id)), Decimal(0))),
+        "expenses": crud.get_expenses_by_month(db, mes, user_id),
+        "daily_expenses": crud.get_daily_expenses_by_month(db, mes, user_id),
+        "installment_groups": crud.get_installment_expenses_grouped(db, user_id)["groups"],
+        "daily_expense_history": history,
+        "prev_month_comprometimento": json.loads(prev.dados_snapshot).get("comprometimento_pct") if prev else None,
+        "mes_atual": mes,
+    }
@@ -0,0 +1,423 @@
+"""
+Compra parcelada (installment_plans): criada junto com as parcelas, herdada
+pelas replicas do RF-06 e usada como chave de agrupamento. Contadores por
+plano mantidos em PATCH, DELETE, varredura de atraso e replicacao.
+"""
+from datetime import date
+
+from sqlalchemy import select
+
+from app import crud
+from app.alerts import ParcelaAtivadaChecker
+from app.jobs.rollup import verify_rollup
+from app.models import Expense, ExpenseStatus, InstallmentPlan
+from app.query_counter import HEADER_NAME
+from app.services import generate_month_data, sweep_overdue_expenses
+from app.utils import add_months
+
+
+def _post_installment(client, headers, nome="Geladeira", parcela_atual=1, parcela_total=3, mes="2026/3"):
+    r = client.post(f"/api/expenses/{mes}", headers=headers, json={
+        "nome": nome, "valor": 300.0, "vencimento": "2026-03-20",
+        "parcela_atual": parcela_atual, "parcela_total": parcela_total, "recorrente": False,
+    })
+    assert r.status_code == 201, r.text
+    return r.json()
+
+
+class TestPlanCreation:
+    def test_all_installments_share_plan(self, api, api_db):
+        client, headers = api
+        created = _post_installment(client, headers)
+        assert created["plan_id"]
+
+        with api_db() as s:
+            plan = s.get(InstallmentPlan, created["plan_id"])
+            assert plan.parcela_total == 3
+            assert plan.primeiro_vencimento == date(2026, 3, 20)
+            plan_ids = set(s.scalars(select(Expense.plan_id)).all())
+        assert plan_ids == {created["plan_id"]}
+
+    def test_first_vencimento_from_later_installment(self, api, api_db):
+        client, headers = api
+        created = _post_installment(client, headers, parcela_atual=3, parcela_total=5)
+
+        with api_db() as s:
+            assert s.get(InstallmentPlan, created["plan_id"]).primeiro_vencimento == date(2026, 1, 20)
+
+    def test_non_installment_has_no_plan(self, api, api_db):
+        client, headers = api
+        r = client.post("/api/expenses/2026/3", headers=headers, json={
+            "nome": "Internet", "valor": 120.0, "vencimento": "2026-03-10", "recorrente": True,
+        })
+        assert r.json()["plan_id"] is None
+        with api_db() as s:
+            assert s.scalars(select(InstallmentPlan)).first() is None
+
+    def test_homonymous_purchases_grouped_separately(self, api):
+        client, headers = api
+        first = _post_installment(client, headers, nome="Celular")
+        second = _post_installment(client, headers, nome="celular ", mes="2026/4")
+
+        groups = client.get("/api/expenses/installments", headers=headers).json()["groups"]
+        assert {g["plan_id"] for g in groups} == {first["plan_id"], second["plan_id"]}
+        assert all(len(g["installments"]) == 3 for g in groups)
+
+
+class TestPlanReplication:
+    def test_replica_inherits_plan(self, db, test_user):
+        plan = crud.add_installment_plan(db, test_user.id, "Sofa", 250.00, 6, 2, date(2026, 1, 10))
+        db.add(Expense(
+            user_id=test_user.id, mes_referencia=date(2026, 1, 1), nome="Sofa", valor=250.00,
+            vencimento=date(2026, 1, 10), parcela_atual=2, parcela_total=6, recorrente=False,
+            plan_id=plan.id, status=ExpenseStatus.PAGO.value,
+        ))
+        db.commit()
+
+        generate_month_data(db, date(2026, 2, 1), test_user.id)
+
+        replica = db.scalars(select(Expense).where(Expense.mes_referencia == date(2026, 2, 1))).one()
+        assert replica.parcela_atual == 3
+        assert replica.plan_id == plan.id
+
+
+class TestPlanCounters:
+    def _counters(self, Session, plan_id):
+        with Session() as s:
+            plan = s.get(InstallmentPlan, plan_id)
+            return (plan.quantidade, plan.parcelas_pagas, plan.ultima_parcela_paga,
+                    float(plan.valor_total), float(plan.valor_pago),
+                    float(plan.valor_pendente), float(plan.valor_atrasado))
+
+    def test_maintained_on_patch_and_delete(self, api, api_db):
+        client, headers = api
+        created = _post_installment(client, headers)
+        plan_id = created["plan_id"]
+        assert self._counters(api_db, plan_id) == (3, 0, 0, 900.0, 0.0, 900.0, 0.0)
+
+        r = client.patch(f"/api/expenses/{created['id']}", headers=headers, json={"status": "Pago"})
+        assert r.status_code == 200, r.text
+        assert self._counters(api_db, plan_id) == (3, 1, 1, 900.0, 300.0, 600.0, 0.0)
+
+        with api_db() as s:
+            last = s.scalars(select(Expense).where(Expense.parcela_atual == 3)).one()
+        assert client.delete(f"/api/expenses/{last.id}", headers=headers).status_code == 204
+        assert self._counters(api_db, plan_id) == (2, 1, 1, 600.0, 300.0, 300.0, 0.0)
+
+        group = client.get("/api/expenses/installments", headers=headers).json()["groups"][0]
+        assert (group["valor_total_compra"], group["valor_pago"], group["valor_restante"]) == (600.0, 300.0, 300.0)
+        assert len(group["installments"]) == 2
+
+    def test_maintained_by_overdue_sweep(self, db, test_user):
+        plan = crud.add_installment_plan(db, test_user.id, "Bike", 200.00, 2, 1, date(2026, 1, 10))
+        for i in (1, 2):
+            db.add(Expense(
+                user_id=test_user.id, mes_referencia=date(2026, i, 1), nome="Bike", valor=200.00,
+                vencimento=date(2026, i, 10), parcela_atual=i, parcela_total=2, recorrente=False,
+                plan_id=plan.id, status=ExpenseStatus.PENDENTE.value,
+            ))
+        db.commit()
+
+        assert sweep_overdue_expenses(db, test_user.id, date(2026, 1, 20)) == 1
+        db.refresh(plan)
+        assert float(plan.valor_atrasado) == 200.00
+        assert float(plan.valor_pendente) == 200.00
+
+    def test_maintained_by_replication(self, db, test_user):
+        plan = crud.add_installment_plan(db, test_user.id, "Sofa", 250.00, 6, 2, date(2026, 1, 10))
+        db.add(Expense(
+            user_id=test_user.id, mes_referencia=date(2026, 1, 1), nome="Sofa", valor=250.00,
+            vencimento=date(2026, 1, 10), parcela_atual=2, parcela_total=6, recorrente=False,
+            plan_id=plan.id, status=ExpenseStatus.PAGO.value,
+        ))
+        db.commit()
+
+        generate_month_data(db, date(2026, 2, 1), test_user.id)
+        db.refresh(plan)
+        assert (plan.quantidade, plan.parcelas_pagas, plan.ultima_parcela_paga) == (2, 1, 2)
+        assert float(plan.valor_pendente) == 250.00
+
+    def test_grouped_matches_rows_without_plan(self, db, test_user):
+        statuses = ["Pago", "Pago", "Atrasado", "Pendente"]
+        plan = crud.add_installment_plan(db, test_user.id, "Notebook", 410.10, 4, 1, date(2026, 1, 5))
+        for plan_id, nome in ((plan.id, "Notebook"), (None, "Notebook legado")):
+            for i, status in enumerate(statuses, start=1):
+                db.add(Expense(
+                    user_id=test_user.id, mes_referencia=date(2026, i, 1), nome=nome, valor=410.10,
+                    vencimento=date(2026, i, 5), parcela_atual=i, parcela_total=4,
+                    recorrente=False, plan_id=plan_id, status=status,
+                ))
+        db.commit()
+
+        data = crud.get_installment_expenses_grouped(db, test_user.id)
+        by_plan, legacy = data["groups"]
+        for field in ("status_geral", "valor_total_compra", "valor_pago", "valor_restante",
+                      "quantidade", "parcelas_pagas", "ultima_parcela_paga"):
+            assert by_plan[field] == legacy[field], field
+        assert data["total_atrasado"] == 820.20
+
+
+class TestParcelaAtivadaByPlan:
+    def test_new_purchase_with_same_name_is_detected(self, db, test_user):
+        old = crud.add_installment_plan(db, test_user.id, "Curso", 100.00, 10, 4, date(2026, 2, 5))
+        new = crud.add_installment_plan(db, test_user.id, "Curso", 150.00, 10, 1, date(2026, 3, 5))
+        prev = Expense(
+            user_id=test_user.id, mes_referencia=date(2026, 2, 1), nome="Curso", valor=100.00,
+            vencimento=date(2026, 2, 5), parcela_atual=4, parcela_total=10, plan_id=old.id,
+        )
+        curr = [
+            Expense(
+                user_id=test_user.id, mes_referencia=date(2026, 3, 1), nome="Curso", valor=100.00,
+                vencimento=date(2026, 3, 5), parcela_atual=5, parcela_total=10, plan_id=old.id,
+            ),
+            Expense(
+                user_id=test_user.id, mes_referencia=date(2026, 3, 1), nome="Curso", valor=150.00,
+                vencimento=date(2026, 3, 5), parcela_atual=1, parcela_total=10, plan_id=new.id,
+            ),
+        ]
+
+        result = ParcelaAtivadaChecker().check(
+            {"expenses": curr, "prev_expenses": [prev], "total_income": 0, "total_expenses": 0},
+            None,
+        )
+        assert len(result) == 1
+        assert result[0]["impacto_mensal"] == 150.00
+
+
+class TestInstallmentsListing:
+    """Filtro por status, modo resumo e paginacao keyset em /api/expenses/installments."""
+
+    def _seed(self, api, api_db):
+        client, headers = api
+        ids = {}
+        for nome in ("Bike", "Curso", "Geladeira", "Notebook", "TV"):
+            ids[nome] = _post_installment(client, headers, nome=nome)
+        # Curso concluido: as 3 parcelas pagas
+        with api_db() as s:
+            curso = s.scalars(select(Expense.id).where(Expense.plan_id == ids["Curso"]["plan_id"])).all()
+        for expense_id in curso:
+            client.patch(f"/api/expenses/{expense_id}", headers=headers, json={"status": "Pago"})
+        return ids
+
+    def test_status_filter_and_summary(self, api, api_db):
+        client, headers = api
+        self._seed(api, api_db)
+
+        done = client.get("/api/expenses/installments?status=Concluído", headers=headers).json()
+        assert [g["nome"] for g in done["groups"]] == ["Curso"]
+        assert done["total_pago"] == done["total_gasto"] == 900.0
+
+        active = client.get(
+            "/api/expenses/installments?status=Em andamento&summary=true", headers=headers
+        ).json()
+        assert [g["nome"] for g in active["groups"]] == ["Bike", "Geladeira", "Notebook", "TV"]
+        assert all(g["installments"] == [] and g["quantidade"] == 3 for g in active["groups"])
+        assert active["total_pendente"] == 3600.0
+        assert active["next_cursor"] is None
+
+    def test_keyset_pagination(self, api, api_db):
+        client, headers = api
+        self._seed(api, api_db)
+        full = client.get("/api/expenses/installments", headers=headers).json()
+
+        nomes, cursor, pages = [], None, 0
+        while True:
+            path = "/api/expenses/installments?limit=2" + (f"&cursor={cursor}" if cursor else "")
+            page = client.get(path, headers=headers).json()
+            pages += 1
+            nomes.extend(g["nome"] for g in page["groups"])
+            assert all(len(g["installments"]) == 3 for g in page["groups"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        assert pages == 3
+        assert nomes == [g["nome"] for g in full["groups"]]
+        assert page["total_gasto"] == full["total_gasto"]
+
+    def test_invalid_cursor(self, api):
+        client, headers = api
+        r = client.get("/api/expenses/installments?cursor=nao-e-um-cursor", headers=headers)
+        assert r.status_code == 400
+        assert client.get("/api/expenses/installments?limit=0", headers=headers).status_code == 422
+
+    def test_patch_into_installment_creates_plan(self, api, api_db):
+        client, headers = api
+        r = client.post("/api/expenses/2026/3", headers=headers, json={
+            "nome": "Dentista", "valor": 150.0, "vencimento": "2026-03-10", "recorrente": False,
+        })
+        expense_id = r.json()["id"]
+        r = client.patch(f"/api/expenses/{expense_id}", headers=headers,
+                         json={"parcela_atual": 1, "parcela_total": 4})
+        assert r.json()["plan_id"]
+
+        summary = client.get("/api/expenses/installments?summary=true", headers=headers).json()
+        assert [(g["nome"], g["quantidade"]) for g in summary["groups"]] == [("Dentista", 1)]
+
+
+class TestBulkPurchaseCreation:
+    """Criacao de compras parceladas com INSERT em lote (POST e POST /bulk)."""
+
+    def test_rows_match_month_arithmetic(self, api, api_db):
+        client, headers = api
+        r = client.post("/api/expenses/2026/1", headers=headers, json={
+            "nome": "Sofa", "valor": 199.9, "vencimento": "2026-01-31",
+            "parcela_atual": 2, "parcela_total": 14, "recorrente": False,
+        })
+        assert r.status_code == 201
+        assert r.json()["parcela_atual"] == 2
+
+        with api_db() as s:
+            rows = s.scalars(select(Expense).order_by(Expense.parcela_atual)).all()
+        assert [e.parcela_atual for e in rows] == list(range(2, 15))
+        for offset, e in enumerate(rows):
+            assert e.mes_referencia == add_months(date(2026, 1, 1), offset)
+            assert e.vencimento == add_months(date(2026, 1, 31), offset)
+            assert e.status == ExpenseStatus.PENDENTE.value
+        assert rows[0].vencimento == date(2026, 1, 31) and rows[1].vencimento == date(2026, 2, 28)
+        assert not any(e.recorrente for e in rows[1:])
+
+    def test_statement_count_independent_of_parcela_total(self, api):
+        client, headers = api
+
+        def _count(parcela_total, year):
+            r = client.post(f"/api/expenses/{year}/3", headers=headers, json={
+                "nome": f"Compra {parcela_total}x", "valor": 100.0, "vencimento": f"{year}-03-10",
+                "parcela_atual": 1, "parcela_total": parcela_total, "recorrente": False,
+            })
+            assert r.status_code == 201
+            return int(r.headers[HEADER_NAME])
+
+        # Anos diferentes: nenhum watermark existente em comum entre as duas compras
+        assert _count(3, 2026) == _count(48, 2027)
+
+    def test_bulk_endpoint_single_transaction(self, api, api_db):
+        client, headers = api
+        r = client.post("/api/expenses/2026/3/bulk", headers=headers, json={"despesas": [
+            {"nome": "TV", "valor": 300.0, "vencimento": "2026-03-10",
+             "parcela_atual": 1, "parcela_total": 10, "recorrente": False},
+            {"nome": "Mercado", "valor": 420.5, "vencimento": "2026-03-12", "recorrente": False,
+             "subcategoria": "Supermercado"},
+            {"nome": "Fone", "valor": 80.0, "vencimento": "2026-03-15",
+             "parcela_atual": 3, "parcela_total": 4, "recorrente": False},
+        ]})
+        assert r.status_code == 201, r.text
+        created = r.json()
+        assert [e["nome"] for e in created] == ["TV", "Mercado", "Fone"]
+        assert created[1]["plan_id"] is None and created[1]["categoria"] == "Alimentação"
+
+        with api_db() as s:
+            assert verify_rollup(s) == []
+            tv = s.get(InstallmentPlan, created[0]["plan_id"])
+            fone = s.get(InstallmentPlan, created[2]["plan_id"])
+            assert (tv.quantidade, float(tv.valor_pendente)) == (10, 3000.0)
+            assert (fone.quantidade, fone.primeiro_vencimento) == (2, date(2026, 1, 15))
+
+        # Meses seguintes ja tem as parcelas: a materializacao nao duplica
+        april = client.get("/api/months/2026/4", headers=headers).json()
+        assert sorted(e["nome"] for e in april["expenses"]) == ["Fone", "TV"]
+
+    def test_bulk_endpoint_rejects_invalid_item_atomically(self, api, api_db):
+        client, headers = api
+        r = client.post("/api/expenses/2026/3/bulk", headers=headers, json={"despesas": [
+            {"nome": "TV", "valor": 300.0, "vencimento": "2026-03-10",
+             "parcela_atual": 1, "parcela_total": 10, "recorrente": False},
+            {"nome": "Mercado", "valor": 42.0, "vencimento": "2026-03-12", "subcategoria": "Nao existe"},
+        ]})
+        assert r.status_code == 422
+        with api_db() as s:
+            assert s.scalars(select(Expense)).all() == []
+
+
+class TestSeriesDeletion:
+    """Exclusao em serie (CR-009) com DELETE set-based."""
+
+    def test_installment_series_single_delete(self, api, api_db):
+        client, headers = api
+
+        def _delete_count(parcela_total):
+            created = _post_installment(client, headers, nome=f"Compra {parcela_total}x",
+                                        parcela_total=parcela_total)
+            r = client.delete(f"/api/expenses/{created['id']}?delete_all=true", headers=headers)
+            assert r.status_code == 204
+            return created["plan_id"], int(r.headers[HEADER_NAME])
+
+        plan_small, small = _delete_count(3)
+        plan_large, large = _delete_count(24)
+        assert small == large
+
+        with api_db() as s:
+            assert s.scalars(select(Expense)).all() == []
+            assert s.get(InstallmentPlan, plan_large).quantidade == 0
+            assert verify_rollup(s) == []
+        assert client.get("/api/expenses/installments", headers=headers).json()["groups"] == []
+
+    def test_returns_rowcount(self, db, test_user):
+        plan = crud.add_installment_plan(db, test_user.id, "Cadeira", 90, 4, 1, date(2026, 1, 5))
+        for parcela in range(1, 5):
+            db.add(Expense(
+                user_id=test_user.id, mes_referencia=date(2026, parcela, 1), nome="Cadeira",
+                valor=90, vencimento=date(2026, parcela, 5), parcela_atual=parcela,
+                parcela_total=4, recorrente=False, plan_id=plan.id,
+            ))
+        db.commit()
+        target = db.scalars(select(Expense).where(Expense.parcela_atual == 2)).one()
+
+        assert crud.delete_expense_related(db, target) == 4
+
+    def test_recurring_forward_keeps_previous_months(self, api, api_db):
+        client, headers = api
+        r = client.post("/api/expenses/2026/1", headers=headers, json={
+            "nome": "Streaming", "valor": 39.9, "vencimento": "2026-01-12", "recorrente": True,
+        })
+        assert r.status_code == 201
+        for month in (2, 3, 4):
+            client.get(f"/api/months/2026/{month}", headers=headers)
+        march = next(
+            e for e in client.get("/api/months/2026/3", headers=headers).json()["expenses"]
+            if e["nome"] == "Streaming"
+        )
+
+        r = client.delete(f"/api/expenses/{march['id']}?delete_all=true&forward=true", headers=headers)
+        assert r.status_code == 204
+
+        def _nomes(month):
+            data = client.get(f"/api/months/2026/{month}", headers=headers).json()
+            return [(e["nome"], e["recorrente"]) for e in data["expenses"]]
+
+        assert _nomes(1) == [("Streaming", True)]
+        assert _nomes(2) == [("Streaming", False)]
+        assert _nomes(3) == _nomes(4) == _nomes(5) == []
+        with api_db() as s:
+            assert verify_rollup(s) == []
+
+    def test_delete_all_after_forward_removes_whole_series(self, api, api_db):
+        client, headers = api
+        client.post("/api/expenses/2026/1", headers=headers, json={
+            "nome": "Netflix", "valor": 55.9, "vencimento": "2026-01-12", "recorrente": True,
+        })
+        client.post("/api/expenses/2026/2", headers=headers, json={
+            "nome": "Netflix", "valor": 19.9, "vencimento": "2026-02-20", "recorrente": False,
+        })  # avulsa homonima: fora da serie
+        for month in (2, 3, 4):
+            client.get(f"/api/months/2026/{month}", headers=headers)
+
+        def _netflix(month):
+            return [e for e in client.get(f"/api/months/2026/{month}", headers=headers).json()["expenses"]
+                    if e["nome"] == "Netflix"]
+
+        r = client.delete(f"/api/expenses/{_netflix(3)[0]['id']}?delete_all=true&forward=true", headers=headers)
+        assert r.status_code == 204
+        january = _netflix(1)[0]
+        r = client.delete(f"/api/expenses/{january['id']}?delete_all=true", headers=headers)
+        assert r.status_code == 204
+
+        assert _netflix(1) == []
+        assert [e["valor"] for e in _netflix(2)] == [19.9]
+        assert _netflix(3) == _netflix(4) == []
+
+    def test_forward_rejected_for_installments(self, api):
+        client, headers = api
+        created = _post_installment(client, headers)
+        r = client.delete(f"/api/expenses/{created['id']}?delete_all=true&forward=true", headers=headers)
+        assert r.status_code == 400
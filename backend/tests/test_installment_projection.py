@@ -530,3 +530,63 @@ class TestInstallmentProjection:
         # Nao aparece (concluida antes de Mar)
         assert len(result["parcelas"]) == 0
         assert result["total_comprometido_mes_atual"] == 0.0
+
+
+class TestSweepLineProjection:
+    """project_installment_months: sweep-line equivalente ao laco mes a mes."""
+
+    @staticmethod
+    def _naive(parcelas_info, mes_atual, months):
+        from app.utils import add_months
+
+        pontos = []
+        for offset in range(months):
+            mes = add_months(mes_atual, offset)
+            ativas = [p for p in parcelas_info if p["mes_inicio"] <= mes <= p["mes_termino"]]
+            pontos.append((
+                mes,
+                round(sum(p["valor_mensal"] for p in ativas), 2),
+                len(ativas),
+                [p["nome"] for p in ativas if p["mes_termino"] == mes],
+            ))
+        return pontos
+
+    def test_matches_naive_projection_on_random_plans(self):
+        import random
+        from app.services import project_installment_months
+        from app.utils import add_months
+
+        rng = random.Random(17)
+        mes_atual = date(2026, 3, 1)
+        parcelas_info = []
+        for i in range(200):
+            inicio = add_months(mes_atual, rng.randint(-3, 30))
+            parcelas_info.append({
+                "nome": f"Plano {i}",
+                "valor_mensal": round(rng.uniform(10, 2000), 2),
+                "mes_inicio": inicio,
+                "mes_termino": add_months(inicio, rng.randint(0, 96)),
+            })
+
+        result = project_installment_months(parcelas_info, mes_atual, 120, renda_atual=10000.0)
+
+        assert len(result) == 120
+        assert result[-1]["mes"] == date(2036, 2, 1)
+        got = [
+            (p["mes"], p["total_comprometido"], p["parcelas_ativas"], p["parcelas_encerrando"])
+            for p in result
+        ]
+        assert got == self._naive(parcelas_info, mes_atual, 120)
+        for prev, curr in zip(result, result[1:]):
+            assert curr["valor_liberado"] == round(prev["total_comprometido"] - curr["total_comprometido"], 2)
+
+    @patch("app.services.date")
+    def test_long_horizon_endpoint_service(self, mock_date, db, test_user, multiple_installments):
+        mock_date.today.return_value = date(2026, 3, 14)
+        mock_date.side_effect = lambda *a, **kw: date(*a, **kw)
+
+        result = get_installment_projection(db, test_user.id, months=120)
+
+        assert len(result["projecao_mensal"]) == 120
+        assert result["projecao_mensal"][-1]["total_comprometido"] == 0.0
+        assert sum(len(p["parcelas_encerrando"]) for p in result["projecao_mensal"]) == 3
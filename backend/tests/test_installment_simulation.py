@@ -0,0 +1,106 @@
+"""
+Simulador what-if de compras parceladas (POST /api/expenses/installments/projection/simulate):
+resultado igual ao de cadastrar a compra, linha de base em memoria ate a
+proxima escrita do usuario.
+"""
+from datetime import date
+
+import pytest
+
+from app.models import Expense, ExpenseStatus, Income
+from app.query_counter import HEADER_NAME
+from app.utils import add_months
+
+SIMULATE = "/api/expenses/installments/projection/simulate"
+MES_ATUAL = date(date.today().year, date.today().month, 1)
+
+
+@pytest.fixture(autouse=True)
+def projection_data(api_db, api_user):
+    with api_db() as session:
+        session.add(Income(user_id=api_user.id, mes_referencia=MES_ATUAL, nome="Salario",
+                           valor=6000.00, data=MES_ATUAL, recorrente=True))
+        for parcela in range(1, 7):
+            mes = add_months(MES_ATUAL, parcela - 3)
+            session.add(Expense(
+                user_id=api_user.id, mes_referencia=mes, nome="Sofa", valor=250.00,
+                vencimento=date(mes.year, mes.month, 10), parcela_atual=parcela, parcela_total=6,
+                recorrente=False,
+                status=ExpenseStatus.PAGO.value if mes < MES_ATUAL else ExpenseStatus.PENDENTE.value,
+            ))
+        session.commit()
+
+
+def _simulate(client, headers, **plano):
+    body = {"planos": [{"nome": "Notebook", "valor_mensal": 450.0, "parcela_total": 12, **plano}]}
+    r = client.post(SIMULATE, headers=headers, json=body)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+class TestInstallmentSimulation:
+    def test_matches_projection_after_purchase(self, api):
+        client, headers = api
+        simulado = _simulate(client, headers)
+
+        inicio = add_months(MES_ATUAL, 1)
+        r = client.post(f"/api/expenses/{inicio.year}/{inicio.month}", headers=headers, json={
+            "nome": "Notebook", "valor": 450.0, "vencimento": date(inicio.year, inicio.month, 15).isoformat(),
+            "parcela_atual": 1, "parcela_total": 12, "recorrente": False,
+        })
+        assert r.status_code == 201, r.text
+        real = client.get("/api/expenses/installments/projection", headers=headers).json()
+
+        projecao = simulado["projecao"]
+        assert projecao["projecao_mensal"] == real["projecao_mensal"]
+        for kpi in ("total_comprometido_mes_atual", "total_restante_todas_parcelas",
+                    "qtd_parcelas_ativas", "proxima_a_encerrar", "liberacao_proximos_3_meses"):
+            assert projecao[kpi] == real[kpi]
+        score = client.get("/api/score", headers=headers).json()["score"]
+        assert simulado["score"]["score_simulado"] == score["total"]
+
+    def test_monthly_delta(self, api):
+        client, headers = api
+        result = _simulate(client, headers)
+
+        variacao = result["variacao_mensal"]
+        assert len(variacao) == 12
+        assert variacao[0] == {"mes": MES_ATUAL.isoformat(), "total_comprometido": 0.0,
+                               "percentual_comprometimento": 0.0}
+        assert all(v["total_comprometido"] == 450.0 for v in variacao[1:])
+        assert variacao[1]["percentual_comprometimento"] == 7.5
+
+    def test_plan_starting_this_month_affects_score(self, api):
+        client, headers = api
+        result = _simulate(client, headers, valor_mensal=3000.0, mes_inicio=MES_ATUAL.isoformat())
+
+        assert result["variacao_mensal"][0]["total_comprometido"] == 3000.0
+        assert result["score"]["variacao"] < 0
+
+    def test_baseline_cached_until_next_write(self, api):
+        client, headers = api
+        client.post(SIMULATE, headers=headers, json={"planos": [{"valor_mensal": 100.0, "parcela_total": 3}]})
+        warm = client.post(SIMULATE, headers=headers, json={"planos": [{"valor_mensal": 999.0, "parcela_total": 24}]})
+        assert warm.status_code == 200
+        assert int(warm.headers[HEADER_NAME]) <= 1  # apenas o usuario da autenticacao
+
+        r = client.post(f"/api/expenses/{MES_ATUAL.year}/{MES_ATUAL.month}", headers=headers, json={
+            "nome": "Academia", "valor": 120.0, "vencimento": MES_ATUAL.isoformat(),
+            "parcela_atual": 1, "parcela_total": 2, "recorrente": False,
+        })
+        assert r.status_code == 201
+        result = _simulate(client, headers)
+        assert "Academia" in [p["nome"] for p in result["projecao"]["parcelas"]]
+
+    def test_rejects_past_start_and_single_installment(self, api):
+        client, headers = api
+        passado = add_months(MES_ATUAL, -1).isoformat()
+        r = client.post(SIMULATE, headers=headers, json={
+            "planos": [{"valor_mensal": 100.0, "parcela_total": 3, "mes_inicio": passado}],
+        })
+        assert r.status_code == 400
+
+        r = client.post(SIMULATE, headers=headers, json={"planos": [{"valor_mensal": 100.0, "parcela_total": 1}]})
+        assert r.status_code == 422
+        r = client.post(SIMULATE, headers=headers, json={"planos": []})
+        assert r.status_code == 422
@@ -0,0 +1,61 @@
+"""Migracoes Alembic com dados pre-existentes (backfills)."""
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+
+import app.database
+
+ALEMBIC_DIR = Path(__file__).resolve().parents[1] / "alembic"
+
+
+@pytest.fixture
+def migrate(tmp_path, monkeypatch):
+    """Roda 'alembic upgrade <revision>' contra um SQLite temporario; retorna o engine."""
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    # env.py le a URL de app.database a cada execucao
+    monkeypatch.setattr(app.database, "DATABASE_URL", url)
+    config = Config()  # sem arquivo .ini: nao reconfigura o logging dos testes
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    engine = create_engine(url)
+
+    def upgrade(revision: str):
+        command.upgrade(config, revision)
+        return engine
+
+    yield upgrade
+    engine.dispose()
+
+
+def test_rollup_backfill_merges_null_and_empty_values(migrate):
+    engine = migrate("011")
+    expenses = [("e1", 100, None), ("e2", 50, ""), ("e3", 30, "Moradia")]
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, nome, email) VALUES ('u1', 'User', 'u1@example.com')"))
+        for id_, valor, categoria in expenses:
+            conn.execute(text(
+                "INSERT INTO expenses (id, user_id, mes_referencia, nome, valor, vencimento, status, categoria) "
+                "VALUES (:id, 'u1', '2026-01-01', :id, :valor, '2026-01-10', 'Pago', :categoria)"
+            ), {"id": id_, "valor": valor, "categoria": categoria})
+        for id_ in ("d1", "d2"):
+            conn.execute(text(
+                "INSERT INTO daily_expenses (id, user_id, mes_referencia, descricao, valor, data, categoria, "
+                "subcategoria, metodo_pagamento, created_at, updated_at) VALUES (:id, 'u1', '2026-01-01', "
+                "'Mercado', 20, '2026-01-03', '', '', 'Pix', '2026-01-03', '2026-01-03')"
+            ), {"id": id_})
+
+    migrate("012")
+    with engine.connect() as conn:
+        rows = {
+            (tipo, status, categoria): (float(total), quantidade)
+            for tipo, status, categoria, total, quantidade in conn.execute(text(
+                "SELECT tipo, status, categoria, total, quantidade FROM monthly_rollup"
+            ))
+        }
+    assert rows == {
+        ("despesa", "Pago", ""): (150.0, 2),
+        ("despesa", "Pago", "Moradia"): (30.0, 1),
+        ("gasto_diario", "", ""): (40.0, 2),
+    }
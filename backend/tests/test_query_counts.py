@@ -0,0 +1,164 @@
+"""
+Orcamento de comandos SQL por requisicao (header X-SQL-Statement-Count).
+
+Garante que /api/months, /api/dashboard e /api/score nao fazem N+1 nem
+recarregam linhas apos commit: o numero de comandos nao cresce com a
+quantidade de despesas do mes.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.testclient import TestClient
+
+from app.auth import create_access_token
+from app.database import Base, SessionLocal, get_db
+from app.main import app
+from app.models import DailyExpense, Expense, ExpenseStatus, Income, User
+from app.query_counter import HEADER_NAME
+
+
+def _seed(session, n_expenses: int) -> str:
+    user = User(nome="Budget", email="budget@example.com", password_hash="x", email_verified=True)
+    session.add(user)
+    session.flush()
+    today = date.today()
+    mes = date(today.year, today.month, 1)
+    for i in range(n_expenses):
+        session.add(Expense(
+            user_id=user.id,
+            mes_referencia=mes,
+            nome=f"Despesa {i}",
+            valor=10.00,
+            vencimento=date(mes.year, mes.month, 1 + i % 28),
+            parcela_atual=1 if i % 3 == 0 else None,
+            parcela_total=6 if i % 3 == 0 else None,
+            recorrente=i % 3 != 0,
+            status=ExpenseStatus.PENDENTE.value,
+        ))
+        session.add(DailyExpense(
+            user_id=user.id,
+            mes_referencia=mes,
+            descricao=f"Gasto {i}",
+            valor=5.00,
+            data=date(mes.year, mes.month, 1 + i % 28),
+            categoria="Alimentação",
+            subcategoria="Restaurante",
+            metodo_pagamento="Pix",
+        ))
+    session.add(Income(user_id=user.id, mes_referencia=mes, nome="Salario",
+                       valor=5000.00, data=date(mes.year, mes.month, 5), recorrente=True))
+    session.commit()
+    return user.id
+
+
+def _make_client(n_expenses: int):
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    TestingSession = sessionmaker(**{**SessionLocal.kw, "bind": engine})
+
+    with TestingSession() as session:
+        user_id = _seed(session, n_expenses)
+
+    def _override():
+        s = TestingSession()
+        try:
+            yield s
+        finally:
+            s.close()
+
+    app.dependency_overrides[get_db] = _override
+    token = create_access_token({"sub": user_id})
+    return TestClient(app), {"Authorization": f"Bearer {token}"}
+
+
+def _statement_count(n_expenses: int, path: str) -> int:
+    client, headers = _make_client(n_expenses)
+    try:
+        first = client.get(path, headers=headers)
+        assert first.status_code == 200, first.text
+        warm = client.get(path, headers=headers)
+        assert warm.status_code == 200
+        return int(warm.headers[HEADER_NAME])
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+
+def _current_month_path(prefix: str) -> str:
+    today = date.today()
+    return f"{prefix}/{today.year}/{today.month}"
+
+
+@pytest.mark.parametrize("path", [
+    _current_month_path("/api/months"),
+    _current_month_path("/api/dashboard"),
+    "/api/score",
+])
+def test_statement_count_independent_of_row_count(path):
+    small = _statement_count(3, path)
+    large = _statement_count(30, path)
+    assert small == large, f"{path}: {small} comandos com 3 despesas, {large} com 30"
+
+
+def test_months_warm_read_budget():
+    """Leitura repetida do mes: watermark, usuario e os SELECTs do mes, sem escritas."""
+    assert _statement_count(10, _current_month_path("/api/months")) <= 5
+
+
+def test_months_summary_only_skips_row_fetch():
+    full = _statement_count(10, _current_month_path("/api/months"))
+    totals = _statement_count(10, _current_month_path("/api/months") + "?summary=true")
+    assert totals < full
+
+
+def test_months_range_constant_in_width():
+    today = date.today()
+    start = f"{today.year}-{today.month:02d}"
+
+    def count(n_months: int) -> int:
+        end_year, end_month = divmod(today.month - 1 + n_months - 1, 12)
+        end = f"{today.year + end_year}-{end_month + 1:02d}"
+        return _statement_count(5, f"/api/months/range?from={start}&to={end}")
+
+    assert count(2) == count(12)
+
+
+def test_months_range_validation():
+    client, headers = _make_client(1)
+    try:
+        assert client.get("/api/months/range?from=2026-05&to=2026-01", headers=headers).status_code == 400
+        assert client.get("/api/months/range?from=2026-01&to=2028-01", headers=headers).status_code == 400
+        assert client.get("/api/months/range?from=2026-13&to=2027-01", headers=headers).status_code == 422
+        r = client.get("/api/months/range?from=2026-01&to=2026-03", headers=headers)
+        assert r.status_code == 200
+        assert [m["mes_referencia"] for m in r.json()["meses"]] == ["2026-01-01", "2026-02-01", "2026-03-01"]
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+
+def test_dashboard_evolution_window_constant():
+    path = _current_month_path("/api/dashboard")
+    assert _statement_count(5, path + "?months=6") == _statement_count(5, path + "?months=36")
+
+
+def test_dashboard_category_drilldown():
+    client, headers = _make_client(4)
+    try:
+        path = _current_month_path("/api/dashboard") + "/categories/Alimentação?tipo=diarios"
+        r = client.get(path, headers=headers)
+        assert r.status_code == 200, r.text
+        body = r.json()
+        assert body["total"] == 20.00
+        assert body["count"] == 4
+        assert body["subcategorias"] == [
+            {"subcategoria": "Restaurante", "total": 20.00, "percentual": 100.0, "count": 4},
+        ]
+        assert client.get(path.replace("diarios", "outro"), headers=headers).status_code == 422
+    finally:
+        app.dependency_overrides.pop(get_db, None)
@@ -0,0 +1,343 @@
+"""
+Regressao de plano de execucao das funcoes de crud.py.
+
+Cada funcao publica de crud roda contra um banco SQLite semeado; todo SELECT,
+UPDATE e DELETE que ela emite passa por EXPLAIN QUERY PLAN. O teste falha se
+algum comando percorrer uma tabela inteira ("SCAN <tabela>", com ou sem
+indice: varrer um indice inteiro tambem e O(linhas)).
+Sem ANALYZE o SQLite estima tabelas grandes, entao a escolha de indice e
+estrutural e nao depende do volume semeado.
+"""
+import inspect
+import re
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.database import Base, SessionLocal
+from app.models import (
+    AlertaEstado, AnaliseFinanceira, DailyExpense, Expense, ExpenseStatus, Income,
+    RefreshToken, RollupTipo, ScoreHistorico, User,
+)
+from app.utils import add_months
+
+MES = date(2026, 3, 1)
+TODAY = date(2026, 3, 14)
+
+# Funcoes sem SELECT/UPDATE/DELETE (montam linhas em memoria ou so fazem INSERT,
+# inclusive INSERT ... ON CONFLICT na chave primaria)
+NO_QUERY = {
+    "installment_plan_row", "add_installment_plan",
+    "bulk_insert_expenses", "bulk_insert_incomes", "bulk_insert_installment_plans",
+    "upsert_score_cache",
+}
+
+# Varreduras completas intencionais: a funcao atualiza todas as linhas da tabela
+FULL_SCAN_ALLOWED = {"set_status_sweep_date_all_users"}
+
+_TABLES = set(Base.metadata.tables)
+_FULL_SCAN = re.compile(r"^SCAN (\w+)\b")
+
+
+@pytest.fixture
+def seeded():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(**{**SessionLocal.kw, "bind": engine})
+    db = Session()
+    users = []
+    for u in range(3):
+        user = User(id=f"user-plan-{u}", nome=f"Plano {u}", email=f"plano{u}@example.com",
+                    password_hash="x", email_verified=True, google_id=f"g-{u}")
+        db.add(user)
+        users.append(user)
+    db.flush()
+    for user in users:
+        plan = crud.add_installment_plan(db, user.id, "Notebook", 250, 12, 1, date(2025, 10, 10))
+        for offset in range(12):
+            mes = add_months(date(2025, 10, 1), offset)
+            db.add(Expense(
+                user_id=user.id, mes_referencia=mes, nome="Notebook", valor=250,
+                vencimento=date(mes.year, mes.month, 10), parcela_atual=offset + 1, parcela_total=12,
+                recorrente=False, plan_id=plan.id,
+                status=ExpenseStatus.PAGO.value if mes < MES else ExpenseStatus.PENDENTE.value,
+            ))
+            db.add(Expense(
+                user_id=user.id, mes_referencia=mes, nome="Aluguel", valor=1500,
+                vencimento=date(mes.year, mes.month, 5), recorrente=True, categoria="Moradia",
+                subcategoria="Aluguel", status=ExpenseStatus.PENDENTE.value,
+            ))
+            db.add(Income(user_id=user.id, mes_referencia=mes, nome="Salario", valor=6000,
+                          data=date(mes.year, mes.month, 5), recorrente=True))
+            db.add(DailyExpense(
+                user_id=user.id, mes_referencia=mes, descricao="Mercado", valor=80,
+                data=date(mes.year, mes.month, 3), categoria="Alimentação",
+                subcategoria="Supermercado", metodo_pagamento="Pix",
+            ))
+        db.add(RefreshToken(user_id=user.id, token_hash=f"hash-{user.id}",
+                            expires_at=date(2030, 1, 1)))
+        db.add(ScoreHistorico(user_id=user.id, mes_referencia=MES, score_total=70,
+                              d1_comprometimento=20, d2_parcelas=15, d3_poupanca=15,
+                              d4_comportamento=20, classificacao="Bom", dados_snapshot="{}"))
+        db.add(_analise(user, "mensal"))
+    db.commit()
+    db.connection().exec_driver_sql("ANALYZE")  # estatisticas como em producao
+    yield db, users[0]
+    db.close()
+
+
+def _analise(user, tipo: str) -> AnaliseFinanceira:
+    return AnaliseFinanceira(user_id=user.id, mes_referencia=MES, tipo=tipo, score_referencia=70,
+                             dados_input="{}", resultado="{}", modelo="teste")
+
+
+def _alerta_data(**overrides) -> dict:
+    return {
+        "alerta_tipo": "A6", "alerta_referencia": "Notebook", "mes_referencia": MES,
+        "titulo": "Nova parcela", "descricao": None, "severidade": "info",
+        "contexto_aba": "parcelas", **overrides,
+    }
+
+
+def _expense(user, **overrides) -> Expense:
+    return Expense(**{
+        "user_id": user.id, "mes_referencia": MES, "nome": "Jantar", "valor": 90,
+        "vencimento": date(2026, 3, 20), "recorrente": False, **overrides,
+    })
+
+
+def _target(db, user, nome):
+    return db.query(Expense).filter_by(user_id=user.id, nome=nome, mes_referencia=MES).one()
+
+
+CASES = {
+    "get_expenses_by_month": lambda db, u: crud.get_expenses_by_month(db, MES, u.id),
+    "get_expenses_by_month_range": lambda db, u: crud.get_expenses_by_month_range(db, date(2026, 1, 1), MES, u.id),
+    "get_expense_by_id": lambda db, u: crud.get_expense_by_id(db, _target(db, u, "Aluguel").id, u.id),
+    "get_expenses_by_ids": lambda db, u: crud.get_expenses_by_ids(db, [_target(db, u, "Aluguel").id], u.id),
+    "create_expense": lambda db, u: crud.create_expense(db, _expense(u)),
+    "update_expense": lambda db, u: crud.update_expense(db, _target(db, u, "Aluguel")),
+    "delete_expense": lambda db, u: crud.delete_expense(db, crud.create_expense(db, _expense(u))),
+    "get_expense_series_footprint": lambda db, u: crud.get_expense_series_footprint(db, _target(db, u, "Notebook")),
+    "delete_expense_related": lambda db, u: crud.delete_expense_related(db, _target(db, u, "Notebook")),
+    "end_expense_recurrence": lambda db, u: crud.end_expense_recurrence(db, _target(db, u, "Aluguel"), MES),
+    "count_expenses_by_month": lambda db, u: crud.count_expenses_by_month(db, MES, u.id),
+    "expense_replica_exists": lambda db, u: crud.expense_replica_exists(db, MES, u.id, "origem"),
+    "expense_installment_exists": lambda db, u: crud.expense_installment_exists(db, MES, u.id, "Notebook", 6, 12),
+    "get_expense_replication_sources": lambda db, u: crud.get_expense_replication_sources(db, MES, u.id),
+    "get_last_populated_month": lambda db, u: crud.get_last_populated_month(db, u.id, MES),
+    "get_expense_replica_keys": lambda db, u: crud.get_expense_replica_keys(db, MES, u.id),
+    "bulk_insert_expenses": lambda db, u: crud.bulk_insert_expenses(db, [{
+        "id": "bulk-1", "user_id": u.id, "mes_referencia": MES, "nome": "Bulk", "valor": 1,
+        "vencimento": MES, "recorrente": False, "status": ExpenseStatus.PENDENTE.value,
+    }]),
+    "get_overdue_pending_months": lambda db, u: (
+        crud.get_overdue_pending_months(db, u.id, TODAY),
+        crud.get_overdue_pending_months(db, None, TODAY),
+    ),
+    "get_overdue_pending_plan_ids": lambda db, u: (
+        crud.get_overdue_pending_plan_ids(db, u.id, TODAY),
+        crud.get_overdue_pending_plan_ids(db, None, TODAY),
+    ),
+    "mark_overdue_expenses": lambda db, u: (
+        crud.mark_overdue_expenses(db, u.id, TODAY),
+        crud.mark_overdue_expenses(db, None, TODAY),
+    ),
+    "get_incomes_by_month": lambda db, u: crud.get_incomes_by_month(db, MES, u.id),
+    "get_incomes_by_month_range": lambda db, u: crud.get_incomes_by_month_range(db, date(2026, 1, 1), MES, u.id),
+    "get_income_by_id": lambda db, u: crud.get_income_by_id(db, "income-id", u.id),
+    "create_income": lambda db, u: crud.create_income(db, Income(
+        user_id=u.id, mes_referencia=MES, nome="Freela", valor=500, recorrente=False)),
+    "update_income": lambda db, u: crud.update_income(db, crud.get_incomes_by_month(db, MES, u.id)[0]),
+    "delete_income": lambda db, u: crud.delete_income(db, crud.get_incomes_by_month(db, MES, u.id)[0]),
+    "income_replica_exists": lambda db, u: crud.income_replica_exists(db, MES, u.id, "origem"),
+    "get_income_replication_sources": lambda db, u: crud.get_income_replication_sources(db, MES, u.id),
+    "get_income_replica_origins": lambda db, u: crud.get_income_replica_origins(db, MES, u.id),
+    "bulk_insert_incomes": lambda db, u: crud.bulk_insert_incomes(db, [{
+        "id": "bulk-inc-1", "user_id": u.id, "mes_referencia": MES, "nome": "Bulk", "valor": 1,
+        "recorrente": False,
+    }]),
+    "get_month_states": lambda db, u: crud.get_month_states(db, u.id, [MES]),
+    "ensure_month_states": lambda db, u: crud.ensure_month_states(db, u.id, [date(2027, 1, 1)], {}),
+    "lock_user_materialization": lambda db, u: crud.lock_user_materialization(db, u.id),
+    "get_daily_expenses_by_month": lambda db, u: crud.get_daily_expenses_by_month(db, MES, u.id),
+    "get_daily_expenses_by_month_range": lambda db, u: crud.get_daily_expenses_by_month_range(
+        db, date(2026, 1, 1), MES, u.id),
+    "get_daily_expense_by_id": lambda db, u: crud.get_daily_expense_by_id(db, "daily-id", u.id),
+    "create_daily_expense": lambda db, u: crud.create_daily_expense(db, DailyExpense(
+        user_id=u.id, mes_referencia=MES, descricao="Cafe", valor=8, data=date(2026, 3, 2),
+        categoria="Alimentação", subcategoria="Restaurante", metodo_pagamento="Pix")),
+    "update_daily_expense": lambda db, u: crud.update_daily_expense(db, crud.get_daily_expenses_by_month(db, MES, u.id)[0]),
+    "delete_daily_expense": lambda db, u: crud.delete_daily_expense(db, crud.get_daily_expenses_by_month(db, MES, u.id)[0]),
+    "get_user_by_email": lambda db, u: crud.get_user_by_email(db, u.email),
+    "get_user_by_id": lambda db, u: crud.get_user_by_id(db, "user-plan-2"),
+    "get_user_ids_chunk": lambda db, u: crud.get_user_ids_chunk(db, u.id, 10),
+    "set_status_sweep_date_all_users": lambda db, u: crud.set_status_sweep_date_all_users(db, TODAY),
+    "get_user_by_google_id": lambda db, u: crud.get_user_by_google_id(db, "g-1"),
+    "create_user": lambda db, u: crud.create_user(db, User(
+        nome="Novo", email="novo@example.com", password_hash="x", email_verified=True)),
+    "update_user": lambda db, u: crud.update_user(db, crud.get_user_by_id(db, u.id)),
+    "create_refresh_token": lambda db, u: crud.create_refresh_token(db, RefreshToken(
+        user_id=u.id, token_hash="novo-hash", expires_at=date(2030, 1, 1))),
+    "get_refresh_token_by_hash": lambda db, u: crud.get_refresh_token_by_hash(db, f"hash-{u.id}"),
+    "delete_refresh_token": lambda db, u: crud.delete_refresh_token(db, crud.get_refresh_token_by_hash(db, f"hash-{u.id}")),
+    "delete_user_refresh_tokens": lambda db, u: crud.delete_user_refresh_tokens(db, u.id),
+    "get_expense_total_by_month": lambda db, u: crud.get_expense_total_by_month(db, MES, u.id),
+    "get_expense_totals_by_status": lambda db, u: crud.get_expense_totals_by_status(db, MES, u.id),
+    "get_income_sum_by_month": lambda db, u: crud.get_income_sum_by_month(db, MES, u.id),
+    "get_income_total_by_month": lambda db, u: crud.get_income_total_by_month(db, MES, u.id),
+    "get_monthly_totals_series": lambda db, u: crud.get_monthly_totals_series(db, u.id, date(2025, 10, 1), MES),
+    "get_daily_expense_total_by_month": lambda db, u: crud.get_daily_expense_total_by_month(db, MES, u.id),
+    "get_category_totals": lambda db, u: (
+        crud.get_category_totals(db, "planejadas", MES, u.id),
+        crud.get_category_totals(db, "diarios", MES, u.id, categoria="Alimentação"),
+    ),
+    "aggregate_monthly_rollup": lambda db, u: crud.aggregate_monthly_rollup(db, u.id, [MES]),
+    "refresh_monthly_rollup": lambda db, u: crud.refresh_monthly_rollup(db, u.id, [MES]),
+    "get_monthly_rollup_rows": lambda db, u: crud.get_monthly_rollup_rows(db, u.id),
+    "installment_plan_row": lambda db, u: crud.installment_plan_row(u.id, "TV", 100, 10, 1, MES),
+    "add_installment_plan": lambda db, u: (crud.add_installment_plan(db, u.id, "TV", 100, 10, 1, MES), db.flush()),
+    "bulk_insert_installment_plans": lambda db, u: crud.bulk_insert_installment_plans(
+        db, [crud.installment_plan_row(u.id, "TV", 100, 10, 1, MES)]),
+    "refresh_installment_plans": lambda db, u: crud.refresh_installment_plans(
+        db, {_target(db, u, "Notebook").plan_id}),
+    "get_installment_expenses_grouped": lambda db, u: crud.get_installment_expenses_grouped(db, u.id),
+    "get_installment_groups_page": lambda db, u: (
+        crud.get_installment_groups_page(db, u.id, limit=5),
+        crud.get_installment_groups_page(db, u.id, status="Em andamento", include_installments=False),
+    ),
+    "get_installment_plan_totals": lambda db, u: crud.get_installment_plan_totals(db, u.id, "Em andamento"),
+    "get_installment_remaining_total": lambda db, u: crud.get_installment_remaining_total(db, u.id),
+    "upsert_score_historico": lambda db, u: crud.upsert_score_historico(db, u.id, MES, {
+        "score_total": 71, "d1_comprometimento": 20, "d2_parcelas": 16, "d3_poupanca": 15,
+        "d4_comportamento": 20, "classificacao": "Bom",
+    }),
+    "get_score_history": lambda db, u: crud.get_score_history(db, u.id),
+    "get_score_by_month": lambda db, u: crud.get_score_by_month(db, u.id, MES),
+    "increment_data_versions": lambda db, u: crud.increment_data_versions(db, {u.id}),
+    "get_score_cache": lambda db, u: crud.get_score_cache(db, u.id),
+    "get_score_column_rows": lambda db, u: crud.get_score_column_rows(db, [(u.id, MES), (u.id, add_months(MES, -1))]),
+    "upsert_score_cache": lambda db, u: crud.upsert_score_cache(db, u.id, 3, MES, "{}"),
+    "get_first_data_month": lambda db, u: crud.get_first_data_month(db, u.id),
+    "get_score_historico_map": lambda db, u: crud.get_score_historico_map(db, u.id),
+    "bulk_upsert_score_historico": lambda db, u: crud.bulk_upsert_score_historico(
+        db, u.id, {date(2025, 12, 1): {
+            "score_total": 60, "d1_comprometimento": 20, "d2_parcelas": 15, "d3_poupanca": 15,
+            "d4_comportamento": 10, "classificacao": "Estável", "dados_snapshot": {}},
+        }, crud.get_score_historico_map(db, u.id)),
+    "get_analise_by_month": lambda db, u: crud.get_analise_by_month(db, u.id, MES),
+    "create_analise": lambda db, u: crud.create_analise(db, _analise(u, "trimestral")),
+    "get_alerta_estado": lambda db, u: crud.get_alerta_estado(db, u.id, "A6", "Notebook", MES),
+    "get_alertas_by_month": lambda db, u: crud.get_alertas_by_month(db, u.id, MES),
+    "upsert_alerta_estado": lambda db, u: (
+        crud.upsert_alerta_estado(db, u.id, _alerta_data()),
+        crud.upsert_alerta_estado(db, u.id, _alerta_data(titulo="Atualizado")),
+    ),
+    "get_alerta_by_id": lambda db, u: crud.get_alerta_by_id(db, "alerta-id", u.id),
+    "mark_alerta_visto": lambda db, u: crud.mark_alerta_visto(db, crud.upsert_alerta_estado(db, u.id, _alerta_data())),
+    "mark_alerta_dispensado": lambda db, u: crud.mark_alerta_dispensado(
+        db, crud.upsert_alerta_estado(db, u.id, _alerta_data())),
+    "mark_alerta_resolvido": lambda db, u: crud.mark_alerta_resolvido(
+        db, crud.upsert_alerta_estado(db, u.id, _alerta_data())),
+    "get_configuracao_alertas": lambda db, u: crud.get_configuracao_alertas(db, u.id),
+    "update_configuracao_alertas": lambda db, u: crud.update_configuracao_alertas(db, u.id, {"alerta_score": False}),
+}
+
+
+@contextmanager
+def _captured_statements(db):
+    """Comandos SQL (texto, parametros) emitidos na conexao da sessao."""
+    statements = []
+    engine = db.get_bind()
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(engine, "before_cursor_execute", _before)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _before)
+
+
+def _full_scans(db, statement: str, parameters) -> list[str]:
+    """Tabelas percorridas por inteiro no plano do comando."""
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    scans = []
+    for row in rows:
+        match = _FULL_SCAN.match(row[3])
+        if match and match.group(1) in _TABLES:
+            scans.append(match.group(1))
+    return scans
+
+
+def test_every_crud_function_is_covered():
+    public = {
+        name for name, fn in inspect.getmembers(crud, inspect.isfunction)
+        if fn.__module__ == crud.__name__ and not name.startswith("_")
+    }
+    assert public == set(CASES), "adicione a funcao nova de crud.py em CASES"
+
+
+@pytest.mark.parametrize("name", sorted(set(CASES) - {"installment_plan_row"}))
+def test_crud_function_uses_indexes(seeded, name):
+    db, user = seeded
+    db.expunge_all()  # cada funcao consulta o banco, nao o identity map
+    with _captured_statements(db) as statements:
+        CASES[name](db, user)
+    queries = [
+        (statement, parameters) for statement, parameters in statements
+        if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "WITH")
+    ]
+    assert bool(queries) != (name in NO_QUERY), f"{name}: consultas emitidas {queries}"
+    if name in FULL_SCAN_ALLOWED:
+        return
+
+    scans = {}
+    for statement, parameters in queries:
+        tabelas = _full_scans(db, statement, parameters)
+        if tabelas:
+            scans[statement] = tabelas
+    assert not scans, f"{name} faz full table scan: {scans}"
+
+
+@pytest.mark.parametrize("name, statement_start, index", [
+    ("expense_installment_exists", "SELECT", "ix_expenses_user_month_parcela"),
+    ("mark_overdue_expenses", "UPDATE", "ix_expenses_status_vencimento"),
+])
+def test_hot_queries_use_dedicated_index(seeded, name, statement_start, index):
+    db, user = seeded
+    with _captured_statements(db) as statements:
+        CASES[name](db, user)
+    plans = [
+        [row[3] for row in db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        for statement, parameters in statements
+        if statement.startswith(statement_start)
+    ]
+    assert plans
+    for plan in plans:
+        assert any(index in detail for detail in plan), plan
+        assert not any("TEMP B-TREE FOR ORDER BY" in detail for detail in plan), plan
+
+
+def test_installment_list_reads_plans_and_legacy_rows_by_index(seeded):
+    db, user = seeded
+    with _captured_statements(db) as statements:
+        CASES["get_installment_expenses_grouped"](db, user)
+    plans = {
+        statement: [row[3] for row in db.connection().exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        for statement, parameters in statements
+        if statement.startswith("SELECT expenses.")
+    }
+    by_plan = [plan for statement, plan in plans.items() if "plan_id IN" in statement]
+    legacy = [plan for statement, plan in plans.items() if "plan_id IS NULL" in statement]
+    assert len(by_plan) == len(legacy) == 1
+    assert any("ix_expenses_plan_id" in detail for detail in by_plan[0]), by_plan
+    # Parcelas sem plano: indice parcial, ja na ordem de vencimento
+    assert any("ix_expenses_installments_without_plan" in detail for detail in legacy[0]), legacy
+    assert not any("TEMP B-TREE FOR ORDER BY" in detail for detail in legacy[0]), legacy
@@ -0,0 +1,70 @@
+"""Testes do worker de virada de mes (app.jobs.rollover)."""
+
+import json
+from datetime import date
+
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.jobs.rollover import run_rollover
+from app.models import Expense, ExpenseStatus, User
+
+
+def _seed_users(db, n: int) -> list[str]:
+    ids = []
+    for i in range(n):
+        user = User(
+            id=f"user-roll-{i:03d}",
+            nome=f"User {i}",
+            email=f"roll{i}@example.com",
+            password_hash="hashed",
+        )
+        db.add(user)
+        db.add(Expense(
+            user_id=user.id,
+            mes_referencia=date(2026, 10, 1),
+            nome="Aluguel",
+            valor=1000.00,
+            vencimento=date(2026, 10, 10),
+            recorrente=True,
+            status=ExpenseStatus.PENDENTE.value,
+        ))
+        ids.append(user.id)
+    db.commit()
+    return ids
+
+
+class TestRollover:
+    def test_materializes_all_users_in_chunks(self, db):
+        ids = _seed_users(db, 5)
+        factory = sessionmaker(bind=db.get_bind())
+
+        reports = run_rollover(factory, date(2026, 11, 1), chunk_size=2)
+
+        assert [r["users"] for r in reports] == [2, 2, 1]
+        assert sum(r["materialized"] for r in reports) == 5
+        assert all(r["seconds"] >= 0 for r in reports)
+        for user_id in ids:
+            nov = crud.get_expenses_by_month(db, date(2026, 11, 1), user_id)
+            assert [e.nome for e in nov] == ["Aluguel"]
+
+    def test_resumes_from_checkpoint(self, db, tmp_path):
+        ids = _seed_users(db, 4)
+        factory = sessionmaker(bind=db.get_bind())
+        checkpoint = tmp_path / "rollover.json"
+        checkpoint.write_text(json.dumps({
+            "mes_referencia": "2026-11-01", "last_user_id": ids[1],
+            "processed": 2, "materialized": 2, "failed": 0, "done": False,
+        }))
+
+        reports = run_rollover(factory, date(2026, 11, 1), chunk_size=10,
+                               checkpoint_path=str(checkpoint))
+
+        assert [r["users"] for r in reports] == [2]
+        assert crud.get_expenses_by_month(db, date(2026, 11, 1), ids[0]) == []
+        assert len(crud.get_expenses_by_month(db, date(2026, 11, 1), ids[3])) == 1
+        saved = json.loads(checkpoint.read_text())
+        assert saved["done"] is True
+        assert saved["processed"] == 4
+
+        assert run_rollover(factory, date(2026, 11, 1), checkpoint_path=str(checkpoint)) == []
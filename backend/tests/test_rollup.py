@@ -0,0 +1,95 @@
+"""Read model monthly_rollup: manutencao transacional, rebuild e verify."""
+
+from datetime import date
+
+from sqlalchemy import update
+
+from app import crud
+from app.jobs.rollup import rebuild_rollup, verify_rollup
+from app.models import DailyExpense, Expense, ExpenseStatus, Income, MonthlyRollup
+from app.services import generate_month_data, sweep_overdue_expenses
+
+
+def _rows(db, user_id, mes):
+    return {
+        (r["tipo"], r["status"], r["categoria"]): (float(r["total"]), r["quantidade"])
+        for r in crud.get_monthly_rollup_rows(db, user_id)
+        if r["mes_referencia"] == mes
+    }
+
+
+class TestRollupMaintenance:
+    def test_orm_writes_keep_rollup_consistent(self, db, test_user, january_data):
+        jan = date(2026, 1, 1)
+        assert verify_rollup(db) == []
+        assert _rows(db, test_user.id, jan) == {
+            ("despesa", "Pendente", ""): (1580.0, 2),
+            ("despesa", "Pago", ""): (200.0, 1),
+            ("receita", "", ""): (5000.0, 1),
+        }
+
+        expenses, incomes = january_data
+        expenses[0].valor = 1600.00
+        expenses[0].categoria = "Moradia"
+        db.delete(expenses[2])
+        db.add(DailyExpense(
+            user_id=test_user.id, mes_referencia=jan, descricao="Mercado", valor=50.00,
+            data=date(2026, 1, 3), categoria="Alimentação", subcategoria="Supermercado",
+            metodo_pagamento="Pix",
+        ))
+        db.commit()
+
+        assert verify_rollup(db) == []
+        assert _rows(db, test_user.id, jan) == {
+            ("despesa", "Pendente", "Moradia"): (1600.0, 1),
+            ("despesa", "Pago", ""): (200.0, 1),
+            ("receita", "", ""): (5000.0, 1),
+            ("gasto_diario", "", "Alimentação"): (50.0, 1),
+        }
+
+    def test_moving_row_to_other_month_updates_both(self, db, test_user, january_data):
+        _, incomes = january_data
+        incomes[0].mes_referencia = date(2026, 2, 1)
+        db.commit()
+
+        assert verify_rollup(db) == []
+        assert ("receita", "", "") not in _rows(db, test_user.id, date(2026, 1, 1))
+        assert _rows(db, test_user.id, date(2026, 2, 1))[("receita", "", "")] == (5000.0, 1)
+
+    def test_null_and_empty_category_share_one_row(self, db, test_user, january_data):
+        jan = date(2026, 1, 1)
+        db.add(Expense(
+            user_id=test_user.id, mes_referencia=jan, nome="Sem categoria", valor=30.00,
+            vencimento=date(2026, 1, 10), categoria="", status=ExpenseStatus.PAGO.value,
+        ))
+        db.commit()
+
+        assert verify_rollup(db) == []
+        assert _rows(db, test_user.id, jan)[("despesa", "Pago", "")] == (230.0, 2)
+
+    def test_bulk_paths_keep_rollup_consistent(self, db, test_user, january_data):
+        generate_month_data(db, date(2026, 4, 1), test_user.id)  # forward-fill
+        generate_month_data(db, date(2026, 5, 1), test_user.id)
+        sweep_overdue_expenses(db, test_user.id, date(2026, 5, 1))
+        assert verify_rollup(db) == []
+        assert crud.get_expense_total_by_month(db, date(2026, 3, 1), test_user.id) == 1700.0
+
+
+class TestRollupRebuild:
+    def test_verify_detects_and_rebuild_fixes_drift(self, db, test_user, january_data):
+        db.execute(
+            update(MonthlyRollup)
+            .where(MonthlyRollup.tipo == "receita")
+            .values(total=1)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+        mismatches = verify_rollup(db)
+        assert len(mismatches) == 1
+        assert mismatches[0]["key"][2] == "receita"
+
+        rebuilt = rebuild_rollup(db)
+        assert rebuilt == 3
+        assert verify_rollup(db) == []
+        assert crud.get_income_total_by_month(db, date(2026, 1, 1), test_user.id) == 5000.0
@@ -0,0 +1,125 @@
+"""
+Reconstrucao do historico de score (scoring.rebuild_score_history): mesmo
+resultado do calculo mes a mes de /api/score, com consultas em numero fixo.
+"""
+import json
+from datetime import date
+
+from sqlalchemy import event
+
+from app import crud, scoring
+from app.health_score import calculate_conservative_score, calculate_health_score
+from app.jobs.score_backfill import run_score_backfill
+from app.models import DailyExpense, Expense, ExpenseStatus, Income, ScoreHistorico, User
+from app.services import get_previous_month
+from app.utils import add_months
+
+TODAY = date(2026, 8, 15)
+MESES = [date(2026, m, 1) for m in range(2, 8)]
+
+
+def _seed(db, user_id: str, meses: list[date]) -> None:
+    """Meses ja completos: nada recorrente a replicar quando /api/score gera o mes."""
+    for i, mes in enumerate(meses):
+        db.add(Income(user_id=user_id, mes_referencia=mes, nome="Salario",
+                      valor=5000.00 + 100 * i, data=mes, recorrente=False))
+        db.add(Expense(user_id=user_id, mes_referencia=mes, nome="Aluguel", valor=1500.00,
+                       vencimento=date(mes.year, mes.month, 10), recorrente=False,
+                       status=ExpenseStatus.PAGO.value))
+        db.add(Expense(user_id=user_id, mes_referencia=mes, nome="Internet", valor=120.00 + 7 * i,
+                       vencimento=date(mes.year, mes.month, 20), recorrente=False,
+                       status=ExpenseStatus.ATRASADO.value if i % 2 else ExpenseStatus.PAGO.value))
+        db.add(DailyExpense(user_id=user_id, mes_referencia=mes, descricao="Mercado",
+                            valor=300.00 + 45 * i, data=date(mes.year, mes.month, 5),
+                            categoria="Alimentação", subcategoria="Supermercado", metodo_pagamento="Pix"))
+        db.add(Expense(user_id=user_id, mes_referencia=mes, nome="Geladeira", valor=350.00,
+                       vencimento=date(mes.year, mes.month, 15), parcela_atual=i + 1,
+                       parcela_total=len(meses) + 4, recorrente=False, status=ExpenseStatus.PAGO.value))
+    db.commit()
+
+
+def _count_statements(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+class TestScoreBackfill:
+    def test_matches_month_by_month_pipeline(self, db, test_user):
+        _seed(db, test_user.id, MESES)
+        db.add(ScoreHistorico(user_id=test_user.id, mes_referencia=MESES[1], score_total=1,
+                              d1_comprometimento=1, d2_parcelas=1, d3_poupanca=1, d4_comportamento=1,
+                              classificacao="Crítica", dados_snapshot="{}"))
+        db.commit()
+
+        result = scoring.rebuild_score_history(db, test_user.id, today=TODAY)
+        assert result == {"meses_calculados": 6, "inseridos": 5, "atualizados": 1}
+
+        # Calculo mes a mes (coleta de /api/score), em ordem cronologica
+        stored = crud.get_score_historico_map(db, test_user.id)
+        assert sorted(stored) == MESES
+        for mes in MESES:
+            db.expire_all()
+            prev_score = crud.get_score_by_month(db, test_user.id, get_previous_month(mes))
+            inputs = scoring.score_inputs(db, test_user.id, mes, prev_score)
+            score_data = calculate_health_score(**inputs)
+            cenario = calculate_conservative_score(score_data, inputs["installment_groups"], inputs["renda"])
+            expected = scoring.score_persist_data(score_data, cenario, inputs)
+
+            record = stored[mes]
+            db.refresh(record)
+            assert record.score_total == expected["score_total"], mes
+            assert record.d4_comportamento == expected["d4_comportamento"], mes
+            assert record.score_conservador == expected["score_conservador"], mes
+            assert json.loads(record.dados_snapshot) == expected["dados_snapshot"], mes
+
+    def test_second_run_writes_nothing(self, db, test_user):
+        _seed(db, test_user.id, MESES)
+        versao = test_user.data_version
+        scoring.rebuild_score_history(db, test_user.id, today=TODAY)
+        # Score do mes atual guardado por fingerprint deixa de valer em todos os processos
+        assert test_user.data_version == versao + 1
+
+        assert scoring.rebuild_score_history(db, test_user.id, today=TODAY) == {
+            "meses_calculados": 6, "inseridos": 0, "atualizados": 0,
+        }
+        assert test_user.data_version == versao + 1
+
+    def test_query_count_independent_of_history_length(self, db, test_user):
+        other = User(id="user-test-002", nome="Outro", email="outro@example.com",
+                     password_hash="x", email_verified=True)
+        db.add(other)
+        db.commit()
+        _seed(db, test_user.id, MESES)
+        _seed(db, other.id, [add_months(date(2024, 1, 1), i) for i in range(30)])
+
+        statements = _count_statements(db)
+        scoring.rebuild_score_history(db, test_user.id, today=TODAY)
+        curto = len(statements)
+        statements.clear()
+        result = scoring.rebuild_score_history(db, other.id, today=TODAY)
+        assert result["meses_calculados"] == 30
+        assert len(statements) == curto
+
+    def test_skips_months_without_data_and_current_month(self, db, test_user):
+        assert scoring.rebuild_score_history(db, test_user.id, today=TODAY)["meses_calculados"] == 0
+        _seed(db, test_user.id, [date(2026, 1, 1), date(2026, 2, 1), date(2026, 4, 1), date(2026, 8, 1)])
+
+        assert scoring.rebuild_score_history(db, test_user.id, today=TODAY)["meses_calculados"] == 3
+        assert sorted(crud.get_score_historico_map(db, test_user.id)) == [
+            date(2026, 1, 1), date(2026, 2, 1), date(2026, 4, 1),
+        ]
+
+    def test_job_processes_all_users(self, db, test_user):
+        other = User(id="user-test-002", nome="Outro", email="outro@example.com",
+                     password_hash="x", email_verified=True)
+        db.add(other)
+        db.commit()
+        _seed(db, test_user.id, MESES)
+        _seed(db, other.id, MESES[:2])
+
+        totals = run_score_backfill(db, chunk_size=1)
+        assert totals["usuarios"] == 2
+        assert totals["falhas"] == 0
+        assert totals["meses_calculados"] >= 8
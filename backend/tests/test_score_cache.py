@@ -0,0 +1,119 @@
+"""
+Cache do GET /api/score por fingerprint (data_version, dia): resposta gravada
+em score_cache reutilizada sem recalcular, score_historico regravado apenas
+quando o score muda.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import event, select
+
+from app import scoring
+from app.models import Expense, ExpenseStatus, Income, ScoreHistorico, User
+from app.query_counter import HEADER_NAME
+from app.utils import add_months
+
+MES_ATUAL = date(date.today().year, date.today().month, 1)
+
+
+@pytest.fixture(autouse=True)
+def score_data(api_db, api_user):
+    with api_db() as session:
+        session.add(Income(user_id=api_user.id, mes_referencia=MES_ATUAL, nome="Salario",
+                           valor=5000.00, data=MES_ATUAL, recorrente=True))
+        session.add(Expense(user_id=api_user.id, mes_referencia=MES_ATUAL, nome="Aluguel", valor=1500.00,
+                            vencimento=date(MES_ATUAL.year, MES_ATUAL.month, 28), recorrente=True,
+                            status=ExpenseStatus.PENDENTE.value))
+        session.commit()
+
+
+def _score_writes(engine):
+    """Lista de INSERT/UPDATE em score_historico emitidos no engine."""
+    writes = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if "score_historico" in statement and statement.lstrip().startswith(("INSERT", "UPDATE")):
+            writes.append(statement)
+
+    return writes
+
+
+def _add_expense(client, headers, mes: date, nome: str, valor: float):
+    r = client.post(f"/api/expenses/{mes.year}/{mes.month}", headers=headers, json={
+        "nome": nome, "valor": valor, "vencimento": date(mes.year, mes.month, 20).isoformat(),
+        "recorrente": False,
+    })
+    assert r.status_code == 201, r.text
+
+
+class TestScoreCache:
+    def test_repeat_call_served_from_cache(self, api):
+        client, headers = api
+        first = client.get("/api/score", headers=headers)
+        assert first.status_code == 200
+        warm = client.get("/api/score", headers=headers)
+        assert warm.json() == first.json()
+        assert int(warm.headers[HEADER_NAME]) <= 1  # apenas o usuario da autenticacao
+
+    def test_served_from_stored_row_after_restart(self, api, api_db):
+        client, headers = api
+        writes = _score_writes(api_db.kw["bind"])
+        first = client.get("/api/score", headers=headers)
+
+        scoring.clear_score_cache()  # novo processo / outro worker
+        stored = client.get("/api/score", headers=headers)
+        assert stored.json() == first.json()
+        assert int(stored.headers[HEADER_NAME]) <= 2  # usuario + linha de score_cache
+        assert len(writes) == 1
+
+    def test_write_invalidates_cached_score(self, api):
+        client, headers = api
+        antes = client.get("/api/score", headers=headers).json()
+        _add_expense(client, headers, MES_ATUAL, "Carro", 2500.0)
+        depois = client.get("/api/score", headers=headers).json()
+
+        comprometimento = depois["dimensoes"]["d1_comprometimento"]["percentual_comprometimento"]
+        assert comprometimento > antes["dimensoes"]["d1_comprometimento"]["percentual_comprometimento"]
+
+    def test_unchanged_score_not_rewritten(self, api, api_db):
+        client, headers = api
+        writes = _score_writes(api_db.kw["bind"])
+        client.get("/api/score", headers=headers)
+        assert len(writes) == 1  # INSERT do mes atual
+
+        # Escrita em outro ano: data_version muda, score do mes atual nao
+        _add_expense(client, headers, date(MES_ATUAL.year + 3, 1, 1), "Viagem", 800.0)
+        r = client.get("/api/score", headers=headers)
+        assert int(r.headers[HEADER_NAME]) > 1  # recalculado
+        assert len(writes) == 1
+
+        # O novo fingerprint foi gravado em score_cache
+        scoring.clear_score_cache()
+        stored = client.get("/api/score", headers=headers)
+        assert stored.json() == r.json()
+        assert int(stored.headers[HEADER_NAME]) <= 2
+
+        _add_expense(client, headers, MES_ATUAL, "Carro", 2500.0)
+        client.get("/api/score", headers=headers)
+        assert len(writes) == 2
+        assert writes[-1].lstrip().startswith("UPDATE")
+        with api_db() as session:
+            registro = session.scalars(select(ScoreHistorico)).one()
+            assert registro.score_total == client.get("/api/score", headers=headers).json()["score"]["total"]
+
+    def test_history_rebuild_endpoint_refreshes_variation(self, api, api_db):
+        client, headers = api
+        assert client.get("/api/score", headers=headers).json()["score"]["variacao_mes_anterior"] is None
+
+        anterior = add_months(MES_ATUAL, -1)
+        with api_db() as session:
+            user_id = session.scalars(select(User.id)).one()
+            session.add(Income(user_id=user_id, mes_referencia=anterior, nome="Salario",
+                               valor=5000.00, data=anterior, recorrente=False))
+            session.commit()
+
+        r = client.post("/api/score/history/rebuild", headers=headers)
+        assert r.status_code == 200, r.text
+        assert r.json() == {"meses_calculados": 1, "inseridos": 1, "atualizados": 0}
+        assert client.get("/api/score", headers=headers).json()["score"]["variacao_mes_anterior"] is not None
@@ -0,0 +1,162 @@
+"""
+Simulador what-if do score (POST /api/score/simulate): resultado igual ao de
+aplicar as edicoes de verdade, sobre as entradas em cache de GET /api/score,
+recalculando apenas as dimensoes afetadas.
+"""
+import time
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app import scoring
+from app.models import DailyExpense, Expense, ExpenseStatus, Income, User
+from app.query_counter import HEADER_NAME
+from app.utils import add_months
+
+SIMULATE = "/api/score/simulate"
+MES_ATUAL = date(date.today().year, date.today().month, 1)
+
+
+@pytest.fixture
+def ids(api_db, api_user):
+    """IDs das despesas do mes atual, por nome."""
+    ids = {}
+    with api_db() as session:
+        session.add(Income(user_id=api_user.id, mes_referencia=MES_ATUAL, nome="Salario",
+                           valor=6000.00, data=MES_ATUAL, recorrente=True))
+        fixas = {
+            "Aluguel": (2000.00, ExpenseStatus.PAGO),
+            "Luz": (250.00, ExpenseStatus.ATRASADO),
+            "Agua": (120.00, ExpenseStatus.ATRASADO),
+            "Netflix": (55.90, ExpenseStatus.PENDENTE),
+        }
+        for nome, (valor, status) in fixas.items():
+            expense = Expense(user_id=api_user.id, mes_referencia=MES_ATUAL, nome=nome, valor=valor,
+                              vencimento=date(MES_ATUAL.year, MES_ATUAL.month, 1), recorrente=True,
+                              status=status.value)
+            session.add(expense)
+            session.flush()
+            ids[nome] = expense.id
+        for parcela in range(1, 7):
+            mes = add_months(MES_ATUAL, parcela - 3)
+            expense = Expense(
+                user_id=api_user.id, mes_referencia=mes, nome="Sofa", valor=400.00,
+                vencimento=date(mes.year, mes.month, 10), parcela_atual=parcela, parcela_total=6,
+                recorrente=False,
+                status=ExpenseStatus.PAGO.value if mes < MES_ATUAL else ExpenseStatus.PENDENTE.value,
+            )
+            session.add(expense)
+            session.flush()
+            if mes == MES_ATUAL:
+                ids["Sofa"] = expense.id
+        session.add(DailyExpense(user_id=api_user.id, mes_referencia=MES_ATUAL, descricao="Mercado", valor=600.00,
+                                 data=MES_ATUAL, categoria="Alimentação", subcategoria="Supermercado",
+                                 metodo_pagamento="Pix"))
+        session.commit()
+    return ids
+
+
+def _simulate(client, headers, *edicoes):
+    r = client.post(SIMULATE, headers=headers, json={"edicoes": list(edicoes)})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _pontos(score: dict) -> dict:
+    return {key: dim["pontos"] for key, dim in score["dimensoes"].items()}
+
+
+class TestScoreSimulation:
+    def test_pay_overdue_and_remove_match_real_edits(self, api, ids):
+        client, headers = api
+        atual = client.get("/api/score", headers=headers).json()
+        simulado = _simulate(
+            client, headers,
+            {"tipo": "pagar", "expense_id": ids["Luz"]},
+            {"tipo": "pagar", "expense_id": ids["Agua"]},
+            {"tipo": "remover", "expense_id": ids["Netflix"]},
+        )
+        assert simulado["dimensoes_recalculadas"] == ["d1_comprometimento", "d3_poupanca", "d4_comportamento"]
+        assert simulado["impacto"]["score_atual"] == atual["score"]["total"]
+        assert client.get("/api/score", headers=headers).json() == atual  # nada gravado
+
+        for nome in ("Luz", "Agua"):
+            r = client.patch(f"/api/expenses/{ids[nome]}", headers=headers, json={"status": "Pago"})
+            assert r.status_code == 200, r.text
+        assert client.delete(f"/api/expenses/{ids['Netflix']}", headers=headers).status_code == 204
+        real = client.get("/api/score", headers=headers).json()
+
+        assert simulado["score"] == real["score"]
+        assert _pontos(simulado) == _pontos(real)
+        assert simulado["impacto"]["score_simulado"] == real["score"]["total"]
+
+    def test_pay_only_recomputes_behaviour(self, api, ids):
+        client, headers = api
+        result = _simulate(client, headers, {"tipo": "pagar", "expense_id": ids["Luz"]})
+        assert result["dimensoes_recalculadas"] == ["d4_comportamento"]
+        assert result["impacto"]["variacao"] > 0
+
+    def test_installment_edits_match_real_edits(self, api, ids):
+        client, headers = api
+        simulado = _simulate(
+            client, headers,
+            {"tipo": "alterar_valor", "expense_id": ids["Sofa"], "valor": 650.0},
+            {"tipo": "adicionar_parcelamento", "nome": "Notebook", "valor_mensal": 450.0,
+             "parcela_total": 18, "mes_inicio": MES_ATUAL.isoformat()},
+        )
+        assert simulado["dimensoes_recalculadas"] == list(scoring.DIMENSOES)
+
+        r = client.patch(f"/api/expenses/{ids['Sofa']}", headers=headers, json={"valor": 650.0})
+        assert r.status_code == 200, r.text
+        # Vencimento no ultimo dia do mes: parcela nova segue Pendente, como na simulacao
+        ultimo_dia = add_months(MES_ATUAL, 1) - timedelta(days=1)
+        r = client.post(f"/api/expenses/{MES_ATUAL.year}/{MES_ATUAL.month}", headers=headers, json={
+            "nome": "Notebook", "valor": 450.0, "vencimento": ultimo_dia.isoformat(),
+            "parcela_atual": 1, "parcela_total": 18, "recorrente": False,
+        })
+        assert r.status_code == 201, r.text
+        real = client.get("/api/score", headers=headers).json()
+
+        assert _pontos(simulado) == _pontos(real)
+        assert simulado["dimensoes"]["d4_comportamento"]["subfatores"]["d4d_disciplina"]["pontos"] == 0
+        assert simulado["score"]["total"] == real["score"]["total"]
+
+    def test_served_from_cached_inputs(self, api, api_db, ids):
+        client, headers = api
+        client.get("/api/score", headers=headers)
+        body = {"edicoes": [{"tipo": "pagar", "expense_id": ids["Luz"]},
+                            {"tipo": "alterar_valor", "expense_id": ids["Aluguel"], "valor": 1500.0}]}
+        warm = client.post(SIMULATE, headers=headers, json=body)
+        assert warm.status_code == 200
+        assert int(warm.headers[HEADER_NAME]) <= 1  # apenas o usuario da autenticacao
+
+        with api_db() as session:
+            user = session.scalars(select(User)).one()
+            edicoes = body["edicoes"] * 10
+            elapsed = min(
+                _timed(lambda: scoring.simulate_score(session, user, edicoes)) for _ in range(5)
+            )
+        assert elapsed < 0.020
+
+    def test_errors(self, api):
+        client, headers = api
+        r = client.post(SIMULATE, headers=headers, json={"edicoes": [{"tipo": "pagar", "expense_id": "nao-existe"}]})
+        assert r.status_code == 404
+        r = client.post(SIMULATE, headers=headers, json={"edicoes": [{"tipo": "alterar_valor", "expense_id": "x"}]})
+        assert r.status_code == 422
+        r = client.post(SIMULATE, headers=headers, json={"edicoes": [{"tipo": "adicionar_parcelamento",
+                                                                      "valor_mensal": 100.0}]})
+        assert r.status_code == 422
+        r = client.post(SIMULATE, headers=headers, json={"edicoes": [{
+            "tipo": "adicionar_parcelamento", "valor_mensal": 100.0, "parcela_total": 3,
+            "mes_inicio": add_months(MES_ATUAL, -1).isoformat(),
+        }]})
+        assert r.status_code == 400
+        assert client.post(SIMULATE, headers=headers, json={"edicoes": []}).status_code == 422
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
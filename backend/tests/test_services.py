@@ -1,9 +1,9 @@
 """Tests for RF-06: Month transition / expense replication."""
 from datetime import date
 
-from app.services import generate_month_data
+from app.services import generate_month_data, get_monthly_summary, get_previous_month, sweep_overdue_expenses
 from app import crud
-from app.models import Expense, Income, ExpenseStatus, User
+from app.models import Expense, Income, ExpenseStatus, MonthState, User
 
 
 class TestGenerateMonthData:
@@ -305,3 +305,464 @@ class TestGenerateMonthData:
         feb_incomes = crud.get_incomes_by_month(db, date(2026, 2, 1), test_user.id)
         assert len(feb_incomes) == 1
         assert feb_incomes[0].nome == "Salario"
+
+
+class TestBulkReplication:
+    """Replicacao set-based: chaves carregadas de uma vez e INSERT em lote."""
+
+    def test_skips_upfront_created_installment(self, db, test_user):
+        """Parcela ja criada antecipadamente (CR-007) nao deve ser duplicada."""
+        for parcela, mes in ((1, date(2026, 1, 1)), (2, date(2026, 2, 1))):
+            db.add(Expense(
+                user_id=test_user.id,
+                mes_referencia=mes,
+                nome="Notebook",
+                valor=500.00,
+                vencimento=date(mes.year, mes.month, 10),
+                parcela_atual=parcela,
+                parcela_total=3,
+                recorrente=False,
+                status=ExpenseStatus.PENDENTE.value,
+            ))
+        db.commit()
+
+        result = generate_month_data(db, date(2026, 2, 1), test_user.id)
+        assert result is False
+
+        feb_expenses = crud.get_expenses_by_month(db, date(2026, 2, 1), test_user.id)
+        assert len(feb_expenses) == 1
+        assert feb_expenses[0].parcela_atual == 2
+
+    def test_statement_count_independent_of_item_count(self, db, test_user):
+        """Numero de comandos SQL nao cresce com a quantidade de itens replicados."""
+        from sqlalchemy import event
+
+        def count_statements(n_items: int, target_mes: date) -> int:
+            source_mes = get_previous_month(target_mes)
+            for i in range(n_items):
+                db.add(Expense(
+                    user_id=test_user.id,
+                    mes_referencia=source_mes,
+                    nome=f"Recorrente {i}",
+                    valor=10.00,
+                    vencimento=date(source_mes.year, source_mes.month, 5),
+                    recorrente=True,
+                    status=ExpenseStatus.PENDENTE.value,
+                ))
+            db.commit()
+
+            statements = []
+            engine = db.get_bind()
+            listener = lambda *args: statements.append(args[2])  # noqa: E731
+            event.listen(engine, "before_cursor_execute", listener)
+            try:
+                assert generate_month_data(db, target_mes, test_user.id) is True
+            finally:
+                event.remove(engine, "before_cursor_execute", listener)
+            return len(statements)
+
+        small = count_statements(3, date(2026, 2, 1))
+        large = count_statements(60, date(2026, 6, 1))
+        assert small == large
+
+        june = crud.get_expenses_by_month(db, date(2026, 6, 1), test_user.id)
+        assert len(june) == 60
+
+
+class TestMonthStateWatermark:
+    """RF-06: watermark evita reprocessar meses ja materializados."""
+
+    def _count_statements(self, db, fn) -> int:
+        from sqlalchemy import event
+
+        statements = []
+        engine = db.get_bind()
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            fn()
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        return len(statements)
+
+    def test_second_visit_only_reads_watermark(self, db, test_user, january_data):
+        feb = date(2026, 2, 1)
+        assert generate_month_data(db, feb, test_user.id) is True
+
+        user_id = test_user.id
+        n = self._count_statements(
+            db, lambda: generate_month_data(db, feb, user_id)
+        )
+        assert n == 1
+
+    def test_status_change_does_not_invalidate(self, db, test_user, january_data):
+        feb = date(2026, 2, 1)
+        generate_month_data(db, feb, test_user.id)
+        jan_expenses = crud.get_expenses_by_month(db, date(2026, 1, 1), test_user.id)
+        jan_expenses[0].status = ExpenseStatus.PAGO.value
+        db.commit()
+
+        user_id = test_user.id
+        n = self._count_statements(
+            db, lambda: generate_month_data(db, feb, user_id)
+        )
+        assert n == 1
+
+    def test_new_recurring_source_invalidates(self, db, test_user, january_data):
+        feb = date(2026, 2, 1)
+        generate_month_data(db, feb, test_user.id)
+        db.add(Expense(
+            user_id=test_user.id,
+            mes_referencia=date(2026, 1, 1),
+            nome="Academia",
+            valor=90.00,
+            vencimento=date(2026, 1, 15),
+            recorrente=True,
+            status=ExpenseStatus.PENDENTE.value,
+        ))
+        db.commit()
+
+        assert generate_month_data(db, feb, test_user.id) is True
+        nomes = {e.nome for e in crud.get_expenses_by_month(db, feb, test_user.id)}
+        assert "Academia" in nomes
+
+    def test_deleted_replica_is_not_resurrected(self, db, test_user, january_data):
+        feb = date(2026, 2, 1)
+        generate_month_data(db, feb, test_user.id)
+        feb_expenses = crud.get_expenses_by_month(db, feb, test_user.id)
+        removed = feb_expenses[0]
+        db.delete(removed)
+        db.commit()
+
+        assert generate_month_data(db, feb, test_user.id) is False
+        assert len(crud.get_expenses_by_month(db, feb, test_user.id)) == len(feb_expenses) - 1
+
+
+    def test_month_state_created_concurrently_is_reused(self, db, test_user):
+        feb = date(2026, 2, 1)
+        db.add(MonthState(user_id=test_user.id, mes_referencia=feb, source_version=3))
+        db.commit()
+
+        # Outra requisicao criou o watermark depois da leitura (states vazio)
+        states = crud.ensure_month_states(db, test_user.id, [feb], {})
+        assert states[feb].source_version == 3
+
+    def test_concurrent_materialization_replicates_once(self, db, test_user, january_data, monkeypatch):
+        feb = date(2026, 2, 1)
+        lock = crud.lock_user_materialization
+
+        def _other_request_wins(session, user_id):
+            # Enquanto esta requisicao esperava o lock, outra materializou fevereiro
+            monkeypatch.setattr(crud, "lock_user_materialization", lock)
+            assert generate_month_data(session, feb, user_id) is True
+            lock(session, user_id)
+
+        monkeypatch.setattr(crud, "lock_user_materialization", _other_request_wins)
+        assert generate_month_data(db, feb, test_user.id) is False
+        assert len(crud.get_expenses_by_month(db, feb, test_user.id)) == 2
+
+
+class TestForwardFill:
+    """RF-06: navegar varios meses a frente preenche toda a lacuna de uma vez."""
+
+    def test_fills_every_intermediate_month(self, db, test_user, january_data):
+        from sqlalchemy import event
+
+        commits = []
+        listener = lambda session: commits.append(1)  # noqa: E731
+        event.listen(db, "after_commit", listener)
+        try:
+            assert generate_month_data(db, date(2026, 12, 1), test_user.id) is True
+        finally:
+            event.remove(db, "after_commit", listener)
+        assert len(commits) == 1
+
+        for month in range(2, 13):
+            mes = date(2026, month, 1)
+            nomes = {e.nome for e in crud.get_expenses_by_month(db, mes, test_user.id)}
+            assert "Aluguel" in nomes
+            assert "Jantar" not in nomes
+            assert ("TV Parcela" in nomes) == (month <= 8)
+            assert len(crud.get_incomes_by_month(db, mes, test_user.id)) == 1
+
+        aug = crud.get_expenses_by_month(db, date(2026, 8, 1), test_user.id)
+        tv = next(e for e in aug if e.nome == "TV Parcela")
+        assert (tv.parcela_atual, tv.parcela_total) == (10, 10)
+        assert tv.vencimento == date(2026, 8, 15)
+
+    def test_chain_links_origem_ids(self, db, test_user, january_data):
+        generate_month_data(db, date(2026, 4, 1), test_user.id)
+        ids_by_month = {
+            m: {e.nome: e for e in crud.get_expenses_by_month(db, date(2026, m, 1), test_user.id)}
+            for m in (1, 2, 3, 4)
+        }
+        for m in (2, 3, 4):
+            assert ids_by_month[m]["Aluguel"].origem_id == ids_by_month[m - 1]["Aluguel"].id
+
+    def test_intermediate_months_are_materialized(self, db, test_user, january_data):
+        generate_month_data(db, date(2026, 6, 1), test_user.id)
+
+        assert generate_month_data(db, date(2026, 3, 1), test_user.id) is False
+        assert generate_month_data(db, date(2026, 6, 1), test_user.id) is False
+        mar = crud.get_expenses_by_month(db, date(2026, 3, 1), test_user.id)
+        assert len(mar) == 2
+
+    def test_deleted_month_is_not_refilled(self, db, test_user, january_data):
+        feb, mar = date(2026, 2, 1), date(2026, 3, 1)
+        generate_month_data(db, feb, test_user.id)
+        for row in [*crud.get_expenses_by_month(db, feb, test_user.id),
+                    *crud.get_incomes_by_month(db, feb, test_user.id)]:
+            db.delete(row)
+        db.commit()
+        assert generate_month_data(db, feb, test_user.id) is False
+        feb_state = crud.get_month_states(db, test_user.id, [feb])[feb]
+        watermark = (feb_state.source_version, feb_state.materialized_version)
+
+        assert generate_month_data(db, mar, test_user.id) is False
+        assert crud.get_expenses_by_month(db, feb, test_user.id) == []
+        assert crud.get_incomes_by_month(db, feb, test_user.id) == []
+        assert crud.get_expenses_by_month(db, mar, test_user.id) == []
+        db.refresh(feb_state)
+        assert (feb_state.source_version, feb_state.materialized_version) == watermark
+
+    def test_stale_empty_month_is_refilled(self, db, test_user):
+        jan, feb, mar = date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)
+        assert generate_month_data(db, feb, test_user.id) is False  # janeiro ainda vazio
+        db.add(Expense(
+            user_id=test_user.id, mes_referencia=jan, nome="Academia", valor=90.00,
+            vencimento=date(2026, 1, 15), recorrente=True, status=ExpenseStatus.PENDENTE.value,
+        ))
+        db.commit()
+
+        assert generate_month_data(db, mar, test_user.id) is True
+        for mes in (feb, mar):
+            assert [e.nome for e in crud.get_expenses_by_month(db, mes, test_user.id)] == ["Academia"]
+
+
+class TestOverdueSweep:
+    """RF-05: varredura de atraso set-based, no maximo uma vez por dia."""
+
+    def test_marks_all_overdue_pending_once_per_day(self, db, test_user, january_data):
+        today = date(2026, 3, 1)
+        assert sweep_overdue_expenses(db, test_user.id, today) == 2  # Aluguel e Jantar
+        jan = {e.nome: e.status for e in crud.get_expenses_by_month(db, date(2026, 1, 1), test_user.id)}
+        assert jan["Aluguel"] == ExpenseStatus.ATRASADO.value
+        assert jan["TV Parcela"] == ExpenseStatus.PAGO.value
+
+        assert sweep_overdue_expenses(db, test_user.id, today) == 0
+
+    def test_reopened_expense_invalidates_sweep(self, db, test_user, january_data):
+        today = date.today()
+        sweep_overdue_expenses(db, test_user.id, today)
+        tv = next(
+            e for e in crud.get_expenses_by_month(db, date(2026, 1, 1), test_user.id)
+            if e.nome == "TV Parcela"
+        )
+        tv.status = ExpenseStatus.PENDENTE.value
+        db.commit()
+
+        assert test_user.status_sweep_date is None
+        assert sweep_overdue_expenses(db, test_user.id, today) == 1
+
+    def test_nightly_sweep_all_users(self, db, test_user, january_data):
+        from app.jobs.status_sweep import run_status_sweep
+
+        other = User(nome="Sem atrasos", email="other@example.com", password_hash="x")
+        db.add(other)
+        db.commit()
+        versions = (test_user.data_version, other.data_version)
+
+        report = run_status_sweep(db, date(2026, 3, 1))
+        assert report["users"] == 2
+        assert report["expenses"] == 2
+        db.refresh(test_user)
+        db.refresh(other)
+        assert test_user.status_sweep_date == date(2026, 3, 1)
+        # ETags e score do usuario com despesas alteradas deixam de valer
+        assert (test_user.data_version, other.data_version) == (versions[0] + 1, versions[1])
+        assert sweep_overdue_expenses(db, test_user.id, date(2026, 3, 1)) == 0
+
+
+class TestMonthlyTotals:
+    """RF-04/CR-004: totalizadores agregados no banco, com aritmetica exata."""
+
+    def test_totals_by_status_are_exact(self, db, test_user):
+        mes = date(2026, 1, 1)
+        for valor, status in ((0.10, ExpenseStatus.PAGO), (0.20, ExpenseStatus.PAGO),
+                              (19.99, ExpenseStatus.PENDENTE)):
+            db.add(Expense(
+                user_id=test_user.id, mes_referencia=mes, nome=f"D {valor}",
+                valor=valor, vencimento=date(2030, 1, 1), recorrente=False,
+                status=status.value,
+            ))
+        db.add(Income(user_id=test_user.id, mes_referencia=mes, nome="Renda",
+                      valor=100.00, recorrente=False))
+        db.commit()
+
+        summary = get_monthly_summary(db, mes, test_user.id)
+        assert summary["total_pago"] == 0.3
+        assert summary["total_pendente"] == 19.99
+        assert summary["total_atrasado"] == 0.0
+        assert summary["total_despesas"] == 20.29
+        assert summary["saldo_livre"] == 79.71
+        assert len(summary["expenses"]) == 3
+
+        totals = get_monthly_summary(db, mes, test_user.id, summary_only=True)
+        assert "expenses" not in totals and "incomes" not in totals
+        assert {k: totals[k] for k in totals} == {
+            k: v for k, v in summary.items() if k not in ("expenses", "incomes")
+        }
+
+
+class TestMonthlyRange:
+    """Visao mensal em lote (GET /api/months/range)."""
+
+    def test_matches_single_month_summaries(self, db, test_user, january_data):
+        from app.services import get_monthly_range
+
+        meses = get_monthly_range(db, date(2026, 1, 1), date(2026, 4, 1), test_user.id)
+        assert [m["mes_referencia"] for m in meses] == [
+            date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1), date(2026, 4, 1),
+        ]
+        for m in meses:
+            single = get_monthly_summary(db, m["mes_referencia"], test_user.id)
+            assert {k: v for k, v in m.items() if k not in ("expenses", "incomes")} == {
+                k: v for k, v in single.items() if k not in ("expenses", "incomes")
+            }
+            assert [e.id for e in m["expenses"]] == [e.id for e in single["expenses"]]
+            assert [i.id for i in m["incomes"]] == [i.id for i in single["incomes"]]
+
+    def test_warm_range_query_count_is_constant(self, db, test_user, january_data):
+        from sqlalchemy import event
+        from app.services import get_monthly_range
+
+        user_id = test_user.id
+        get_monthly_range(db, date(2026, 1, 1), date(2026, 12, 1), user_id)
+
+        def count(to_mes: date) -> int:
+            statements = []
+            engine = db.get_bind()
+            listener = lambda *args: statements.append(args[2])  # noqa: E731
+            event.listen(engine, "before_cursor_execute", listener)
+            try:
+                get_monthly_range(db, date(2026, 1, 1), to_mes, user_id)
+            finally:
+                event.remove(engine, "before_cursor_execute", listener)
+            return len(statements)
+
+        assert count(date(2026, 2, 1)) == count(date(2026, 12, 1)) == 3
+
+
+class TestDashboardEvolution:
+    """CR-019: serie de evolucao agregada em uma query."""
+
+    def test_series_matches_per_month_totals(self, db, test_user, january_data):
+        from app.services import get_dashboard_data
+
+        generate_month_data(db, date(2026, 3, 1), test_user.id)
+        data = get_dashboard_data(db, date(2026, 4, 1), test_user.id, evolution_months=12)
+
+        evolucao = data["evolucao"]
+        assert len(evolucao) == 12
+        assert evolucao[0]["mes_referencia"] == date(2025, 5, 1)
+        assert evolucao[-1]["mes_referencia"] == date(2026, 4, 1)
+        for ponto in evolucao[:-1]:
+            mes = ponto["mes_referencia"]
+            assert ponto["total_despesas"] == crud.get_expense_total_by_month(db, mes, test_user.id)
+            assert ponto["total_receitas"] == crud.get_income_total_by_month(db, mes, test_user.id)
+            assert ponto["total_gastos_diarios"] == crud.get_daily_expense_total_by_month(db, mes, test_user.id)
+        assert evolucao[-1]["total_despesas"] == data["total_despesas_planejadas"]
+
+
+class TestCategoryBreakdown:
+    """CR-019: breakdown por categoria agregado no banco e drill-down por subcategoria."""
+
+    def _seed(self, db, user_id):
+        mes = date(2026, 1, 1)
+        for nome, valor, categoria, subcategoria in [
+            ("Aluguel", 1500.00, "Moradia", "Aluguel"),
+            ("Condominio", 400.00, "Moradia", "Condominio"),
+            ("Luz", 100.00, "Moradia", None),
+            ("Sem categoria", 50.00, None, None),
+        ]:
+            db.add(Expense(
+                user_id=user_id, mes_referencia=mes, nome=nome, valor=valor,
+                vencimento=date(2026, 1, 10), categoria=categoria, subcategoria=subcategoria,
+                status=ExpenseStatus.PAGO.value,
+            ))
+        db.commit()
+        return mes
+
+    def test_breakdown_groups_null_as_outros(self, db, test_user):
+        from app.services import get_dashboard_data
+
+        mes = self._seed(db, test_user.id)
+        data = get_dashboard_data(db, mes, test_user.id)
+
+        breakdown = {c["categoria"]: c for c in data["categorias_planejadas"]}
+        assert breakdown["Moradia"]["total"] == 2000.00
+        assert breakdown["Moradia"]["count"] == 3
+        assert breakdown["Moradia"]["percentual"] == 97.6
+        assert breakdown["Outros"]["total"] == 50.00
+        assert data["categorias_planejadas"][0]["categoria"] == "Moradia"
+
+    def test_drilldown_by_subcategory(self, db, test_user):
+        from app.services import get_category_drilldown
+
+        mes = self._seed(db, test_user.id)
+        data = get_category_drilldown(db, mes, test_user.id, "Moradia")
+
+        assert data["total"] == 2000.00
+        assert data["count"] == 3
+        subs = {s["subcategoria"]: s for s in data["subcategorias"]}
+        assert subs["Aluguel"]["total"] == 1500.00
+        assert subs["Aluguel"]["percentual"] == 75.0
+        assert subs["Outros"]["total"] == 100.00
+        assert [s["subcategoria"] for s in data["subcategorias"]] == ["Aluguel", "Condominio", "Outros"]
+
+    def test_empty_category_and_subcategory_fold_into_outros(self, db, test_user):
+        from app.services import get_category_drilldown, get_dashboard_data
+
+        mes = self._seed(db, test_user.id)
+        for nome, categoria, subcategoria in [("Vazia", "", ""), ("Gas", "Moradia", "")]:
+            db.add(Expense(
+                user_id=test_user.id, mes_referencia=mes, nome=nome, valor=25.00,
+                vencimento=date(2026, 1, 10), categoria=categoria, subcategoria=subcategoria,
+                status=ExpenseStatus.PAGO.value,
+            ))
+        db.commit()
+
+        categorias = {c["categoria"]: c for c in get_dashboard_data(db, mes, test_user.id)["categorias_planejadas"]}
+        assert "" not in categorias
+        assert categorias["Outros"]["total"] == 75.00
+        assert categorias["Outros"]["count"] == 2
+
+        subs = {s["subcategoria"]: s for s in get_category_drilldown(db, mes, test_user.id, "Moradia")["subcategorias"]}
+        assert "" not in subs
+        assert subs["Outros"]["total"] == 125.00
+        assert subs["Outros"]["count"] == 2
+
+
+class TestInstallmentRemainingTotal:
+    """Parcelas futuras do dashboard via SUM agregado."""
+
+    def test_matches_grouped_active_remaining(self, db, test_user):
+        for nome, total, statuses in [
+            ("TV", 10, ["Pago", "Pago", "Pendente", "Atrasado"]),
+            ("Sofa", 3, ["Pago", "Pago", "Pago"]),
+            ("Curso", 6, ["Pago", "Pendente"]),
+        ]:
+            for i, status in enumerate(statuses, start=1):
+                db.add(Expense(
+                    user_id=test_user.id, mes_referencia=date(2026, i, 1), nome=nome,
+                    valor=123.45, vencimento=date(2026, i, 10), parcela_atual=i,
+                    parcela_total=total, status=status,
+                ))
+        db.commit()
+
+        grouped = crud.get_installment_expenses_grouped(db, test_user.id)
+        expected = round(sum(
+            g["valor_restante"] for g in grouped["groups"] if g["status_geral"] == "Em andamento"
+        ), 2)
+
+        assert float(crud.get_installment_remaining_total(db, test_user.id)) == expected == 370.35
@@ -1,6 +1,6 @@
-import { useQuery } from "@tanstack/react-query";
-import { useState } from "react";
-import { fetchMonthlySummary } from "../services/api";
+import { useQuery, useQueryClient } from "@tanstack/react-query";
+import { useEffect, useState } from "react";
+import { fetchMonthlyRange, fetchMonthlySummary } from "../services/api";
 import {
   getCurrentMonthRef,
   getNextMonth,
@@ -11,6 +11,7 @@ import { useAuth } from "./useAuth";
 
 export function useMonthlyView() {
   const { user } = useAuth();
+  const queryClient = useQueryClient();
   const [monthRef, setMonthRef] = useState(getCurrentMonthRef);
 
   const query = useQuery<MonthlySummary>({
@@ -19,6 +20,31 @@ export function useMonthlyView() {
     enabled: !!user,
   });
 
+  // Prefetch dos meses adjacentes que faltam no cache, um mes por chamada a
+  // /months/range. So depois que o mes atual carregou: a geracao (RF-06) do
+  // mes seguinte le o mes atual, que nao pode estar sendo gerado em paralelo.
+  const currentLoaded = query.data !== undefined;
+  useEffect(() => {
+    if (!user || !currentLoaded) return;
+    const adjacent = [
+      getPreviousMonth(monthRef.year, monthRef.month),
+      getNextMonth(monthRef.year, monthRef.month),
+    ];
+    for (const ref of adjacent) {
+      const key = ["monthly-summary", user.id, ref.year, ref.month];
+      if (queryClient.getQueryData(key)) continue;
+      fetchMonthlyRange(ref, ref)
+        .then((range) => {
+          if (range.meses.length > 0 && !queryClient.getQueryData(key)) {
+            queryClient.setQueryData(key, range.meses[0]);
+          }
+        })
+        .catch(() => {
+          // Prefetch e opcional: a navegacao busca o mes normalmente
+        });
+    }
+  }, [user, queryClient, monthRef.year, monthRef.month, currentLoaded]);
+
   function goToPreviousMonth() {
     setMonthRef((prev) => getPreviousMonth(prev.year, prev.month));
   }
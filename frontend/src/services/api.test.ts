@@ -1,5 +1,5 @@
 import { describe, it, expect, vi, beforeEach, afterEach } from "vitest";
-import { fetchMonthlySummary, deleteExpense } from "./api";
+import { fetchMonthlySummary, fetchMonthlyRange, deleteExpense } from "./api";
 
 // Response minima compativel com o que request() consome
 function makeResponse(status: number, body?: unknown): Response {
@@ -113,3 +113,16 @@ describe("request — tratamento de erros e respostas", () => {
     await expect(deleteExpense("exp-1")).resolves.toBeUndefined();
   });
 });
+
+describe("fetchMonthlyRange", () => {
+  it("monta a query string from/to com mes em dois digitos", async () => {
+    fetchMock.mockResolvedValueOnce(makeResponse(200, { meses: [] }));
+
+    await fetchMonthlyRange({ year: 2026, month: 1 }, { year: 2026, month: 12 });
+
+    expect(fetchMock).toHaveBeenCalledWith(
+      "/api/months/range?from=2026-01&to=2026-12",
+      expect.anything()
+    );
+  });
+});
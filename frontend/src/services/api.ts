@@ -1,5 +1,6 @@
 import type {
   MonthlySummary,
+  MonthlyRange,
   ExpenseCreate,
   ExpenseUpdate,
   Expense,
@@ -87,6 +88,21 @@ export function fetchMonthlySummary(
   return request<MonthlySummary>(`/months/${year}/${month}`);
 }
 
+function formatMonthParam(year: number, month: number): string {
+  return `${year}-${String(month).padStart(2, "0")}`;
+}
+
+export function fetchMonthlyRange(
+  from: { year: number; month: number },
+  to: { year: number; month: number }
+): Promise<MonthlyRange> {
+  const params = new URLSearchParams({
+    from: formatMonthParam(from.year, from.month),
+    to: formatMonthParam(to.year, to.month),
+  });
+  return request<MonthlyRange>(`/months/range?${params}`);
+}
+
 // ========== Dashboard (CR-019) ==========
 
 export function fetchDashboard(
@@ -13,6 +13,7 @@ export interface Expense {
   parcela_atual: number | null;
   parcela_total: number | null;
   recorrente: boolean;
+  plan_id?: string | null;
   status: ExpenseStatus;
   created_at: string;
   updated_at: string;
@@ -40,13 +41,17 @@ export interface ExpenseUpdate {
 }
 
 export interface InstallmentGroup {
+  plan_id?: string | null;
   nome: string;
   parcela_total: number;
   status_geral: string;
+  primeiro_vencimento?: string | null;
   valor_total_compra: number;
   valor_pago: number;
   valor_restante: number;
-  installments: Expense[];
+  quantidade?: number;
+  parcelas_pagas?: number;
+  installments: Expense[];  // vazio com ?summary=true
 }
 
 export interface InstallmentsResponse {
@@ -55,6 +60,7 @@ export interface InstallmentsResponse {
   total_pago: number;
   total_pendente: number;
   total_atrasado: number;
+  next_cursor?: string | null;
 }
 
 // ========== Income Types ==========
@@ -98,6 +104,10 @@ export interface MonthlySummary {
   incomes: Income[];
 }
 
+export interface MonthlyRange {
+  meses: MonthlySummary[];
+}
+
 // ========== Daily Expense Types (CR-005) ==========
 
 export interface DailyExpense {